@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Compare loading an asset-heavy page over HTTP/1.1 keep-alive and HTTP/2 (server.http2 section).
+
+An AsyncHTTPServer with a throwaway self-signed certificate runs in a child
+process and serves a directory of small assets. A page load fetches all of
+them: over HTTP/1.1 like a browser, spread over a few keep-alive connections
+with one request in flight on each, and over HTTP/2 on a single connection
+with all streams multiplexed. Each page client keeps its connections open
+between page loads. HTTP/2 is measured over TLS (ALPN h2) and, with --h2c,
+over cleartext with prior knowledge. Server CPU time per page is read from
+/proc on Linux.
+
+    python benchmarks/http2_benchmark.py
+    python benchmarks/http2_benchmark.py --assets 100 --asset-size 2048 --clients 8 --h2c
+    python benchmarks/http2_benchmark.py --cert cert.pem --key key.pem
+
+Needs the h2 package, and the openssl command unless --cert and --key are given.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import h2.config
+import h2.connection
+import h2.events
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyserve.core.server import AsyncHTTPServer, TLSContext
+from pyserve.core.server.loop import run
+
+HOST = '127.0.0.1'
+
+
+def create_certificate(directory: str) -> Tuple[str, str]:
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1',
+                    '-nodes', '-days', '1', '-subj', f'/CN={HOST}', '-keyout', key, '-out', cert],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def serve(port: int, static_dir: str, cert: Optional[str], key: Optional[str], max_streams: int) -> None:
+    tls = TLSContext(cert, key, reload_interval=0) if cert else None
+    server = AsyncHTTPServer(HOST, port, static_dir=static_dir, template_dir=static_dir, backlog=1024,
+                             do_check_proxy_availability=False, tls=tls, h2c=tls is None,
+                             http2_max_concurrent_streams=max_streams, keep_alive_max_requests=0)
+    # Errors only, per-request logging would dominate the measurement
+    logging.getLogger('pyserve').setLevel(logging.ERROR)
+    run(server.start(), 'asyncio')
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """User and system CPU time of a process, None where /proc is not available"""
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            fields = file.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def connect(port: int, context: Optional[ssl.SSLContext]) -> socket.socket:
+    sock = socket.create_connection((HOST, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if context is not None:
+        sock = context.wrap_socket(sock, server_hostname=HOST)
+    return sock
+
+
+class HTTP1Connection:
+    """A keep-alive connection fetching one asset at a time"""
+
+    def __init__(self, port: int, context: Optional[ssl.SSLContext]):
+        self.sock = connect(port, context)
+        self.buffer = b''
+
+    def get(self, path: str) -> int:
+        self.sock.sendall(f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode())
+        while b'\r\n\r\n' not in self.buffer:
+            self._recv()
+        head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+        length = 0
+        for line in head.split(b'\r\n')[1:]:
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'content-length':
+                length = int(value)
+        while len(self.buffer) < length:
+            self._recv()
+        self.buffer = self.buffer[length:]
+        return length
+
+    def _recv(self) -> None:
+        data = self.sock.recv(65536)
+        if not data:
+            raise ConnectionError("Server closed the connection")
+        self.buffer += data
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class HTTP2Client:
+    """One connection fetching all assets of a page as concurrent streams"""
+
+    def __init__(self, port: int, context: Optional[ssl.SSLContext]):
+        self.sock = connect(port, context)
+        self.conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=True))
+        self.conn.initiate_connection()
+        self.sock.sendall(self.conn.data_to_send())
+        self.authority = f'{HOST}:{port}'
+        self.scheme = 'https' if context is not None else 'http'
+
+    def get_all(self, paths: List[str]) -> int:
+        pending = list(paths)
+        received: Dict[int, int] = {}
+        done = 0
+        total = 0
+        while done < len(paths):
+            # Open as many streams as the server allows
+            while pending and self.conn.open_outbound_streams < self.conn.remote_settings.max_concurrent_streams:
+                stream_id = self.conn.get_next_available_stream_id()
+                self.conn.send_headers(stream_id, [
+                    (':method', 'GET'), (':scheme', self.scheme),
+                    (':authority', self.authority), (':path', pending.pop())
+                ], end_stream=True)
+                received[stream_id] = 0
+            self.sock.sendall(self.conn.data_to_send())
+
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("Server closed the connection")
+            for event in self.conn.receive_data(data):
+                if isinstance(event, h2.events.DataReceived):
+                    received[event.stream_id] += len(event.data)
+                    self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    total += received.pop(event.stream_id)
+                    done += 1
+                elif isinstance(event, h2.events.StreamReset):
+                    raise ConnectionError(f"Stream {event.stream_id} was reset: {event.error_code!r}")
+        self.sock.sendall(self.conn.data_to_send())
+        return total
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def http1_client(port: int, context: Optional[ssl.SSLContext], paths: List[str], connections: int,
+                 deadline: float, latencies: List[float]) -> None:
+    conns = [HTTP1Connection(port, context) for _ in range(connections)]
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            # Each connection works through its share of the page, like a browser's per-origin pool
+            threads = [threading.Thread(target=lambda conn, share: [conn.get(path) for path in share],
+                                        args=(conn, paths[i::connections]))
+                       for i, conn in enumerate(conns)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            latencies.append(time.perf_counter() - started)
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def http2_client(port: int, context: Optional[ssl.SSLContext], paths: List[str], connections: int,
+                 deadline: float, latencies: List[float]) -> None:
+    client = HTTP2Client(port, context)
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            client.get_all(paths)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        client.close()
+
+
+def load(target, port: int, context: Optional[ssl.SSLContext], paths: List[str],
+         args: argparse.Namespace, duration: float) -> List[float]:
+    latencies: List[float] = []
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=target, args=(port, context, paths, args.connections, deadline, latencies))
+               for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def benchmark(name: str, target, port: int, context: Optional[ssl.SSLContext], paths: List[str],
+              static_dir: str, cert: Optional[str], key: Optional[str], args: argparse.Namespace) -> None:
+    process = multiprocessing.Process(target=serve, args=(port, static_dir, cert, key, args.max_streams),
+                                      daemon=True)
+    process.start()
+    try:
+        wait_for_port(port)
+        load(target, port, context, paths, args, 1.0)
+        cpu_before = cpu_seconds(process.pid)
+        latencies = load(target, port, context, paths, args, args.duration)
+        cpu_after = cpu_seconds(process.pid)
+    finally:
+        process.terminate()
+        process.join()
+
+    pages = len(latencies)
+    cpu = ""
+    if cpu_before is not None and cpu_after is not None and pages:
+        cpu = f"   server CPU {(cpu_after - cpu_before) / pages * 1000:6.2f} ms/page"
+    print(f"{name:<22} {pages / args.duration:>7.1f} pages/s {pages * len(paths) / args.duration:>8.0f} req/s"
+          f"   p50 {percentile(latencies, 0.5) * 1000:7.2f} ms"
+          f"   p99 {percentile(latencies, 0.99) * 1000:7.2f} ms{cpu}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare page loads over HTTP/1.1 keep-alive and HTTP/2')
+    parser.add_argument('--assets', type=int, default=50, help='Assets per page')
+    parser.add_argument('--asset-size', type=int, default=4096, help='Bytes per asset')
+    parser.add_argument('--connections', type=int, default=6,
+                        help='HTTP/1.1 connections per page client (browsers use 6 per origin)')
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent page clients')
+    parser.add_argument('--max-streams', type=int, default=100, help='Server max_concurrent_streams')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds to measure each case')
+    parser.add_argument('--port', type=int, default=8875, help='First port to use')
+    parser.add_argument('--h2c', action='store_true', help='Also compare over cleartext (prior knowledge h2c)')
+    parser.add_argument('--cert', help='Certificate to use instead of generating one')
+    parser.add_argument('--key', help='Private key of --cert')
+    args = parser.parse_args()
+    if bool(args.cert) != bool(args.key):
+        parser.error("--cert and --key go together")
+
+    with tempfile.TemporaryDirectory() as directory:
+        static_dir = os.path.join(directory, 'static')
+        os.mkdir(static_dir)
+        paths = []
+        for i in range(args.assets):
+            with open(os.path.join(static_dir, f'asset{i}.js'), 'wb') as file:
+                file.write(os.urandom(args.asset_size))
+            paths.append(f'/asset{i}.js')
+        cert, key = (args.cert, args.key) if args.cert else create_certificate(directory)
+
+        def client_context(alpn: str) -> ssl.SSLContext:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            context.set_alpn_protocols([alpn])
+            return context
+
+        cases = [
+            ('TLS', [('HTTP/1.1 keep-alive', http1_client, client_context('http/1.1')),
+                     ('HTTP/2 (ALPN h2)', http2_client, client_context('h2'))], cert, key),
+        ]
+        if args.h2c:
+            cases.append(('cleartext', [('HTTP/1.1 keep-alive', http1_client, None),
+                                        ('HTTP/2 (h2c)', http2_client, None)], None, None))
+
+        print(f"{args.clients} clients, {args.assets} assets of {args.asset_size} bytes per page, "
+              f"{args.connections} HTTP/1.1 connections or 1 HTTP/2 connection per client, "
+              f"{args.duration:g}s per case")
+        port = args.port
+        for transport, runs, cert_file, key_file in cases:
+            print(transport)
+            for name, target, context in runs:
+                benchmark(name, target, port, context, paths, static_dir, cert_file, key_file, args)
+                port += 1
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Compare PyServe's throughput on the asyncio and uvloop event loops, with
+the stream-based and the Protocol-based connection handling (server.io_mode).
+
+For every combination an AsyncHTTPServer serving one static file runs in a
+child process, and this process drives it over keep-alive connections for
+a fixed time. The client always runs on the same loop so only the server
+side changes between runs.
+
+    python benchmarks/loop_benchmark.py
+    python benchmarks/loop_benchmark.py --connections 100 --duration 20 --size 65536
+    python benchmarks/loop_benchmark.py --io-modes protocol
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyserve.core.server import AsyncHTTPServer
+from pyserve.core.server.tcp import IO_MODES
+from pyserve.core.server.loop import run, uvloop_available
+
+HOST = '127.0.0.1'
+
+
+def serve(event_loop: str, io_mode: str, port: int, static_dir: str) -> None:
+    server = AsyncHTTPServer(HOST, port, static_dir=static_dir, template_dir=static_dir, backlog=1024,
+                             do_check_proxy_availability=False, keep_alive_max_requests=0, io_mode=io_mode)
+    # Errors only, per-request logging would dominate the measurement
+    logging.getLogger('pyserve').setLevel(logging.ERROR)
+    run(server.start(), event_loop)
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def client(port: int, path: str, deadline: float, latencies: List[float]) -> int:
+    reader, writer = await asyncio.open_connection(HOST, port)
+    request = f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode()
+    completed = 0
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            completed += 1
+    finally:
+        writer.close()
+    return completed
+
+
+async def load(port: int, path: str, connections: int, duration: float) -> Tuple[int, List[float]]:
+    latencies: List[float] = []
+    deadline = time.monotonic() + duration
+    counts = await asyncio.gather(*(client(port, path, deadline, latencies) for _ in range(connections)))
+    return sum(counts), latencies
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def benchmark(event_loop: str, io_mode: str, port: int, static_dir: str, args: argparse.Namespace) -> None:
+    process = multiprocessing.Process(target=serve, args=(event_loop, io_mode, port, static_dir), daemon=True)
+    process.start()
+    try:
+        wait_for_port(port)
+        # Warm up caches and connections before measuring
+        run(load(port, '/bench.bin', args.connections, 1.0), args.client_loop)
+        requests, latencies = run(load(port, '/bench.bin', args.connections, args.duration), args.client_loop)
+    finally:
+        process.terminate()
+        process.join()
+
+    print(f"{event_loop + '/' + io_mode:<17} {requests / args.duration:>10.0f} req/s"
+          f"   p50 {percentile(latencies, 0.5) * 1000:6.2f} ms"
+          f"   p99 {percentile(latencies, 0.99) * 1000:6.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare PyServe on the asyncio and uvloop event loops and I/O modes')
+    parser.add_argument('--connections', type=int, default=50, help='Concurrent keep-alive connections')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to measure each loop')
+    parser.add_argument('--size', type=int, default=1024, help='Size of the served file in bytes')
+    parser.add_argument('--port', type=int, default=8765, help='First port to use')
+    parser.add_argument('--client-loop', choices=['asyncio', 'uvloop'], default='asyncio',
+                        help='Event loop of the load generator')
+    parser.add_argument('--io-modes', type=str, default=','.join(IO_MODES),
+                        help='Comma separated server I/O modes to measure')
+    args = parser.parse_args()
+
+    loops = ['asyncio']
+    if uvloop_available():
+        loops.append('uvloop')
+    else:
+        print("uvloop is not installed (pip install uvloop), measuring asyncio only")
+    if args.client_loop == 'uvloop' and not uvloop_available():
+        parser.error("--client-loop uvloop requires uvloop")
+
+    with tempfile.TemporaryDirectory() as static_dir:
+        with open(os.path.join(static_dir, 'bench.bin'), 'wb') as file:
+            file.write(os.urandom(args.size))
+
+        print(f"{args.connections} connections, {args.duration:g}s per run, {args.size} byte file")
+        port = args.port
+        for event_loop in loops:
+            for io_mode in args.io_modes.split(','):
+                benchmark(event_loop, io_mode.strip(), port, static_dir, args)
+                port += 1
+
+
+if __name__ == '__main__':
+    main()
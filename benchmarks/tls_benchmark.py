@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Measure what TLS session resumption saves on handshakes (ssl section).
+
+An AsyncHTTPServer with a throwaway self-signed certificate runs in a child
+process. Clients connect, make one request and disconnect, once with a full
+handshake on every connection and once resuming the session of their
+previous connection. Resumption is measured with session tickets and with
+the server's session cache (session_tickets: false), on TLS 1.3 and 1.2.
+Server CPU time per handshake is read from /proc on Linux.
+
+    python benchmarks/tls_benchmark.py
+    python benchmarks/tls_benchmark.py --connections 4 --duration 10 --key-type rsa:4096
+    python benchmarks/tls_benchmark.py --cert cert.pem --key key.pem
+
+Creating the certificate needs the openssl command unless --cert and --key are given.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyserve.core.server import AsyncHTTPServer, TLSContext
+from pyserve.core.server.loop import run
+
+HOST = '127.0.0.1'
+TLS_VERSIONS = {'1.3': ssl.TLSVersion.TLSv1_3, '1.2': ssl.TLSVersion.TLSv1_2}
+
+
+def create_certificate(directory: str, key_type: str) -> Tuple[str, str]:
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    if key_type.startswith('ec:'):
+        new_key = ['-newkey', 'ec', '-pkeyopt', f'ec_paramgen_curve:{key_type[3:]}']
+    else:
+        new_key = ['-newkey', key_type]
+    subprocess.run(['openssl', 'req', '-x509', *new_key, '-nodes', '-days', '1', '-subj', f'/CN={HOST}',
+                    '-keyout', key, '-out', cert], check=True, capture_output=True)
+    return cert, key
+
+
+def serve(port: int, static_dir: str, cert: str, key: str, session_tickets: bool) -> None:
+    tls = TLSContext(cert, key, session_tickets=session_tickets, reload_interval=0)
+    server = AsyncHTTPServer(HOST, port, static_dir=static_dir, template_dir=static_dir, backlog=1024,
+                             do_check_proxy_availability=False, tls=tls)
+    # Errors only, per-request logging would dominate the measurement
+    logging.getLogger('pyserve').setLevel(logging.ERROR)
+    run(server.start(), 'asyncio')
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """User and system CPU time of a process, None where /proc is not available"""
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            fields = file.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def client(port: int, context: ssl.SSLContext, resume: bool, deadline: float,
+           latencies: List[float], reused: List[bool]) -> None:
+    request = f"GET /bench.txt HTTP/1.1\r\nHost: {HOST}\r\nConnection: close\r\n\r\n".encode()
+    session = None
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        with socket.create_connection((HOST, port)) as sock:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with context.wrap_socket(sock, server_hostname=HOST, session=session) as tls:
+                latencies.append(time.perf_counter() - started)
+                reused.append(tls.session_reused)
+                tls.sendall(request)
+                # TLS 1.3 tickets arrive after the handshake, read the response before taking the session
+                while tls.recv(65536):
+                    pass
+                if resume:
+                    session = tls.session
+
+
+def load(port: int, version: str, resume: bool, connections: int,
+         duration: float) -> Tuple[List[float], List[bool]]:
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    context.minimum_version = context.maximum_version = TLS_VERSIONS[version]
+    latencies: List[float] = []
+    reused: List[bool] = []
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=client, args=(port, context, resume, deadline, latencies, reused))
+               for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, reused
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def benchmark(name: str, port: int, version: str, resume: bool, session_tickets: bool,
+              static_dir: str, cert: str, key: str, args: argparse.Namespace) -> None:
+    process = multiprocessing.Process(target=serve, args=(port, static_dir, cert, key, session_tickets), daemon=True)
+    process.start()
+    try:
+        wait_for_port(port)
+        load(port, version, resume, args.connections, 1.0)
+        cpu_before = cpu_seconds(process.pid)
+        latencies, reused = load(port, version, resume, args.connections, args.duration)
+        cpu_after = cpu_seconds(process.pid)
+    finally:
+        process.terminate()
+        process.join()
+
+    handshakes = len(latencies)
+    cpu = ""
+    if cpu_before is not None and cpu_after is not None and handshakes:
+        cpu = f"   server CPU {(cpu_after - cpu_before) / handshakes * 1e6:7.0f} us/conn"
+    print(f"{name:<26} {handshakes / args.duration:>8.0f} conn/s"
+          f"   p50 {percentile(latencies, 0.5) * 1000:6.2f} ms"
+          f"   p99 {percentile(latencies, 0.99) * 1000:6.2f} ms"
+          f"   resumed {sum(reused) / max(handshakes, 1):4.0%}{cpu}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare full and resumed TLS handshakes against PyServe')
+    parser.add_argument('--connections', type=int, default=2, help='Concurrent client threads')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds to measure each case')
+    parser.add_argument('--port', type=int, default=8865, help='First port to use')
+    parser.add_argument('--key-type', default='rsa:2048',
+                        help='Key of the generated certificate: rsa:BITS or ec:CURVE (e.g. ec:prime256v1)')
+    parser.add_argument('--cert', help='Certificate to use instead of generating one')
+    parser.add_argument('--key', help='Private key of --cert')
+    parser.add_argument('--tls-versions', default=','.join(TLS_VERSIONS),
+                        help='Comma separated TLS versions to measure')
+    args = parser.parse_args()
+    if bool(args.cert) != bool(args.key):
+        parser.error("--cert and --key go together")
+
+    cases = [
+        ('full handshake', False, True),
+        ('resumed (session ticket)', True, True),
+        ('resumed (session cache)', True, False),
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'bench.txt'), 'wb') as file:
+            file.write(b'x' * 128)
+        cert, key = (args.cert, args.key) if args.cert else create_certificate(directory, args.key_type)
+
+        print(f"{args.connections} clients, {args.duration:g}s per case, one request per connection")
+        port = args.port
+        for version in args.tls_versions.split(','):
+            version = version.strip()
+            print(f"TLS {version}")
+            for name, resume, session_tickets in cases:
+                benchmark(name, port, version, resume, session_tickets, directory, cert, key, args)
+                port += 1
+
+
+if __name__ == '__main__':
+    main()
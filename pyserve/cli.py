@@ -12,6 +12,26 @@ from . import AsyncHTTPServer, Configuration, get_logger, TestConfiguration
 from . import __version__
 from .vibe.vibe_config import VibeConfig
 from .vibe.service import VibeService
+from .http.request import DEFAULT_MAX_HEADER_SIZE, DEFAULT_MAX_BODY_SIZE, DEFAULT_BODY_BUFFER_SIZE
+from .core.cache.static import DEFAULT_STATIC_CACHE_SIZE, DEFAULT_STATIC_CACHE_ENTRY_SIZE
+from .core.cache.stat_cache import DEFAULT_STAT_CACHE_TTL, DEFAULT_STAT_CACHE_ENTRIES
+from .http.compression import DEFAULT_COMPRESSION_MIN_SIZE
+from .core.cache.compressed import DEFAULT_COMPRESSED_CACHE_SIZE
+from .utils.compression import (SIDECAR_SUFFIXES, DEFAULT_PRECOMPRESS_MIN_SIZE, available_encodings,
+                                precompress_directory)
+from .core.server.supervisor import WorkerSupervisor, reuse_port_supported, STOP_TIMEOUT_MARGIN
+from .core.server.tcp import DEFAULT_SHUTDOWN_TIMEOUT
+from .core.server.upgrade import Upgrade, inherited_sockets, take_ready_fd, notify_ready
+from .core.server.sockets import Listener, adopt_sockets
+from .core.server.tls import TLSContext, default_alpn
+from .core.server.http2 import (DEFAULT_MAX_CONCURRENT_STREAMS, DEFAULT_INITIAL_WINDOW_SIZE, DEFAULT_HEADER_TABLE_SIZE,
+                                DEFAULT_IDLE_TIMEOUT, http2_available)
+from .core.server.vhost import VirtualHost, host_certificates
+from .core.server.base import DEFAULT_BACKLOG
+from .core.server.admission import DEFAULT_RETRY_AFTER
+from .core.server.timeouts import (DEFAULT_HEADER_TIMEOUT, DEFAULT_BODY_TIMEOUT, DEFAULT_WRITE_TIMEOUT, DEFAULT_MIN_RATE,
+                                   DEFAULT_MIN_RATE_GRACE)
+from .core.server.loop import EVENT_LOOPS, get_loop_name, uvloop_available, run as run_event_loop
 
 
 def parse_arguments():
@@ -32,6 +52,8 @@ Examples:
   pyserve --proxy host:port/path      # Enable reverse proxy
   pyserve --ssl --cert ./ssl/cert.pem --key ./ssl/key.pem  # Run with HTTPS
   pyserve --vibe-serving              # Enable AI-generated content
+  pyserve -w 4                        # Run 4 worker processes
+  pyserve precompress                 # Create .br/.gz files for static_dir
 """.format(__version__)
     )
     
@@ -49,6 +71,10 @@ Examples:
                         help='Show PyServe version and exit')
     parser.add_argument('-d', '--debug', action='store_true',
                         help='Enable debug mode (more verbose logging)')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='Number of worker processes (overrides config)')
+    parser.add_argument('--loop', type=str, choices=EVENT_LOOPS,
+                        help='Event loop implementation, auto uses uvloop if installed (overrides config)')
     parser.add_argument('--proxy', type=str,
                         help='Configure reverse proxy with format host:port/path')
     parser.add_argument('--test', type=str, choices=['all', 'configuration', 'directories'],
@@ -68,27 +94,228 @@ Examples:
     ssl_group.add_argument('--ssl-config', action='store_true',
                         help='Configure SSL settings in the config file and exit')
     
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    precompress_parser = subparsers.add_parser(
+        'precompress',
+        help='Create .br/.gz files next to static files, served with http.precompressed'
+    )
+    precompress_parser.add_argument('directory', nargs='?',
+                                    help='Directory to compress (defaults to static_dir from the config)')
+    precompress_parser.add_argument('--encodings', type=str,
+                                    help='Comma separated content codings to create: gzip, br (defaults to all available)')
+    precompress_parser.add_argument('--min-size', type=int, default=DEFAULT_PRECOMPRESS_MIN_SIZE,
+                                    help='Skip files smaller than this many bytes')
+    precompress_parser.add_argument('--level', type=int, default=9,
+                                    help='Compression level (gzip up to 9, brotli up to 11)')
+    precompress_parser.add_argument('-j', '--jobs', type=int,
+                                    help='Number of worker processes (defaults to the CPU count)')
+    precompress_parser.add_argument('--force', action='store_true',
+                                    help='Recreate files that are already up to date')
+    
     return parser.parse_args()
 
-def setup_signal_handlers(loop, server):
+def setup_signal_handlers(loop, server, shutdown_config, worker=False):
     if sys.platform == 'win32':
         pass # Hope that KeyboardInterrupt will work fine on Windows
     else:
+        if worker:
+            # Upgrades are run by the supervisor
+            loop.add_signal_handler(signal.SIGUSR2, lambda: None)
+        else:
+            upgrade_lock = asyncio.Lock()
+            loop.add_signal_handler(
+                signal.SIGUSR2,
+                lambda: asyncio.create_task(upgrade(server, shutdown_config, upgrade_lock))
+            )
         for sig in (signal.SIGINT, signal.SIGTERM):
             loop.add_signal_handler(
                 sig,
-                lambda: asyncio.create_task(shutdown(loop, server))
+                lambda: asyncio.create_task(shutdown(server, shutdown_config))
             )
+        loop.add_signal_handler(
+            signal.SIGHUP,
+            lambda: asyncio.create_task(server.reload())
+        )
+        loop.add_signal_handler(signal.SIGUSR1, server.log_stats)
 
-async def shutdown(loop, server):
-    await server.stop()
-    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
-    
-    for task in tasks:
-        task.cancel()
-    
-    await asyncio.gather(*tasks, return_exceptions=True)
-    loop.stop()
+async def shutdown(server, shutdown_config):
+    # Drains connections, server.start() returns afterwards and the event loop
+    # cancels what is left. A second signal skips the rest of the drain.
+    await server.shutdown(
+        shutdown_config.get('timeout', DEFAULT_SHUTDOWN_TIMEOUT),
+        shutdown_config.get('readiness_delay', 0)
+    )
+
+async def upgrade(server, shutdown_config, lock):
+    """Hand the listening sockets to a new generation and drain this one once it serves (SIGUSR2)"""
+    if lock.locked() or server.draining:
+        get_logger().warning("Ignoring SIGUSR2, an upgrade or shutdown is already in progress")
+        return
+    async with lock:
+        new_generation = Upgrade([listener.sock for listener in server.listeners if listener.sock is not None])
+        if new_generation.start() and await new_generation.wait():
+            for listener in server.listeners:
+                listener.handed_over = True
+            await shutdown(server, shutdown_config)
+
+async def notify_ready_when_started(server):
+    """Let the generation this one replaces drain once the server accepts"""
+    await server.wait_started()
+    notify_ready()
+
+def get_stop_timeout(config) -> float:
+    """Seconds the supervisor gives workers to drain before killing them"""
+    shutdown_config = config.server_config.get('shutdown', {})
+    drain_time = shutdown_config.get('timeout', DEFAULT_SHUTDOWN_TIMEOUT) + shutdown_config.get('readiness_delay', 0)
+    return drain_time + STOP_TIMEOUT_MARGIN
+
+def load_startup_config(args):
+    """Configuration needed before the event loop starts, None for commands and one-shot options"""
+    if args.version or args.test or args.ssl_config or args.command:
+        return None
+    return Configuration(args.config)
+
+def get_worker_count(args, config) -> int:
+    """Number of server processes to run"""
+    if config is None or args.vibe_serving:
+        return 1
+    return args.workers or config.server_config.get('workers', 1)
+
+def get_event_loop(args, config) -> str:
+    """Event loop implementation to run on: auto, asyncio or uvloop"""
+    if args.loop:
+        return args.loop
+    if config is None:
+        return 'asyncio'
+    return config.server_config.get('event_loop', 'auto')
+
+def build_listeners(args, config) -> list:
+    """Listeners from server.listeners, or one on host and port (also when -H or -p are given)"""
+    host = args.host or config.server_config.get('host')
+    backlog = config.server_config.get('backlog', DEFAULT_BACKLOG)
+    entries = config.server_config.get('listeners')
+    if not entries or args.host or args.port:
+        return [Listener(host, args.port or config.server_config.get('port'), backlog=backlog)]
+    return [
+        Listener(
+            host=entry.get('host', host),
+            port=entry.get('port'),
+            path=entry.get('path'),
+            tls=entry.get('tls', False),
+            backlog=entry.get('backlog', backlog),
+            options=entry.get('options'),
+            mode=entry.get('mode')
+        )
+        for entry in entries
+    ]
+
+def build_virtual_hosts(config) -> list:
+    """Virtual hosts from server.virtual_hosts"""
+    return [VirtualHost.from_config(entry) for entry in config.server_config.get('virtual_hosts', [])]
+
+def build_tls(args, config, listeners, logger):
+    """TLSContext from the ssl section and --cert/--key, None when HTTPS is off or the files are missing"""
+    ssl_config = config.ssl_config
+    if not (args.ssl or ssl_config.enabled or any(listener.tls for listener in listeners)):
+        return None
+
+    ssl_cert = args.cert or ssl_config.cert_file
+    ssl_key = args.key or ssl_config.key_file
+    if not ssl_cert or not os.path.isfile(ssl_cert):
+        logger.error(f"SSL certificate file not found: {ssl_cert}")
+        logger.info("Disabling SSL. Run with --ssl, --cert and --key to specify valid certificate files.")
+        return None
+    if not ssl_key or not os.path.isfile(ssl_key):
+        logger.error(f"SSL key file not found: {ssl_key}")
+        logger.info("Disabling SSL. Run with --ssl, --cert and --key to specify valid certificate files.")
+        return None
+
+    return TLSContext(
+        ssl_cert,
+        ssl_key,
+        hosts=host_certificates(build_virtual_hosts(config)),
+        ciphers=ssl_config.ciphers,
+        ecdh_curve=ssl_config.ecdh_curve,
+        alpn=ssl_config.alpn if ssl_config.alpn is not None else
+        default_alpn(config.server_config.get('http2', {}).get('enabled', True)),
+        session_tickets=ssl_config.session_tickets,
+        num_tickets=ssl_config.num_tickets,
+        reload_interval=ssl_config.reload_interval
+    )
+
+def run_workers(args, config, workers, event_loop, listen_socks) -> int:
+    """Run the server in pre-forked worker processes, returns the exit code"""
+    logger = setup_logger(config)
+    listeners = build_listeners(args, config)
+
+    reuse_port = config.server_config.get('reuse_port', True)
+    if reuse_port and not reuse_port_supported():
+        logger.info("SO_REUSEPORT does not balance connections on this platform, workers share the listening sockets")
+        reuse_port = False
+    for listener in listeners:
+        listener.reuse_port = reuse_port and listener.path is None
+    adopt_sockets(listeners, listen_socks)
+
+    try:
+        tls = build_tls(args, config, listeners, logger)
+    except ValueError as e:
+        logger.critical(f"Failed to start server: {e}")
+        return 1
+
+    supervisor = WorkerSupervisor(
+        workers,
+        lambda: run_event_loop(run_server(listeners=listeners, worker=True, tls=tls), event_loop),
+        listeners,
+        stop_timeout=get_stop_timeout(config),
+        ready_fd=take_ready_fd()
+    )
+    try:
+        return supervisor.run()
+    except OSError as e:
+        logger.critical(f"Failed to start server: {e}")
+        return 1
+
+def setup_logger(config):
+    log_level = config.get_log_level()
+    logger_config = config.logging_config
+    return get_logger(
+        level=log_level,
+        log_file=logger_config.get('log_file'),
+        console_output=logger_config.get('console_output', True),
+        use_colors=logger_config.get('use_colors', True),
+        use_rotation=logger_config.get('use_rotation', False),
+        max_log_size=logger_config.get('max_log_size', 10485760),
+        backup_count=logger_config.get('backup_count', 5),
+        structured_logs=logger_config.get('structured_logs', False)
+    )
+
+def precompress(args, config, logger) -> int:
+    """Run the precompress command, returns the exit code"""
+    directory = args.directory or args.static or config.http_config.get('static_dir', './static')
+    if not os.path.isdir(directory):
+        logger.error(f"Directory not found: {directory}")
+        return 1
+        
+    available = available_encodings()
+    if args.encodings:
+        encodings = [encoding.strip() for encoding in args.encodings.split(',') if encoding.strip()]
+        for encoding in encodings:
+            if encoding not in SIDECAR_SUFFIXES:
+                logger.error(f"Unknown encoding: {encoding}. Must be one of: {', '.join(SIDECAR_SUFFIXES)}")
+                return 1
+            if encoding not in available:
+                logger.error(f"Encoding {encoding} is not available, install the brotli package")
+                return 1
+    else:
+        encodings = available
+        if 'br' not in available:
+            logger.info("brotli is not installed, creating gzip files only")
+            
+    logger.info(f"Precompressing {os.path.abspath(directory)} ({', '.join(encodings)})...")
+    files, written = precompress_directory(directory, encodings, min_size=args.min_size,
+                                           level=args.level, workers=args.jobs, force=args.force)
+    logger.info(f"Precompressed {files} files, {written} compressed files written")
+    return 0
 
 def parse_proxy_arg(proxy_arg):
     if not proxy_arg:
@@ -120,7 +347,7 @@ def parse_proxy_arg(proxy_arg):
         print("Format should be host:port/path")
         sys.exit(1)
 
-async def run_server():
+async def run_server(listeners=None, listen_socks=(), worker=False, tls=None):
     args = parse_arguments()
     
     if args.version:
@@ -160,7 +387,7 @@ async def run_server():
             port=port,
             static_dir=config.http_config.get('static_dir', './static'),
             template_dir=config.http_config.get('templates_dir', './templates'),
-            backlog=config.server_config.get('backlog', 5),
+            backlog=config.server_config.get('backlog', DEFAULT_BACKLOG),
             debug=args.debug or config.get_log_level() <= 10,
             redirections=config.redirections,
             locations=config.locations,
@@ -198,17 +425,10 @@ async def run_server():
 
     config = Configuration(args.config)
     log_level = config.get_log_level()
-    logger_config = config.logging_config
-    logger = get_logger(
-        level=log_level,
-        log_file=logger_config.get('log_file'),
-        console_output=logger_config.get('console_output', True),
-        use_colors=logger_config.get('use_colors', True),
-        use_rotation=logger_config.get('use_rotation', False),
-        max_log_size=logger_config.get('max_log_size', 10485760),
-        backup_count=logger_config.get('backup_count', 5),
-        structured_logs=logger_config.get('structured_logs', False)
-    )
+    logger = setup_logger(config)
+
+    if args.command == 'precompress':
+        sys.exit(precompress(args, config, logger))
 
     # Routing extension integration (V2)
     routing_extension = config.get_extension('routing') if hasattr(config, 'get_extension') else None
@@ -262,34 +482,30 @@ async def run_server():
     
     host = args.host or config.server_config.get('host')
     port = args.port or config.server_config.get('port')
-    backlog = config.server_config.get('backlog')
+    backlog = config.server_config.get('backlog', DEFAULT_BACKLOG)
     static_dir = args.static or config.http_config.get('static_dir')
     template_dir = args.templates or config.http_config.get('templates_dir')
     reverse_proxy = config.server_config.get('reverse_proxy', [])
+    keep_alive_config = config.server_config.get('keep_alive', {})
+    limits_config = config.server_config.get('limits', {})
+    timeouts_config = config.server_config.get('timeouts', {})
+    shutdown_config = config.server_config.get('shutdown', {})
+    static_cache_config = config.http_config.get('static_cache', {})
+    stat_cache_config = config.http_config.get('stat_cache', {})
+    manifest_config = config.http_config.get('static_manifest', {})
+    compression_config = config.http_config.get('compression', {})
+    http2_config = config.server_config.get('http2', {})
 
-    use_ssl = args.ssl or config.ssl_config.enabled
-    ssl_cert = None
-    ssl_key = None
-
-    if use_ssl:
-        ssl_cert = args.cert or config.ssl_config.cert_file
-        ssl_key = args.key or config.ssl_config.key_file
-
-        if not ssl_cert or not os.path.isfile(ssl_cert):
-            logger.error(f"SSL certificate file not found: {ssl_cert}")
-            logger.info("Disabling SSL. Run with --ssl, --cert and --key to specify valid certificate files.")
-            use_ssl = False
-            ssl_cert = None
-            ssl_key = None
-        elif not ssl_key or not os.path.isfile(ssl_key):
-            logger.error(f"SSL key file not found: {ssl_key}")
-            logger.info("Disabling SSL. Run with --ssl, --cert and --key to specify valid certificate files.")
-            use_ssl = False
-            ssl_cert = None
-            ssl_key = None
+    if listeners is None:
+        listeners = build_listeners(args, config)
+        adopt_sockets(listeners, listen_socks)
 
     try:
         loop = asyncio.get_event_loop()
+        # Workers get the context the supervisor built, so they share its session ticket keys
+        if not worker:
+            tls = build_tls(args, config, listeners, logger)
+        use_ssl = tls is not None
 
         server = AsyncHTTPServer(
             host,
@@ -301,34 +517,87 @@ async def run_server():
             redirections=config.redirections,
             locations=config.locations,
             reverse_proxy=reverse_proxy,
-            ssl_cert=ssl_cert,
-            ssl_key=ssl_key,
+            tls=tls,
             do_check_proxy_availability=not args.skip_proxy_check,
             routing_extension=routing_extension,
-            default_root=getattr(config, 'default_root', True)
+            default_root=getattr(config, 'default_root', True),
+            keep_alive=keep_alive_config.get('enabled', True),
+            keep_alive_timeout=keep_alive_config.get('timeout', 5),
+            keep_alive_max_requests=keep_alive_config.get('max_requests', 100),
+            max_header_size=limits_config.get('max_header_size', DEFAULT_MAX_HEADER_SIZE),
+            max_body_size=limits_config.get('max_body_size', DEFAULT_MAX_BODY_SIZE),
+            body_buffer_size=limits_config.get('body_buffer_size', DEFAULT_BODY_BUFFER_SIZE),
+            sendfile=config.http_config.get('sendfile', True),
+            static_cache=static_cache_config.get('enabled', True),
+            static_cache_size=static_cache_config.get('max_size', DEFAULT_STATIC_CACHE_SIZE),
+            static_cache_entry_size=static_cache_config.get('max_entry_size', DEFAULT_STATIC_CACHE_ENTRY_SIZE),
+            static_cache_inotify=static_cache_config.get('inotify', False),
+            stat_cache_ttl=stat_cache_config.get('ttl', DEFAULT_STAT_CACHE_TTL) if stat_cache_config.get('enabled', True) else 0,
+            stat_cache_negative_ttl=stat_cache_config.get('negative_ttl'),
+            stat_cache_max_entries=stat_cache_config.get('max_entries', DEFAULT_STAT_CACHE_ENTRIES),
+            static_manifest=manifest_config.get('enabled', False),
+            static_manifest_watch=manifest_config.get('watch', False),
+            precompressed=config.http_config.get('precompressed', False),
+            compression=compression_config.get('enabled', False),
+            compression_encodings=compression_config.get('encodings'),
+            compression_min_size=compression_config.get('min_size', DEFAULT_COMPRESSION_MIN_SIZE),
+            compression_types=compression_config.get('types'),
+            compression_cache_size=compression_config.get('cache_size', DEFAULT_COMPRESSED_CACHE_SIZE),
+            compression_workers=compression_config.get('workers'),
+            listeners=listeners,
+            io_mode=config.server_config.get('io_mode', 'streams'),
+            max_connections=limits_config.get('max_connections', 0),
+            max_requests=limits_config.get('max_requests', 0),
+            max_loop_lag=limits_config.get('max_loop_lag', 0),
+            retry_after=limits_config.get('retry_after', DEFAULT_RETRY_AFTER),
+            header_timeout=timeouts_config.get('header', DEFAULT_HEADER_TIMEOUT),
+            body_timeout=timeouts_config.get('body', DEFAULT_BODY_TIMEOUT),
+            write_timeout=timeouts_config.get('write', DEFAULT_WRITE_TIMEOUT),
+            min_rate=timeouts_config.get('min_rate', DEFAULT_MIN_RATE),
+            min_rate_grace=timeouts_config.get('min_rate_grace', DEFAULT_MIN_RATE_GRACE),
+            readiness_path=shutdown_config.get('readiness_path'),
+            virtual_hosts=build_virtual_hosts(config),
+            http2=http2_config.get('enabled', True),
+            h2c=http2_config.get('h2c', False),
+            http2_max_concurrent_streams=http2_config.get('max_concurrent_streams', DEFAULT_MAX_CONCURRENT_STREAMS),
+            http2_initial_window_size=http2_config.get('initial_window_size', DEFAULT_INITIAL_WINDOW_SIZE),
+            http2_header_table_size=http2_config.get('header_table_size', DEFAULT_HEADER_TABLE_SIZE),
+            http2_idle_timeout=http2_config.get('idle_timeout', DEFAULT_IDLE_TIMEOUT)
         )
 
-        setup_signal_handlers(loop, server)
+        setup_signal_handlers(loop, server, shutdown_config, worker)
 
         protocol = "HTTPS" if use_ssl else "HTTP"
         logger.info(f"PyServe v{__version__} (Async {protocol}) starting")
+        if (args.loop or config.server_config.get('event_loop', 'auto')) == 'uvloop' and not uvloop_available():
+            logger.warning("uvloop is not installed, falling back to the asyncio event loop")
+        logger.info(f"Event loop: {get_loop_name(loop)}")
+        if http2_config.get('enabled') and not http2_available():
+            logger.warning("h2 is not installed, serving HTTP/1.1 only")
+        elif server.http2:
+            logger.info(f"HTTP/2 enabled: ALPN h2{', prior knowledge h2c' if server.http2.h2c else ''}")
         if args.debug:
             logger.debug(f"Configuration loaded: {config.server_config}")
 
-        protocol_url = "https" if use_ssl else "http"
-        logger.info(f"Server running at {protocol_url}://{host}:{port}/")
+        for listener in server.listeners:
+            logger.info(f"Server running at {listener.url()}")
+        for vhost in server.hosts:
+            if vhost is not server.default_host:
+                logger.info(f"Virtual host {', '.join(vhost.names)}: {vhost.static_dir}")
         logger.info(f"Static files directory: {os.path.abspath(static_dir)}")
         logger.info(f"Template files directory: {os.path.abspath(template_dir)}")
 
         if use_ssl:
-            logger.info(f"SSL enabled with certificate: {ssl_cert}")
+            logger.info(f"SSL enabled with certificate: {tls.cert_file}")
 
         if reverse_proxy:
             for proxy in reverse_proxy:
                 logger.info(f"Reverse proxy configured: {proxy['path']} -> {proxy['host']}:{proxy['port']}")
 
         try:
+            asyncio.create_task(notify_ready_when_started(server))
             await server.start()
+            logger.info("Server stopped")
         except asyncio.exceptions.CancelledError:
             logger.info("Server was cancelled by user")
             sys.exit(0)
@@ -346,8 +615,16 @@ async def run_server():
 
 def main():
     """Main entry point for PyServe CLI"""
+    args = parse_arguments()
     try:
-        asyncio.run(run_server()) # TODO: add uvloop support on Unix systems
+        config = load_startup_config(args)
+        workers = get_worker_count(args, config)
+        event_loop = get_event_loop(args, config)
+        # Set when started by a SIGUSR2 upgrade of a running server
+        listen_socks = inherited_sockets()
+        if workers > 1:
+            sys.exit(run_workers(args, config, workers, event_loop, listen_socks))
+        run_event_loop(run_server(listen_socks=listen_socks), event_loop)
     except KeyboardInterrupt:
         pass
 
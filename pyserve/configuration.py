@@ -11,6 +11,11 @@ from pyserve.core.config.loader import ConfigLoader
 from pyserve.core.config.validator import ConfigValidator
 from pyserve.core.exceptions import PyServeYAMLException
 from pyserve.core.extensions import BaseExtension, ExtensionRegistry
+from pyserve.core.server.tls import DEFAULT_NUM_TICKETS, DEFAULT_CERT_RELOAD_INTERVAL
+
+# Optional keys of the ssl section, kept as given when the configuration is saved
+SSL_TUNING_KEYS = ('ciphers', 'ecdh_curve', 'alpn', 'session_tickets', 'num_tickets', 'reload_interval')
+
 
 class SSLConfiguration:
     def __init__(self, config_dict: Optional[Dict[str, Any]] = None):
@@ -18,6 +23,13 @@ class SSLConfiguration:
         self.enabled = config.get('enabled', False)
         self.cert_file = config.get('cert_file', None)
         self.key_file = config.get('key_file', None)
+        self.ciphers = config.get('ciphers', None)
+        self.ecdh_curve = config.get('ecdh_curve', None)
+        self.alpn = config.get('alpn', None)
+        self.session_tickets = config.get('session_tickets', True)
+        self.num_tickets = config.get('num_tickets', DEFAULT_NUM_TICKETS)
+        self.reload_interval = config.get('reload_interval', DEFAULT_CERT_RELOAD_INTERVAL)
+        self._tuning = {key: config[key] for key in SSL_TUNING_KEYS if key in config}
         
     def is_properly_configured(self) -> bool:
         if not self.enabled:
@@ -38,7 +50,8 @@ class SSLConfiguration:
         return {
             'enabled': self.enabled,
             'cert_file': self.cert_file,
-            'key_file': self.key_file
+            'key_file': self.key_file,
+            **self._tuning
         }
 
 
@@ -0,0 +1,18 @@
+"""
+Caching utilities for PyServe
+"""
+from .compressed import CompressedCache
+from .manifest import StaticManifest, ManifestEntry
+from .stat_cache import StatCache
+from .static import StaticFileCache, StaticCacheEntry
+from .watcher import InotifyWatcher
+
+__all__ = [
+    'CompressedCache',
+    'StaticManifest',
+    'ManifestEntry',
+    'StatCache',
+    'StaticFileCache',
+    'StaticCacheEntry',
+    'InotifyWatcher'
+]
\ No newline at end of file
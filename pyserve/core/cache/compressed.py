@@ -0,0 +1,56 @@
+"""
+Cache of compressed response bodies
+"""
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+DEFAULT_COMPRESSED_CACHE_SIZE = 16777216  # 16 MB
+
+
+class CompressedCache:
+    """
+    LRU cache of compressed bodies bounded by the total number of cached bytes.
+
+    Keys must change whenever the uncompressed body does, e.g. include the
+    response's ETag.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_COMPRESSED_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Hashable, body: bytes) -> None:
+        if len(body) > self.max_size:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'size': self.size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
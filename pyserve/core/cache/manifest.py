@@ -0,0 +1,165 @@
+"""
+In-memory manifest of the static directory
+"""
+import asyncio
+import os
+import stat
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pyserve.core.cache.watcher import InotifyWatcher
+from pyserve.core.logging import get_logger
+from pyserve.utils.compression import SIDECAR_SUFFIXES
+
+REFRESH_DELAY = 0.5  # Seconds to wait for more changes before rescanning
+
+
+def make_etag(size: int, mtime_ns: int) -> str:
+    """Build the ETag for a file from its size and modification time"""
+    return f'"{mtime_ns // 1000000:x}-{size:x}"'
+
+
+class ManifestEntry(NamedTuple):
+    """A file found in the static directory."""
+    path: str  # Absolute file system path
+    size: int
+    mtime_ns: int
+    content_type: str
+    etag: str
+    variants: Dict[str, str]  # content coding -> path of the precompressed file
+
+
+class StaticManifest:
+    """
+    Snapshot of every file below a directory, keyed by URL path.
+
+    Lookups are a dict access, so requests for paths that don't exist are
+    answered without touching the disk. The snapshot is rebuilt with
+    refresh() (e.g. on SIGHUP) or, with watch enabled on Linux, shortly
+    after inotify reports a change. Symlinked directories are followed; one
+    reachable under several paths is listed under the first one found.
+    """
+
+    def __init__(self, root: str, content_type: Callable[[str], str], watch: bool = False):
+        self.root = os.path.abspath(root)
+        self.content_type = content_type
+        self.logger = get_logger()
+        self._entries: Dict[str, ManifestEntry] = {}
+        self._by_path: Dict[str, ManifestEntry] = {}
+        self._refresh_handle: Optional[asyncio.TimerHandle] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.watcher: Optional[InotifyWatcher] = None
+        if watch:
+            if InotifyWatcher.is_available():
+                self.watcher = InotifyWatcher(self._on_change)
+            else:
+                self.logger.warning("Static manifest: inotify is not available, use SIGHUP to refresh")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, url_path: str) -> Optional[ManifestEntry]:
+        """
+        Find the file for a URL path
+
+        Args:
+            url_path: Path relative to the static directory, e.g. /css/site.css
+
+        Returns:
+            Optional[ManifestEntry]: None if no such file existed at the last scan
+        """
+        return self._entries.get(url_path)
+
+    def lookup_path(self, path: str) -> Optional[ManifestEntry]:
+        """Find the entry for an absolute file system path"""
+        return self._by_path.get(path)
+
+    def scan(self) -> None:
+        """Rebuild the manifest from disk, blocking"""
+        self._set_entries(self._scan())
+        self.logger.info(f"Static manifest: {len(self._entries)} files in {self.root}")
+
+    async def refresh(self) -> None:
+        """Rebuild the manifest in a worker thread and swap it in"""
+        self._set_entries(await asyncio.to_thread(self._scan))
+        self.logger.info(f"Static manifest refreshed: {len(self._entries)} files in {self.root}")
+        self._watch_tree()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Scan the directory and start watching it if enabled"""
+        self.scan()
+        if self.watcher is not None and self.watcher.start(loop):
+            self._watch_tree()
+
+    def close(self) -> None:
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+        if self.watcher is not None:
+            self.watcher.close()
+
+    def _set_entries(self, entries: Dict[str, ManifestEntry]) -> None:
+        self._entries = entries
+        self._by_path = {entry.path: entry for entry in entries.values()}
+
+    def _scan(self) -> Dict[str, ManifestEntry]:
+        files: Dict[str, os.stat_result] = {}
+        for directory, names in self._walk():
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat_result = os.stat(path)
+                except OSError:
+                    continue
+                if stat.S_ISREG(stat_result.st_mode):
+                    files[path] = stat_result
+
+        entries: Dict[str, ManifestEntry] = {}
+        for path, stat_result in files.items():
+            variants = {}
+            for coding, suffix in SIDECAR_SUFFIXES.items():
+                if path + suffix in files:
+                    variants[coding] = path + suffix
+            url_path = '/' + os.path.relpath(path, self.root).replace(os.sep, '/')
+            entries[url_path] = ManifestEntry(
+                path=path,
+                size=stat_result.st_size,
+                mtime_ns=stat_result.st_mtime_ns,
+                content_type=self.content_type(path),
+                etag=make_etag(stat_result.st_size, stat_result.st_mtime_ns),
+                variants=variants
+            )
+        return entries
+
+    def _walk(self) -> Iterator[Tuple[str, List[str]]]:
+        """Yield each directory below the root with its file names, following symlinks without looping"""
+        visited = {os.path.realpath(self.root)}
+        for directory, subdirectories, names in os.walk(self.root, followlinks=True):
+            # Prune directories seen before, a link to an ancestor would otherwise be walked forever
+            for name in list(subdirectories):
+                real = os.path.realpath(os.path.join(directory, name))
+                if real in visited:
+                    subdirectories.remove(name)
+                else:
+                    visited.add(real)
+            yield directory, names
+
+    def _watch_tree(self) -> None:
+        if self.watcher is None or not self.watcher.is_running():
+            return
+        for directory, _ in self._walk():
+            self.watcher.watch(directory)
+
+    def _on_change(self, path: Optional[str]) -> None:
+        # Coalesce bursts of events (deploys, editors writing temp files) into one rescan
+        loop = asyncio.get_event_loop()
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+        self._refresh_handle = loop.call_later(REFRESH_DELAY, self._schedule_refresh)
+
+    def _schedule_refresh(self) -> None:
+        self._refresh_handle = None
+        if self._refresh_task is not None and not self._refresh_task.done():
+            # A scan is running, it may have missed this change
+            self._refresh_task.add_done_callback(lambda _: self._on_change(None))
+            return
+        self._refresh_task = asyncio.ensure_future(self.refresh())
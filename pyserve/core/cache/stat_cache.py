@@ -0,0 +1,94 @@
+"""
+TTL cache of file stat results, similar to nginx's open_file_cache
+"""
+import os
+import stat
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+DEFAULT_STAT_CACHE_TTL = 2.0
+DEFAULT_STAT_CACHE_ENTRIES = 10000
+
+
+class StatCache:
+    """
+    Caches os.stat() results for a few seconds, including misses.
+
+    Missing files are cached as negative entries so that repeated probes of
+    paths that don't exist (scanners, broken links) don't hit the disk either.
+    A ttl of 0 disables caching and every lookup goes to os.stat().
+    """
+
+    def __init__(self,
+                 ttl: float = DEFAULT_STAT_CACHE_TTL,
+                 negative_ttl: Optional[float] = None,
+                 max_entries: int = DEFAULT_STAT_CACHE_ENTRIES):
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Optional[os.stat_result]]]" = OrderedDict()
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        """
+        Get the stat result for path
+
+        Args:
+            path: File system path
+
+        Returns:
+            Optional[os.stat_result]: None if the path does not exist
+
+        Raises:
+            OSError: For errors other than a missing path (e.g. permission denied), these are not cached
+        """
+        now = time.monotonic()
+        entry = self._entries.get(path)
+        if entry is not None:
+            expires, stat_result = entry
+            if expires > now:
+                if stat_result is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return stat_result
+            del self._entries[path]
+
+        self.misses += 1
+        try:
+            stat_result = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            stat_result = None
+
+        ttl = self.ttl if stat_result is not None else self.negative_ttl
+        if ttl > 0 and self.max_entries > 0:
+            self._entries[path] = (now + ttl, stat_result)
+            if len(self._entries) > self.max_entries:
+                # Drop the oldest entry
+                self._entries.popitem(last=False)
+        return stat_result
+
+    def is_file(self, path: str) -> bool:
+        """Cached equivalent of os.path.isfile()"""
+        try:
+            stat_result = self.stat(path)
+        except OSError:
+            return False
+        return stat_result is not None and stat.S_ISREG(stat_result.st_mode)
+
+    def invalidate(self, path: str) -> None:
+        self._entries.pop(path, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses
+        }
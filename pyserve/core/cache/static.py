@@ -0,0 +1,144 @@
+"""
+In-memory cache for small static files
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from pyserve.core.cache.stat_cache import StatCache
+from pyserve.core.cache.watcher import InotifyWatcher
+
+DEFAULT_STATIC_CACHE_SIZE = 67108864  # 64 MB
+DEFAULT_STATIC_CACHE_ENTRY_SIZE = 1048576  # 1 MB
+
+
+class StaticCacheEntry(NamedTuple):
+    """Cached file contents with the headers to serve them."""
+    body: bytes
+    headers: Dict[str, str]
+    header_block: bytes  # headers pre-serialized for HTTPResponse
+    mtime_ns: int
+    size: int
+
+
+class StaticFileCache:
+    """
+    LRU cache of static files bounded by the total number of cached bytes.
+
+    Entries are validated against the file's mtime and size on every hit,
+    through the shared StatCache if one is given.
+    With inotify enabled (Linux), entries in watched directories are dropped
+    on change notifications instead and hits need no syscall at all.
+    """
+    
+    def __init__(self,
+                 max_size: int = DEFAULT_STATIC_CACHE_SIZE,
+                 max_entry_size: int = DEFAULT_STATIC_CACHE_ENTRY_SIZE,
+                 use_inotify: bool = False,
+                 stat_cache: Optional[StatCache] = None):
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, StaticCacheEntry]" = OrderedDict()
+        self.stat_cache = stat_cache
+        self.watcher: Optional[InotifyWatcher] = None
+        if use_inotify and InotifyWatcher.is_available():
+            self.watcher = InotifyWatcher(self._on_change)
+            
+    def accepts(self, size: int) -> bool:
+        """Check if a file of the given size may be cached"""
+        return 0 < size <= self.max_entry_size and size <= self.max_size
+        
+    def get(self, path: str) -> Optional[StaticCacheEntry]:
+        """Get a valid entry for path, dropping it if the file changed"""
+        entry = self._entries.get(path)
+        if entry is None:
+            self.misses += 1
+            return None
+            
+        if not self._is_watched(path):
+            try:
+                stat_result = self.stat_cache.stat(path) if self.stat_cache else os.stat(path)
+            except OSError:
+                stat_result = None
+            if stat_result is None:
+                self.invalidate(path)
+                self.misses += 1
+                return None
+            if stat_result.st_mtime_ns != entry.mtime_ns or stat_result.st_size != entry.size:
+                self.invalidate(path)
+                self.misses += 1
+                return None
+                
+        self._entries.move_to_end(path)
+        self.hits += 1
+        return entry
+        
+    def put(self, path: str, body: bytes, headers: Dict[str, str], header_block: bytes, mtime_ns: int) -> None:
+        """Store a file, evicting the least recently used entries to stay within max_size"""
+        if not self.accepts(len(body)):
+            return
+            
+        self.invalidate(path)
+        self._watch(path)
+        self._entries[path] = StaticCacheEntry(body, headers, header_block, mtime_ns, len(body))
+        self.size += len(body)
+        
+        while self.size > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            
+    def invalidate(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.size -= entry.size
+            
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+        
+    def close(self) -> None:
+        self.clear()
+        if self.watcher is not None:
+            self.watcher.close()
+            
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'size': self.size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+        
+    def _is_watched(self, path: str) -> bool:
+        return self.watcher is not None and self.watcher.is_watching(os.path.dirname(path))
+        
+    def _watch(self, path: str) -> None:
+        if self.watcher is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self.watcher.start(loop):
+            self.watcher.watch(os.path.dirname(path))
+            
+    def _on_change(self, path: Optional[str]) -> None:
+        if self.stat_cache is not None:
+            if path is not None and path in self._entries:
+                self.stat_cache.invalidate(path)
+            else:
+                self.stat_cache.clear()
+        if path is None:
+            self.clear()
+            return
+        if path in self._entries:
+            self.invalidate(path)
+            return
+        # A changed directory (moved or deleted) affects everything below it
+        prefix = path.rstrip(os.sep) + os.sep
+        for cached_path in [p for p in self._entries if p.startswith(prefix)]:
+            self.invalidate(cached_path)
@@ -0,0 +1,157 @@
+"""
+Filesystem change notifications for PyServe caches
+
+Minimal inotify binding (Linux only) built on ctypes, so caches can drop
+entries as soon as files change instead of calling stat() on every hit.
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from typing import Callable, Dict, Optional
+
+from pyserve.core.logging import get_logger
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """
+    Watch directories and report changed paths.
+
+    The callback receives the full path of the changed entry, or None when
+    the kernel queue overflowed and every watched path must be considered changed.
+    """
+    
+    def __init__(self, callback: Callable[[Optional[str]], None]):
+        self.callback = callback
+        self.logger = get_logger()
+        self._libc = None
+        self._fd: Optional[int] = None
+        self._watches: Dict[int, str] = {}
+        self._directories: Dict[str, int] = {}
+        
+    @staticmethod
+    def is_available() -> bool:
+        """Check if inotify can be used on this platform"""
+        if not sys.platform.startswith('linux'):
+            return False
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            return False
+        try:
+            return hasattr(ctypes.CDLL(libc_name), 'inotify_init1')
+        except OSError:
+            return False
+            
+    def start(self, loop: asyncio.AbstractEventLoop) -> bool:
+        """
+        Create the inotify instance and register it with the event loop
+        
+        Returns:
+            bool: True if the watcher is running
+        """
+        if self._fd is not None:
+            return True
+        if not self.is_available():
+            return False
+            
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            self.logger.warning(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+            return False
+            
+        self._fd = fd
+        loop.add_reader(fd, self._on_readable)
+        return True
+        
+    def is_running(self) -> bool:
+        return self._fd is not None
+        
+    def is_watching(self, directory: str) -> bool:
+        return directory in self._directories
+        
+    def watch(self, directory: str) -> bool:
+        """
+        Start watching a directory
+        
+        Returns:
+            bool: True if changes in the directory will be reported
+        """
+        if self._fd is None:
+            return False
+        if directory in self._directories:
+            return True
+            
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            self.logger.warning(f"Cannot watch {directory}: {os.strerror(ctypes.get_errno())}")
+            return False
+            
+        self._watches[wd] = directory
+        self._directories[directory] = wd
+        return True
+        
+    def close(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            asyncio.get_event_loop().remove_reader(self._fd)
+        except Exception:
+            pass
+        os.close(self._fd)
+        self._fd = None
+        self._watches.clear()
+        self._directories.clear()
+        
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+            
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            
+            if mask & IN_Q_OVERFLOW:
+                self.callback(None)
+                continue
+                
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+                
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                # The directory itself moved or is gone, its path can't be trusted anymore
+                del self._watches[wd]
+                self._directories.pop(directory, None)
+                if not mask & IN_IGNORED:
+                    self._libc.inotify_rm_watch(self._fd, wd)
+                self.callback(directory)
+                continue
+                
+            self.callback(os.path.join(directory, os.fsdecode(name)) if name else directory)
@@ -167,7 +167,7 @@ class ConfigLoader:
             "server": {
                 "host": "127.0.0.1",
                 "port": 8000,
-                "backlog": 5,
+                "backlog": 1024,
                 "redirect_instructions": [
                     {"/home": "/index.html"},
                     {"/docs": "/docs.html"}
@@ -6,6 +6,11 @@ import asyncio
 import aiohttp
 from typing import Dict, Any, List, Tuple, Optional
 
+# Names of pyserve.core.server.sockets.SOCKET_OPTIONS
+SOCKET_OPTION_NAMES = ('rcvbuf', 'sndbuf', 'keepalive', 'nodelay', 'defer_accept', 'fastopen')
+# pyserve.core.server.tls.ALPN_PROTOCOLS
+ALPN_PROTOCOL_NAMES = ('h2', 'http/1.1')
+
 class ReverseProxyValidator:
     """Validator for reverse proxy configurations"""
     
@@ -111,6 +116,10 @@ class ReverseProxyValidator:
                 errors.append(f"reverse_proxy[{i}] missing required field: port")
             elif not isinstance(proxy['port'], int) or proxy['port'] < 1 or proxy['port'] > 65535:
                 errors.append(f"reverse_proxy[{i}] invalid port: {proxy['port']}")
+            # The handler takes YAML booleans and the strings on/off alike
+            for name in ('request_buffering', 'proxy_buffering', 'decompress'):
+                if name in proxy and proxy[name] not in (True, False, 'on', 'off'):
+                    errors.append(f"reverse_proxy[{i}].{name} must be true/false or on/off")
                 
         return errors
 
@@ -138,6 +147,10 @@ class ConfigValidator:
         if ssl_config.get('enabled', False):
             ssl_errors = ConfigValidator.validate_ssl_config(ssl_config)
             errors.extend(ssl_errors)
+            http2 = config.get('server', {}).get('http2', {})
+            alpn = ssl_config.get('alpn')
+            if isinstance(alpn, list) and 'h2' in alpn and isinstance(http2, dict) and http2.get('enabled') is False:
+                errors.append("ssl.alpn offers h2, but server.http2.enabled is false")
             
         logging_errors = ConfigValidator.validate_logging_config(config.get('logging', {}))
         errors.extend(logging_errors)
@@ -167,10 +180,113 @@ class ConfigValidator:
             if not isinstance(port, int) or port < 1 or port > 65535:
                 errors.append(f"Invalid port number: {port}. Must be between 1 and 65535")
         
-        backlog = config.get('backlog', 5)
+        backlog = config.get('backlog', 1024)
         if not isinstance(backlog, int) or backlog < 1:
             errors.append(f"Invalid backlog value: {backlog}. Must be a positive integer")
         
+        workers = config.get('workers', 1)
+        if not isinstance(workers, int) or workers < 1:
+            errors.append(f"Invalid workers value: {workers}. Must be a positive integer")
+        
+        if 'reuse_port' in config and not isinstance(config['reuse_port'], bool):
+            errors.append("server.reuse_port must be a boolean value")
+
+        listeners = config.get('listeners', [])
+        if not isinstance(listeners, list):
+            errors.append("listeners must be a list")
+        else:
+            for i, listener in enumerate(listeners):
+                errors.extend(ConfigValidator.validate_listener(listener, i))
+        
+        event_loop = config.get('event_loop', 'auto')
+        if event_loop not in ('auto', 'asyncio', 'uvloop'):
+            errors.append(f"Invalid event_loop value: {event_loop}. Must be one of: auto, asyncio, uvloop")
+        
+        io_mode = config.get('io_mode', 'streams')
+        if io_mode not in ('streams', 'protocol'):
+            errors.append(f"Invalid io_mode value: {io_mode}. Must be one of: streams, protocol")
+        
+        keep_alive = config.get('keep_alive', {})
+        if not isinstance(keep_alive, dict):
+            errors.append("keep_alive must be a dictionary")
+        else:
+            if 'enabled' in keep_alive and not isinstance(keep_alive['enabled'], bool):
+                errors.append("keep_alive.enabled must be a boolean value")
+            timeout = keep_alive.get('timeout', 5)
+            if not isinstance(timeout, (int, float)) or timeout <= 0:
+                errors.append(f"Invalid keep_alive.timeout value: {timeout}. Must be a positive number")
+            max_requests = keep_alive.get('max_requests', 100)
+            if not isinstance(max_requests, int) or max_requests < 0:
+                errors.append(f"Invalid keep_alive.max_requests value: {max_requests}. Must be a non-negative integer (0 = unlimited)")
+        
+        limits = config.get('limits', {})
+        if not isinstance(limits, dict):
+            errors.append("limits must be a dictionary")
+        else:
+            max_header_size = limits.get('max_header_size', 16384)
+            if not isinstance(max_header_size, int) or max_header_size < 1024:
+                errors.append(f"Invalid limits.max_header_size value: {max_header_size}. Must be an integer of at least 1024 bytes")
+            max_body_size = limits.get('max_body_size', 0)
+            if not isinstance(max_body_size, int) or max_body_size < 0:
+                errors.append(f"Invalid limits.max_body_size value: {max_body_size}. Must be a non-negative integer (0 = unlimited)")
+            body_buffer_size = limits.get('body_buffer_size', 1048576)
+            if not isinstance(body_buffer_size, int) or body_buffer_size < 0:
+                errors.append(f"Invalid limits.body_buffer_size value: {body_buffer_size}. Must be a non-negative integer")
+            for name in ('max_connections', 'max_requests'):
+                value = limits.get(name, 0)
+                if not isinstance(value, int) or value < 0:
+                    errors.append(f"Invalid limits.{name} value: {value}. Must be a non-negative integer (0 = unlimited)")
+            max_loop_lag = limits.get('max_loop_lag', 0)
+            if not isinstance(max_loop_lag, (int, float)) or max_loop_lag < 0:
+                errors.append(f"Invalid limits.max_loop_lag value: {max_loop_lag}. Must be a non-negative number of seconds (0 = disabled)")
+            retry_after = limits.get('retry_after', 1)
+            if not isinstance(retry_after, int) or retry_after < 0:
+                errors.append(f"Invalid limits.retry_after value: {retry_after}. Must be a non-negative integer")
+
+        timeouts = config.get('timeouts', {})
+        if not isinstance(timeouts, dict):
+            errors.append("timeouts must be a dictionary")
+        else:
+            for name in ('header', 'body', 'write', 'min_rate_grace'):
+                value = timeouts.get(name, 0)
+                if not isinstance(value, (int, float)) or value < 0:
+                    errors.append(f"Invalid timeouts.{name} value: {value}. Must be a non-negative number of seconds (0 = disabled)")
+            min_rate = timeouts.get('min_rate', 0)
+            if not isinstance(min_rate, int) or min_rate < 0:
+                errors.append(f"Invalid timeouts.min_rate value: {min_rate}. Must be a non-negative integer of bytes per second (0 = disabled)")
+
+        shutdown = config.get('shutdown', {})
+        if not isinstance(shutdown, dict):
+            errors.append("shutdown must be a dictionary")
+        else:
+            for name in ('timeout', 'readiness_delay'):
+                value = shutdown.get(name, 0)
+                if not isinstance(value, (int, float)) or value < 0:
+                    errors.append(f"Invalid shutdown.{name} value: {value}. Must be a non-negative number of seconds")
+            readiness_path = shutdown.get('readiness_path')
+            if readiness_path is not None and (not isinstance(readiness_path, str) or not readiness_path.startswith('/')):
+                errors.append(f"Invalid shutdown.readiness_path value: {readiness_path}. Must be a path starting with '/'")
+
+        http2 = config.get('http2', {})
+        if not isinstance(http2, dict):
+            errors.append("http2 must be a dictionary")
+        else:
+            for name in ('enabled', 'h2c'):
+                if name in http2 and not isinstance(http2[name], bool):
+                    errors.append(f"http2.{name} must be a boolean value")
+            max_streams = http2.get('max_concurrent_streams', 100)
+            if not isinstance(max_streams, int) or isinstance(max_streams, bool) or max_streams < 1:
+                errors.append(f"Invalid http2.max_concurrent_streams value: {max_streams}. Must be a positive integer")
+            window = http2.get('initial_window_size', 65535)
+            if not isinstance(window, int) or isinstance(window, bool) or not 1 <= window <= 2 ** 31 - 1:
+                errors.append(f"Invalid http2.initial_window_size value: {window}. Must be an integer from 1 to 2147483647")
+            table_size = http2.get('header_table_size', 4096)
+            if not isinstance(table_size, int) or isinstance(table_size, bool) or table_size < 0:
+                errors.append(f"Invalid http2.header_table_size value: {table_size}. Must be a non-negative integer")
+            idle_timeout = http2.get('idle_timeout', 60)
+            if not isinstance(idle_timeout, (int, float)) or isinstance(idle_timeout, bool) or idle_timeout < 0:
+                errors.append(f"Invalid http2.idle_timeout value: {idle_timeout}. Must be a non-negative number of seconds")
+
         redirections = config.get('redirect_instructions', [])
         if not isinstance(redirections, list):
             errors.append("redirect_instructions must be a list")
@@ -185,6 +301,111 @@ class ConfigValidator:
         proxy_errors = ReverseProxyValidator.validate_proxy_config(reverse_proxy)
         errors.extend(proxy_errors)
         
+        virtual_hosts = config.get('virtual_hosts', [])
+        if not isinstance(virtual_hosts, list):
+            errors.append("virtual_hosts must be a list")
+        else:
+            seen_names = set()
+            for i, vhost in enumerate(virtual_hosts):
+                errors.extend(ConfigValidator.validate_virtual_host(vhost, i))
+                names = vhost.get('names') if isinstance(vhost, dict) else None
+                if isinstance(names, str):
+                    names = [names]
+                if not isinstance(names, list):
+                    continue
+                for name in names:
+                    if isinstance(name, str):
+                        if name.lower() in seen_names:
+                            errors.append(f"virtual_hosts[{i}] host name {name} is already used by another virtual host")
+                        seen_names.add(name.lower())
+        
+        return errors
+    
+    @staticmethod
+    def validate_virtual_host(vhost: Any, index: int) -> List[str]:
+        """
+        Validate one entry of server.virtual_hosts
+        
+        Args:
+            vhost: Virtual host configuration
+            index: Position in the list, for the error messages
+            
+        Returns:
+            List[str]: List of validation errors
+        """
+        if not isinstance(vhost, dict):
+            return [f"virtual_hosts[{index}] must be a dictionary"]
+        errors = []
+        names = vhost.get('names')
+        if isinstance(names, str):
+            names = [names]
+        if not isinstance(names, list) or not names or not all(isinstance(name, str) and name for name in names):
+            errors.append(f"virtual_hosts[{index}].names must be a host name or a non-empty list of host names")
+        
+        static_dir = vhost.get('static_dir')
+        if not isinstance(static_dir, str):
+            errors.append(f"virtual_hosts[{index}] missing required field: static_dir")
+        elif not os.path.isdir(static_dir):
+            errors.append(f"virtual_hosts[{index}] static_dir not found: {static_dir}")
+        
+        redirections = vhost.get('redirect_instructions', [])
+        if not isinstance(redirections, list) or not all(isinstance(item, dict) and len(item) == 1 for item in redirections):
+            errors.append(f"virtual_hosts[{index}].redirect_instructions must be a list of single path: url pairs")
+        if not isinstance(vhost.get('locations', {}), dict):
+            errors.append(f"virtual_hosts[{index}].locations must be a dictionary")
+        for error in ReverseProxyValidator.validate_proxy_config(vhost.get('reverse_proxy', [])):
+            errors.append(f"virtual_hosts[{index}].{error}")
+        
+        if ('cert_file' in vhost) != ('key_file' in vhost):
+            errors.append(f"virtual_hosts[{index}] needs both cert_file and key_file")
+        for key in ('cert_file', 'key_file'):
+            if key in vhost and not os.path.isfile(str(vhost[key])):
+                errors.append(f"virtual_hosts[{index}] {key} not found: {vhost[key]}")
+        return errors
+    
+    @staticmethod
+    def validate_listener(listener: Any, index: int) -> List[str]:
+        """
+        Validate one entry of server.listeners
+        
+        Args:
+            listener: Listener configuration
+            index: Position in the list, for the error messages
+            
+        Returns:
+            List[str]: List of validation errors
+        """
+        if not isinstance(listener, dict):
+            return [f"listeners[{index}] must be a dictionary"]
+        errors = []
+        if 'path' in listener:
+            if not isinstance(listener['path'], str) or not listener['path']:
+                errors.append(f"listeners[{index}] invalid path: {listener['path']}")
+            if 'port' in listener:
+                errors.append(f"listeners[{index}] must have either a port or a path, not both")
+            mode = listener.get('mode', 0o666)
+            if not isinstance(mode, int) or mode < 0 or mode > 0o777:
+                errors.append(f"listeners[{index}] invalid mode: {mode}. Must be file permissions like 0660")
+        elif 'port' not in listener:
+            errors.append(f"listeners[{index}] missing required field: port (or path for a Unix socket)")
+        elif not isinstance(listener['port'], int) or listener['port'] < 1 or listener['port'] > 65535:
+            errors.append(f"listeners[{index}] invalid port: {listener['port']}")
+        if 'tls' in listener and not isinstance(listener['tls'], bool):
+            errors.append(f"listeners[{index}].tls must be a boolean value")
+        backlog = listener.get('backlog', 1024)
+        if not isinstance(backlog, int) or backlog < 1:
+            errors.append(f"listeners[{index}] invalid backlog: {backlog}. Must be a positive integer")
+        options = listener.get('options', {})
+        if not isinstance(options, dict):
+            errors.append(f"listeners[{index}].options must be a dictionary")
+        else:
+            for name, value in options.items():
+                if name not in SOCKET_OPTION_NAMES:
+                    errors.append(f"listeners[{index}] unknown socket option: {name}. Must be one of: {', '.join(SOCKET_OPTION_NAMES)}")
+                elif not isinstance(value, (bool, int)) or value < 0:
+                    errors.append(f"listeners[{index}] invalid {name} value: {value}. Must be a non-negative integer or boolean")
+                elif 'path' in listener and name not in ('rcvbuf', 'sndbuf'):
+                    errors.append(f"listeners[{index}] socket option {name} does not apply to Unix sockets")
         return errors
     
     @staticmethod
@@ -206,6 +427,68 @@ class ConfigValidator:
         if 'templates_dir' not in config:
             errors.append("Missing required field: http.templates_dir")
         
+        if 'sendfile' in config and not isinstance(config['sendfile'], bool):
+            errors.append("http.sendfile must be a boolean value")
+        
+        if 'precompressed' in config and not isinstance(config['precompressed'], bool):
+            errors.append("http.precompressed must be a boolean value")
+        
+        compression = config.get('compression', {})
+        if not isinstance(compression, dict):
+            errors.append("http.compression must be a dictionary")
+        else:
+            if 'enabled' in compression and not isinstance(compression['enabled'], bool):
+                errors.append("http.compression.enabled must be a boolean value")
+            encodings = compression.get('encodings', [])
+            if not isinstance(encodings, list) or any(e not in ('gzip', 'br', 'zstd') for e in encodings):
+                errors.append(f"Invalid compression.encodings value: {encodings}. Must be a list of gzip, br, zstd")
+            types = compression.get('types', [])
+            if not isinstance(types, list) or not all(isinstance(t, str) for t in types):
+                errors.append("http.compression.types must be a list of MIME types")
+            for key in ('min_size', 'cache_size'):
+                value = compression.get(key, 0)
+                if not isinstance(value, int) or value < 0:
+                    errors.append(f"Invalid compression.{key} value: {value}. Must be a non-negative integer")
+            workers = compression.get('workers')
+            if workers is not None and (not isinstance(workers, int) or workers < 1):
+                errors.append(f"Invalid compression.workers value: {workers}. Must be a positive integer")
+        
+        static_cache = config.get('static_cache', {})
+        if not isinstance(static_cache, dict):
+            errors.append("http.static_cache must be a dictionary")
+        else:
+            for key in ('enabled', 'inotify'):
+                if key in static_cache and not isinstance(static_cache[key], bool):
+                    errors.append(f"http.static_cache.{key} must be a boolean value")
+            max_size = static_cache.get('max_size', 67108864)
+            if not isinstance(max_size, int) or max_size < 0:
+                errors.append(f"Invalid static_cache.max_size value: {max_size}. Must be a non-negative integer")
+            max_entry_size = static_cache.get('max_entry_size', 1048576)
+            if not isinstance(max_entry_size, int) or max_entry_size < 0:
+                errors.append(f"Invalid static_cache.max_entry_size value: {max_entry_size}. Must be a non-negative integer")
+        
+        stat_cache = config.get('stat_cache', {})
+        if not isinstance(stat_cache, dict):
+            errors.append("http.stat_cache must be a dictionary")
+        else:
+            if 'enabled' in stat_cache and not isinstance(stat_cache['enabled'], bool):
+                errors.append("http.stat_cache.enabled must be a boolean value")
+            for key in ('ttl', 'negative_ttl'):
+                value = stat_cache.get(key, 0)
+                if not isinstance(value, (int, float)) or value < 0:
+                    errors.append(f"Invalid stat_cache.{key} value: {value}. Must be a non-negative number of seconds")
+            max_entries = stat_cache.get('max_entries', 10000)
+            if not isinstance(max_entries, int) or max_entries < 0:
+                errors.append(f"Invalid stat_cache.max_entries value: {max_entries}. Must be a non-negative integer")
+        
+        static_manifest = config.get('static_manifest', {})
+        if not isinstance(static_manifest, dict):
+            errors.append("http.static_manifest must be a dictionary")
+        else:
+            for key in ('enabled', 'watch'):
+                if key in static_manifest and not isinstance(static_manifest[key], bool):
+                    errors.append(f"http.static_manifest.{key} must be a boolean value")
+        
         return errors
     
     @staticmethod
@@ -237,6 +520,30 @@ class ConfigValidator:
             elif not os.path.isfile(config['key_file']):
                 errors.append(f"SSL key file not found: {config['key_file']}")
         
+        for key in ('ciphers', 'ecdh_curve'):
+            if config.get(key) is not None and not isinstance(config[key], str):
+                errors.append(f"ssl.{key} must be a string")
+        
+        if config.get('alpn') is not None:
+            alpn = config['alpn']
+            if not isinstance(alpn, list):
+                errors.append("ssl.alpn must be a list of protocol names")
+            else:
+                for protocol in alpn:
+                    if protocol not in ALPN_PROTOCOL_NAMES:
+                        errors.append(f"Invalid ssl.alpn protocol: {protocol}. Must be one of: {', '.join(ALPN_PROTOCOL_NAMES)}")
+        
+        if 'session_tickets' in config and not isinstance(config['session_tickets'], bool):
+            errors.append("ssl.session_tickets must be a boolean value")
+        
+        num_tickets = config.get('num_tickets', 0)
+        if not isinstance(num_tickets, int) or isinstance(num_tickets, bool) or num_tickets < 0:
+            errors.append(f"Invalid ssl.num_tickets value: {num_tickets}. Must be a non-negative integer")
+        
+        reload_interval = config.get('reload_interval', 0)
+        if not isinstance(reload_interval, (int, float)) or isinstance(reload_interval, bool) or reload_interval < 0:
+            errors.append(f"Invalid ssl.reload_interval value: {reload_interval}. Must be a non-negative number")
+        
         return errors
     
     @staticmethod
@@ -1,4 +1,5 @@
 from .configuration import ConfigurationError, PyServeYAMLException
+from .http import HTTPError
 
 
-__all__ = ['ConfigurationError', 'PyServeYAMLException']
\ No newline at end of file
+__all__ = ['ConfigurationError', 'PyServeYAMLException', 'HTTPError']
\ No newline at end of file
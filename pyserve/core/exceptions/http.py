@@ -0,0 +1,13 @@
+"""
+Custom exceptions for HTTP protocol errors
+"""
+
+class HTTPError(Exception):
+    """
+    Exception raised when a request cannot be processed at the protocol level.
+    Carries the status code that should be sent back to the client.
+    """
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.message = message
+        super().__init__(self.message)
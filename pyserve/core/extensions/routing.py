@@ -86,6 +86,9 @@ class RoutingExtension(BaseExtension):
                 proxy_pass = route_config['proxy_pass']
                 if not isinstance(proxy_pass, str) or not proxy_pass.startswith('http'):
                     errors.append(f"Invalid proxy_pass '{proxy_pass}' for pattern '{pattern}'")
+            
+            if 'cache_control' in route_config and not isinstance(route_config['cache_control'], str):
+                errors.append(f"Invalid cache_control for pattern '{pattern}': must be a string")
         
         return errors
     
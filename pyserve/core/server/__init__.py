@@ -1,9 +1,17 @@
 from .base import BaseServer
 from .tcp import AsyncTCPServer
 from .http import AsyncHTTPServer
+from .supervisor import WorkerSupervisor
+from .upgrade import Upgrade
+from .tls import TLSContext
+from .vhost import VirtualHost
 
 __all__ = [
     'BaseServer',
     'AsyncTCPServer',
-    'AsyncHTTPServer'
+    'AsyncHTTPServer',
+    'WorkerSupervisor',
+    'Upgrade',
+    'TLSContext',
+    'VirtualHost'
 ]
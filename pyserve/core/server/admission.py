@@ -0,0 +1,125 @@
+"""
+Connection admission control and load shedding for PyServe
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from pyserve.core.logging import get_logger
+
+LAG_CHECK_INTERVAL = 0.1  # Seconds between two event loop lag measurements
+DEFAULT_RETRY_AFTER = 1  # Seconds clients are asked to wait after a 503
+LOG_INTERVAL = 10.0  # Seconds between two warnings about shed requests
+
+
+class AdmissionController:
+    """
+    Limits concurrent connections and in-flight requests.
+
+    At max_connections the server stops accepting (connections wait in the
+    kernel's listen backlog) until one closes. Requests arriving while
+    max_requests are in flight, or while the event loop lags by more than
+    max_loop_lag, are answered with 503 and Retry-After instead of being
+    queued. Limits of 0 are disabled.
+    """
+
+    def __init__(self,
+                 max_connections: int = 0,
+                 max_requests: int = 0,
+                 max_loop_lag: float = 0.0,
+                 retry_after: int = DEFAULT_RETRY_AFTER):
+        self.max_connections = max_connections
+        self.max_requests = max_requests
+        self.max_loop_lag = max_loop_lag
+        self.retry_after = retry_after
+        self.logger = get_logger()
+
+        self.connections = 0
+        self.requests = 0
+        self.loop_lag = 0.0
+        self._slot_free = asyncio.Event()
+        self._slot_free.set()
+        self._monitor_task: Optional[asyncio.Task] = None
+
+        self.accepted = 0
+        self.accept_pauses = 0
+        self.rejected: Dict[str, int] = {'max_requests': 0, 'loop_lag': 0}
+        self._shed_since_log = 0
+        self._last_log = 0.0
+
+    def start(self) -> None:
+        """Start measuring event loop lag if max_loop_lag is set"""
+        if self.max_loop_lag and self._monitor_task is None:
+            self._monitor_task = asyncio.ensure_future(self._monitor_loop_lag())
+
+    def close(self) -> None:
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+
+    async def wait_for_connection_slot(self) -> None:
+        """Wait until another connection may be accepted"""
+        await self._slot_free.wait()
+
+    def connection_opened(self) -> None:
+        self.connections += 1
+        self.accepted += 1
+        if self.max_connections and self.connections >= self.max_connections and self._slot_free.is_set():
+            self._slot_free.clear()
+            self.accept_pauses += 1
+            self.logger.warning(f"{self.connections} connections open, pausing accept")
+
+    def connection_closed(self) -> None:
+        self.connections -= 1
+        if not self._slot_free.is_set() and self.connections < self.max_connections:
+            self._slot_free.set()
+            self.logger.info(f"{self.connections} connections open, resuming accept")
+
+    def admit_request(self) -> Optional[str]:
+        """
+        Decide whether a request is handled now
+
+        Returns:
+            Optional[str]: None if the request was admitted (call request_finished() when it is
+            done), otherwise the reason it has to be rejected
+        """
+        reason = None
+        if self.max_requests and self.requests >= self.max_requests:
+            reason = 'max_requests'
+        elif self.max_loop_lag and self.loop_lag > self.max_loop_lag:
+            reason = 'loop_lag'
+
+        if reason is None:
+            self.requests += 1
+            return None
+
+        self.rejected[reason] += 1
+        self._shed_since_log += 1
+        now = time.monotonic()
+        if now - self._last_log >= LOG_INTERVAL:
+            self.logger.warning(f"Overloaded ({self.requests} requests in flight, loop lag "
+                                f"{self.loop_lag * 1000:.0f} ms): {self._shed_since_log} requests answered with 503")
+            self._shed_since_log = 0
+            self._last_log = now
+        return reason
+
+    def request_finished(self) -> None:
+        self.requests -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'connections': self.connections,
+            'accepted': self.accepted,
+            'accept_pauses': self.accept_pauses,
+            'requests_in_flight': self.requests,
+            'rejected_max_requests': self.rejected['max_requests'],
+            'rejected_loop_lag': self.rejected['loop_lag'],
+            'loop_lag_ms': round(self.loop_lag * 1000, 1),
+        }
+
+    async def _monitor_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_CHECK_INTERVAL)
+            self.loop_lag = max(0.0, loop.time() - started - LAG_CHECK_INTERVAL)
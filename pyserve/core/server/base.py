@@ -5,9 +5,11 @@ import asyncio
 from abc import ABC, abstractmethod
 from typing import Optional, Tuple, Any
 
+DEFAULT_BACKLOG = 1024  # Connections the kernel queues until they are accepted
+
 
 class BaseServer(ABC):
-    def __init__(self, host: str, port: int, backlog: int = 5):
+    def __init__(self, host: str, port: int, backlog: int = DEFAULT_BACKLOG):
         self.host = host
         self.port = port
         self.backlog = backlog
@@ -27,7 +29,7 @@ class BaseServer(ABC):
         pass
         
     def is_running(self) -> bool:
-        return self.running and self.server is not None
+        return self.running
         
     def get_address(self) -> Tuple[str, int]:
         return self.host, self.port
\ No newline at end of file
@@ -1,18 +1,33 @@
 """
 HTTP server implementation for PyServe
 """
+import asyncio
+import socket
 import ssl
 import os
 from typing import Optional, Union, List, Dict, Any, Tuple
 import aiohttp
 
+from pyserve.core.server.base import DEFAULT_BACKLOG
 from pyserve.core.server.tcp import AsyncTCPServer
-from pyserve.http.request import HTTPRequest
+from pyserve.core.server.admission import DEFAULT_RETRY_AFTER
+from pyserve.core.server.sockets import Listener
+from pyserve.core.server.tls import TLSContext, default_alpn
+from pyserve.core.server.http2 import (DEFAULT_MAX_CONCURRENT_STREAMS, DEFAULT_INITIAL_WINDOW_SIZE, DEFAULT_HEADER_TABLE_SIZE,
+                                       DEFAULT_IDLE_TIMEOUT)
+from pyserve.core.server.vhost import VirtualHost, host_certificates, match_host, normalize_host
+from pyserve.core.server.timeouts import (
+    DEFAULT_HEADER_TIMEOUT, DEFAULT_BODY_TIMEOUT, DEFAULT_WRITE_TIMEOUT, DEFAULT_MIN_RATE, DEFAULT_MIN_RATE_GRACE
+)
+from pyserve.core.cache import StatCache, StaticFileCache, StaticManifest
+from pyserve.core.cache.stat_cache import DEFAULT_STAT_CACHE_TTL, DEFAULT_STAT_CACHE_ENTRIES
+from pyserve.core.cache.static import DEFAULT_STATIC_CACHE_SIZE, DEFAULT_STATIC_CACHE_ENTRY_SIZE
+from pyserve.http.request import HTTPRequest, DEFAULT_MAX_HEADER_SIZE, DEFAULT_MAX_BODY_SIZE, DEFAULT_BODY_BUFFER_SIZE
 from pyserve.http.response import HTTPResponse
+from pyserve.http.compression import ResponseCompressor, DEFAULT_COMPRESSION_MIN_SIZE
+from pyserve.core.cache.compressed import DEFAULT_COMPRESSED_CACHE_SIZE
 from pyserve.http.handlers.static import StaticFileHandler
-from pyserve.http.handlers.redirect import RedirectHandler
 from pyserve.http.handlers.templates import TemplateHandler
-from pyserve.http.handlers.proxy import ProxyHandler
 from pyserve.http.handlers.auth.base import HTTPAuthBase
 from pyserve.template.engine import AsyncTemplateEngine
 from pyserve.utils.helpers import get_redirections
@@ -26,7 +41,7 @@ class AsyncHTTPServer(AsyncTCPServer):
                  port: int, 
                  static_dir: str = "./static", 
                  template_dir: str = "./templates", 
-                 backlog: int = 5, 
+                 backlog: int = DEFAULT_BACKLOG, 
                  debug: bool = False, 
                  redirections: Optional[List[Dict[str, str]]] = None, 
                  reverse_proxy: Optional[List[Dict[str, Union[str, int]]]] = None,
@@ -35,17 +50,90 @@ class AsyncHTTPServer(AsyncTCPServer):
                  ssl_key: Optional[str] = None,
                  do_check_proxy_availability: bool = True,
                  routing_extension: Any = None,
-                 default_root: bool = False):
+                 default_root: bool = False,
+                 keep_alive: bool = True,
+                 keep_alive_timeout: float = 5.0,
+                 keep_alive_max_requests: int = 100,
+                 max_header_size: int = DEFAULT_MAX_HEADER_SIZE,
+                 max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+                 body_buffer_size: int = DEFAULT_BODY_BUFFER_SIZE,
+                 sendfile: bool = True,
+                 static_cache: bool = True,
+                 static_cache_size: int = DEFAULT_STATIC_CACHE_SIZE,
+                 static_cache_entry_size: int = DEFAULT_STATIC_CACHE_ENTRY_SIZE,
+                 static_cache_inotify: bool = False,
+                 stat_cache_ttl: float = DEFAULT_STAT_CACHE_TTL,
+                 stat_cache_negative_ttl: Optional[float] = None,
+                 stat_cache_max_entries: int = DEFAULT_STAT_CACHE_ENTRIES,
+                 static_manifest: bool = False,
+                 static_manifest_watch: bool = False,
+                 precompressed: bool = False,
+                 compression: bool = False,
+                 compression_encodings: Optional[List[str]] = None,
+                 compression_min_size: int = DEFAULT_COMPRESSION_MIN_SIZE,
+                 compression_types: Optional[List[str]] = None,
+                 compression_cache_size: int = DEFAULT_COMPRESSED_CACHE_SIZE,
+                 compression_workers: Optional[int] = None,
+                 sock: Optional[socket.socket] = None,
+                 reuse_port: bool = False,
+                 io_mode: str = 'streams',
+                 max_connections: int = 0,
+                 max_requests: int = 0,
+                 max_loop_lag: float = 0.0,
+                 retry_after: int = DEFAULT_RETRY_AFTER,
+                 header_timeout: float = DEFAULT_HEADER_TIMEOUT,
+                 body_timeout: float = DEFAULT_BODY_TIMEOUT,
+                 write_timeout: float = DEFAULT_WRITE_TIMEOUT,
+                 min_rate: int = DEFAULT_MIN_RATE,
+                 min_rate_grace: float = DEFAULT_MIN_RATE_GRACE,
+                 readiness_path: Optional[str] = None,
+                 listeners: Optional[List[Listener]] = None,
+                 tls: Optional[TLSContext] = None,
+                 virtual_hosts: Optional[List[VirtualHost]] = None,
+                 http2: bool = True,
+                 h2c: bool = False,
+                 http2_max_concurrent_streams: int = DEFAULT_MAX_CONCURRENT_STREAMS,
+                 http2_initial_window_size: int = DEFAULT_INITIAL_WINDOW_SIZE,
+                 http2_header_table_size: int = DEFAULT_HEADER_TABLE_SIZE,
+                 http2_idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
         
-        ssl_context = None
-        if ssl_cert and ssl_key:
-            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
-            try:
-                ssl_context.load_cert_chain(ssl_cert, ssl_key)
-            except Exception as e:
-                raise ValueError(f"Error loading SSL certificates: {e}")
+        # tls carries the handshake settings and reloads the certificates, ssl_cert
+        # and ssl_key alone get one with the defaults
+        virtual_hosts = virtual_hosts or []
+        if tls is None and ssl_cert and ssl_key:
+            tls = TLSContext(ssl_cert, ssl_key, alpn=default_alpn(http2), hosts=host_certificates(virtual_hosts))
+        ssl_context = tls.context if tls else None
         
-        super().__init__(host, port, backlog, ssl_context)
+        super().__init__(host, port, backlog, ssl_context,
+                         keep_alive=keep_alive,
+                         keep_alive_timeout=keep_alive_timeout,
+                         keep_alive_max_requests=keep_alive_max_requests,
+                         max_header_size=max_header_size,
+                         max_body_size=max_body_size,
+                         body_buffer_size=body_buffer_size,
+                         sock=sock,
+                         reuse_port=reuse_port,
+                         io_mode=io_mode,
+                         max_connections=max_connections,
+                         max_requests=max_requests,
+                         max_loop_lag=max_loop_lag,
+                         retry_after=retry_after,
+                         header_timeout=header_timeout,
+                         body_timeout=body_timeout,
+                         write_timeout=write_timeout,
+                         min_rate=min_rate,
+                         min_rate_grace=min_rate_grace,
+                         readiness_path=readiness_path,
+                         listeners=listeners,
+                         http2=http2,
+                         h2c=h2c,
+                         http2_max_concurrent_streams=http2_max_concurrent_streams,
+                         http2_initial_window_size=http2_initial_window_size,
+                         http2_header_table_size=http2_header_table_size,
+                         http2_idle_timeout=http2_idle_timeout)
+        if tls and 'h2' in tls.alpn and self.http2 is None:
+            # Clients choosing h2 would get HTTP/1.1 answers they can't read
+            raise ValueError("ALPN offers h2, but HTTP/2 is disabled or the h2 package is not installed")
 
         # Initialize server attributes
         self.static_dir = os.path.abspath(static_dir)
@@ -57,6 +145,9 @@ class AsyncHTTPServer(AsyncTCPServer):
         self.reverse_proxy = reverse_proxy or []
         self.client_session: Optional[aiohttp.ClientSession] = None
         self.ssl_enabled = ssl_context is not None
+        self.tls = tls
+        if tls:
+            tls.on_swap = self._swap_ssl_context
         self.do_check_proxy_availability = do_check_proxy_availability
         self.routing_extension = routing_extension  # Новый параметр для расширения маршрутизации
         self.default_root = default_root  # Новый параметр для обработки корневого пути
@@ -64,20 +155,50 @@ class AsyncHTTPServer(AsyncTCPServer):
         os.makedirs(self.static_dir, exist_ok=True)
 
         # Initialize handlers
-        self.static_handler = StaticFileHandler(self.static_dir, debug=debug)
-        self.redirect_handler = RedirectHandler(self.redirections)
+        # Shared by routing and the static handler so a request stats a path at most once
+        self.stat_cache = StatCache(stat_cache_ttl, stat_cache_negative_ttl, stat_cache_max_entries)
+        self.static_cache: Optional[StaticFileCache] = None
+        if static_cache:
+            self.static_cache = StaticFileCache(static_cache_size, static_cache_entry_size,
+                                                use_inotify=static_cache_inotify,
+                                                stat_cache=self.stat_cache)
+        self.compressor: Optional[ResponseCompressor] = None
+        if compression:
+            self.compressor = ResponseCompressor(compression_encodings, compression_min_size, compression_types,
+                                                 compression_cache_size, compression_workers)
         self.template_handler = TemplateHandler(self.template_engine)
-        self.proxy_handler = ProxyHandler(self.reverse_proxy)
-        self.proxy_handler.set_template_handler(self.template_handler)
         self.auth_handler = HTTPAuthBase  
+
+        # The top level configuration is the host for requests no virtual host is named for.
+        # Hosts are looked up by name per request, everything else is set up here once
+        self.default_host = VirtualHost([], self.static_dir, self.redirections, self.locations, self.reverse_proxy)
+        self.hosts = [self.default_host, *virtual_hosts]
+        self.virtual_hosts: Dict[str, VirtualHost] = {}
+        for vhost in self.hosts:
+            vhost.static_handler = StaticFileHandler(vhost.static_dir, debug=debug, sendfile=sendfile,
+                                                     cache=self.static_cache, stat_cache=self.stat_cache,
+                                                     precompressed=precompressed)
+            # Optional snapshot of static_dir, unknown paths are answered without touching the disk
+            if static_manifest:
+                vhost.static_manifest = StaticManifest(vhost.static_dir, vhost.static_handler.get_content_type,
+                                                       watch=static_manifest_watch)
+                vhost.static_handler.manifest = vhost.static_manifest
+            vhost.proxy_handler.set_template_handler(self.template_handler)
+            for name in vhost.names:
+                self.virtual_hosts[name] = vhost
+        self.static_handler = self.default_host.static_handler
+        self.static_manifest = self.default_host.static_manifest
+        self.redirect_handler = self.default_host.redirect_handler
+        self.proxy_handler = self.default_host.proxy_handler
         
     async def start(self) -> None:
         """Start the HTTP server"""
         # Check reverse proxy availability if configured
-        if self.reverse_proxy and self.check_proxy_availability and self.do_check_proxy_availability:
+        reverse_proxy = [proxy for vhost in self.hosts for proxy in vhost.reverse_proxy]
+        if reverse_proxy and self.check_proxy_availability and self.do_check_proxy_availability:
             self.logger.info("Checking reverse proxy backend availability...")
             all_available, errors = await ReverseProxyValidator.validate_proxy_availability(
-                self.reverse_proxy, timeout=10.0
+                reverse_proxy, timeout=10.0
             )
             
             if not all_available:
@@ -92,7 +213,12 @@ class AsyncHTTPServer(AsyncTCPServer):
                 #     raise RuntimeError("Some reverse proxy backends are not available")
         
         self.client_session = aiohttp.ClientSession()
-        self.proxy_handler.set_client_session(self.client_session)
+        for vhost in self.hosts:
+            vhost.proxy_handler.set_client_session(self.client_session)
+            if vhost.static_manifest is not None:
+                vhost.static_manifest.start(asyncio.get_running_loop())
+        if self.tls:
+            self.tls.start(asyncio.get_running_loop())
         
         # Start the server
         await super().start()
@@ -102,18 +228,72 @@ class AsyncHTTPServer(AsyncTCPServer):
         # Close client session
         if self.client_session:
             await self.client_session.close()
+        
+        self.logger.debug(f"Stat cache: {self.stat_cache.stats()}")
+        if self.static_cache:
+            self.logger.debug(f"Static file cache: {self.static_cache.stats()}")
+            self.static_cache.close()
+        for vhost in self.hosts:
+            if vhost.static_manifest is not None:
+                vhost.static_manifest.close()
+        if self.compressor:
+            if self.compressor.cache is not None:
+                self.logger.debug(f"Compressed response cache: {self.compressor.cache.stats()}")
+            self.compressor.close()
+        if self.tls:
+            self.logger.debug(f"TLS: {self.tls.stats()}")
+            self.tls.close()
             
         # Stop the server
         await super().stop()
         
-    async def handle_request(self, request_data: bytes, client_address: tuple) -> bytes:
-        """Handle HTTP request and return response bytes"""
-        request = HTTPRequest(request_data)
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring, logged on SIGUSR1"""
+        stats = super().stats()
+        stats['stat_cache'] = self.stat_cache.stats()
+        if self.static_cache:
+            stats['static_cache'] = self.static_cache.stats()
+        if self.compressor and self.compressor.cache is not None:
+            stats['compressed_cache'] = self.compressor.cache.stats()
+        if self.tls:
+            stats['tls'] = self.tls.stats()
+        return stats
+        
+    def log_stats(self) -> None:
+        for name, values in self.stats().items():
+            self.logger.info(f"Stats {name}: {values}")
         
+    async def reload(self) -> None:
+        """Reload static files and the certificate (SIGHUP)"""
+        await self.reload_static()
+        if self.tls:
+            self.tls.reload()
+        
+    def _swap_ssl_context(self, ssl_context: ssl.SSLContext) -> None:
+        # Listeners hand their context to every accepted connection, so the next handshake uses it
+        self.ssl_context = ssl_context
+        for listener in self.listeners:
+            if listener.ssl_context is not None:
+                listener.ssl_context = ssl_context
+        
+    async def reload_static(self) -> None:
+        """Drop cached static file data and rescan the static manifest"""
+        self.logger.info("Reloading static files...")
+        self.stat_cache.clear()
+        if self.static_cache:
+            self.static_cache.clear()
+        for vhost in self.hosts:
+            if vhost.static_manifest is not None:
+                await vhost.static_manifest.refresh()
+        
+    async def handle_request(self, request: HTTPRequest, client_address: tuple) -> Optional[HTTPResponse]:
+        """Handle HTTP request and return the response to write to the client"""
         # Validate request
         if not request.is_valid():
+            request.keep_alive = False
             response = HTTPResponse(400, body=b"Bad Request")
-            return response.to_bytes()
+            self._set_connection_headers(request, response)
+            return response
             
         # Log request
         self.logger.info(f"[{request.method}] | {request.path} from {client_address[0]}:{client_address[1]}")
@@ -126,12 +306,48 @@ class AsyncHTTPServer(AsyncTCPServer):
             self.logger.error(f"Error handling request: {e}")
             response = HTTPResponse.internal_error()
             
-        return response.to_bytes()
+        if response is None:
+            # The handler took over the connection (WebSocket upgrade)
+            return None
+            
+        if self.compressor:
+            try:
+                response = await self.compressor.compress(request, response, self._select_host(request))
+            except Exception as e:
+                self.logger.error(f"Error compressing response: {e}")
+            
+        self._set_connection_headers(request, response)
+        return response
+        
+    def _set_connection_headers(self, request: HTTPRequest, response: HTTPResponse) -> None:
+        """Tell the client whether the connection stays open after this response"""
+        if request.body_pending:
+            # The handler did not consume the body, it can't be told apart from the next request
+            request.keep_alive = False
+        if response.headers.get('transfer-encoding') == 'chunked' and request.version == 'HTTP/1.0':
+            # HTTP/1.0 clients don't understand chunked framing, closing the connection ends the body
+            response.remove_header('transfer-encoding')
+            request.keep_alive = False
+        if request.keep_alive:
+            response.set_header('connection', 'keep-alive')
+            response.set_header('keep-alive', f"timeout={int(self.keep_alive_timeout)}")
+        else:
+            response.set_header('connection', 'close')
+        
+    def _select_host(self, request: HTTPRequest) -> VirtualHost:
+        """Virtual host named by the Host header, the default host for other names"""
+        if self.virtual_hosts:
+            host = request.get_header('host')
+            if host:
+                return match_host(self.virtual_hosts, normalize_host(host)) or self.default_host
+        return self.default_host
         
     async def _route_request(self, request: HTTPRequest) -> HTTPResponse:
         """Route request to the appropriate handler"""
+        vhost = self._select_host(request)
+        
         # 1. Попытка маршрутизации через routing_extension (если есть)
-        if self.routing_extension is not None:
+        if self.routing_extension is not None and vhost is self.default_host:
             try:
                 match = self.routing_extension.match_route(request.path)
                 if match:
@@ -149,8 +365,8 @@ class AsyncHTTPServer(AsyncTCPServer):
                         else:
                             static_path = os.path.join(match.config['root'], request.path.lstrip('/'))
                         
-                        if os.path.isfile(static_path):
-                            return await self.static_handler.serve_file(static_path)
+                        if self.stat_cache.is_file(static_path):
+                            return await self.static_handler.serve_file(static_path, request, match.config.get('cache_control'))
                     # Если есть return — вернуть кастомный ответ
                     if 'return' in match.config:
                         body = match.config.get('body', match.config['return'])
@@ -161,9 +377,9 @@ class AsyncHTTPServer(AsyncTCPServer):
                         root = match.config.get('root', self.static_dir)
                         index_file = match.config.get('index_file', 'index.html')
                         spa_path = os.path.join(root, index_file)
-                        if os.path.isfile(spa_path):
+                        if self.stat_cache.is_file(spa_path):
                             self.logger.info(f"[routing_extension] SPA fallback: serving {spa_path} for {request.path}")
-                            return await self.static_handler.serve_file(spa_path)
+                            return await self.static_handler.serve_file(spa_path, request, match.config.get('cache_control'))
                         else:
                             self.logger.warning(f"[routing_extension] SPA fallback file not found: {spa_path}")
             except Exception as e:
@@ -172,20 +388,20 @@ class AsyncHTTPServer(AsyncTCPServer):
 
         # 2. Старая схема маршрутизации (locations, reverse_proxy, static и т.д.)
         # Check for proxy paths first
-        for proxy_config in self.reverse_proxy:
+        for proxy_config in vhost.reverse_proxy:
             proxy_path = proxy_config.get('path', '/')
             if request.path.startswith(proxy_path):
                 self.logger.info(f"Proxying request {request.path} to {proxy_config['host']}:{proxy_config['port']}")
-                return await self.proxy_handler.handle(request, proxy_config)
+                return await vhost.proxy_handler.handle(request, proxy_config)
 
         # Check for redirects
-        if request.path in self.redirections:
-            self.logger.info(f"Redirecting {request.path} to {self.redirections[request.path]}")
-            return self.redirect_handler.handle(request)
+        if request.path in vhost.redirections:
+            self.logger.info(f"Redirecting {request.path} to {vhost.redirections[request.path]}")
+            return vhost.redirect_handler.handle(request)
 
         # Check for location settings
-        if request.path in self.locations.keys():
-            auth_handler_temp = self.auth_handler(self.locations[request.path])
+        if request.path in vhost.locations.keys():
+            auth_handler_temp = self.auth_handler(vhost.locations[request.path])
             if not auth_handler_temp.authenticate(request):
                 return HTTPResponse(
                     status_code=401,
@@ -197,17 +413,26 @@ class AsyncHTTPServer(AsyncTCPServer):
                 )
 
         # Handle root path
-        if request.path == '/' and self.default_root:
-            return await self._handle_root(request)
+        path = request.path
+        if path == '/':
+            if vhost is not self.default_host:
+                path = '/index.html'  # Virtual hosts serve their own index page
+            elif self.default_root:
+                return await self._handle_root(request)
 
         # Handle static files with /static/ prefix
-        if request.path.startswith('/static/'):
-            return await self.static_handler.handle(request)
+        if path.startswith('/static/'):
+            return await vhost.static_handler.handle(request)
 
         # Try to serve file from static directory
-        file_path = os.path.join(self.static_dir, request.path.lstrip('/'))
-        if os.path.isfile(file_path):
-            return await self.static_handler.serve_file(file_path)
+        if vhost.static_manifest is not None:
+            entry = vhost.static_manifest.lookup(path)
+            if entry is not None:
+                return await vhost.static_handler.serve_file(entry.path, request)
+        else:
+            file_path = os.path.join(vhost.static_dir, path.lstrip('/'))
+            if self.stat_cache.is_file(file_path):
+                return await vhost.static_handler.serve_file(file_path, request)
 
         # File not found
         return await self._handle_error(404, "Not Found", f"The requested URL {request.path} was not found on this server.")
@@ -0,0 +1,522 @@
+"""
+HTTP/2 connection handling for PyServe
+"""
+import asyncio
+import ssl
+from collections import deque
+from typing import TYPE_CHECKING, Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+except ImportError:
+    h2 = None  # h2 is optional, without it connections speak HTTP/1.1 only
+
+from pyserve.core.exceptions import HTTPError
+from pyserve.core.server.timeouts import ConnectionTimeouts
+from pyserve.http.request import HTTPRequest, DEFAULT_MAX_HEADER_SIZE
+from pyserve.http.response import HTTPResponse
+
+if TYPE_CHECKING:
+    from pyserve.core.server.tcp import AsyncTCPServer
+
+H2C_PREFACE_HEAD = b'PRI * HTTP/2.0\r\n\r\n'  # Start of the client preface, which parses as an HTTP/1 request head
+DEFAULT_MAX_CONCURRENT_STREAMS = 100  # Requests a client may have in flight on one connection
+DEFAULT_INITIAL_WINDOW_SIZE = 65535  # Request body bytes a stream may receive ahead of its handler (RFC 9113 default)
+DEFAULT_HEADER_TABLE_SIZE = 4096  # HPACK dynamic table for the request headers of a connection (RFC 9113 default)
+DEFAULT_IDLE_TIMEOUT = 60.0  # Seconds a connection without streams stays open, it replaces up to six HTTP/1.1 ones
+MAX_WINDOW_SIZE = 2 ** 31 - 1
+READ_SIZE = 65536
+# Connection-specific HTTP/1.1 headers, not allowed in HTTP/2 responses (RFC 9113, section 8.2.2)
+CONNECTION_HEADERS = frozenset(('connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade'))
+
+
+def http2_available() -> bool:
+    """Check if the h2 package is installed"""
+    return h2 is not None
+
+
+def is_h2c_preface(request: HTTPRequest) -> bool:
+    """Check if an HTTP/1 request head is the start of an HTTP/2 client preface (prior knowledge h2c)"""
+    return request.method == 'PRI' and request.path == '*' and request.version == 'HTTP/2.0'
+
+
+class HTTP2Policy:
+    """
+    Settings the server announces on HTTP/2 connections.
+
+    max_concurrent_streams caps the requests a client may have in flight on
+    a connection; the client has to wait for one to finish before opening
+    another. initial_window_size is the flow control window of each request
+    body: a stream buffers at most that much data its handler has not read.
+    header_table_size bounds the HPACK dynamic table of the request headers
+    and max_header_list_size their decoded size, like max_header_size for
+    HTTP/1.1 request heads. Connections without streams are ended with GOAWAY
+    after idle_timeout.
+    """
+
+    def __init__(self,
+                 max_concurrent_streams: int = DEFAULT_MAX_CONCURRENT_STREAMS,
+                 initial_window_size: int = DEFAULT_INITIAL_WINDOW_SIZE,
+                 header_table_size: int = DEFAULT_HEADER_TABLE_SIZE,
+                 max_header_list_size: int = DEFAULT_MAX_HEADER_SIZE,
+                 h2c: bool = False,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        """
+        Args:
+            max_concurrent_streams: Requests in flight per connection
+            initial_window_size: Flow control window of each request stream in bytes
+            header_table_size: HPACK dynamic table size in bytes
+            max_header_list_size: Largest decoded request header list in bytes
+            h2c: Accept HTTP/2 with prior knowledge on cleartext connections
+            idle_timeout: Seconds a connection without streams stays open, 0 = until the client closes it
+        """
+        self.max_concurrent_streams = max_concurrent_streams
+        self.initial_window_size = initial_window_size
+        self.header_table_size = header_table_size
+        self.max_header_list_size = max_header_list_size
+        self.h2c = h2c
+        self.idle_timeout = idle_timeout
+
+        self.connections = 0
+        self.streams = 0
+        self.streams_reset = 0  # Streams the client cancelled
+        self.protocol_errors = 0
+
+    def local_settings(self) -> Dict[int, int]:
+        codes = h2.settings.SettingCodes
+        return {
+            codes.MAX_CONCURRENT_STREAMS: self.max_concurrent_streams,
+            codes.INITIAL_WINDOW_SIZE: self.initial_window_size,
+            codes.HEADER_TABLE_SIZE: self.header_table_size,
+            codes.MAX_HEADER_LIST_SIZE: self.max_header_list_size,
+            codes.ENABLE_PUSH: 0,
+        }
+
+    def connection_window(self) -> int:
+        """Receive window of a whole connection, large enough for all streams to use theirs"""
+        return min(self.initial_window_size * self.max_concurrent_streams, MAX_WINDOW_SIZE)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'connections': self.connections,
+            'streams': self.streams,
+            'streams_reset': self.streams_reset,
+            'protocol_errors': self.protocol_errors,
+        }
+
+
+class _Stream:
+    """A request stream: the body data received for it, waiting to be read by its handler"""
+
+    def __init__(self, connection: 'HTTP2Connection', stream_id: int):
+        self.connection = connection
+        self.stream_id = stream_id
+        self.data: Deque[Tuple[bytes, int]] = deque()  # Body pieces and the flow control window they took
+        self.ended = False  # The client sent all of the body
+        self.reset = False  # Cancelled by the client or the server
+        self.task: Optional[asyncio.Task] = None
+        self.window_waiter: Optional[asyncio.Future] = None  # The response waits for the client to open the window
+        self._waiter: Optional[asyncio.Future] = None
+
+    def feed(self, data: bytes, flow_controlled_length: int) -> None:
+        if not data:
+            # Only padding, nothing the handler would read
+            self.connection.acknowledge(self.stream_id, flow_controlled_length)
+            return
+        self.data.append((data, flow_controlled_length))
+        self._wakeup()
+
+    def end(self) -> None:
+        self.ended = True
+        self._wakeup()
+
+    def cancel(self) -> None:
+        self.reset = True
+        self._wakeup()
+        self.wake_writer()
+        if self.task is not None:
+            self.task.cancel()
+
+    def wake_writer(self) -> None:
+        if self.window_waiter is not None and not self.window_waiter.done():
+            self.window_waiter.set_result(None)
+
+    async def read(self) -> bytes:
+        """Next piece of the body, b'' at its end"""
+        while not self.data:
+            if self.reset:
+                raise ConnectionResetError('Stream reset')
+            if self.ended:
+                return b''
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        data, flow_controlled_length = self.data.popleft()
+        # Reading makes room in the windows, the client may send more now
+        self.connection.acknowledge(self.stream_id, flow_controlled_length)
+        return data
+
+    def discard(self) -> None:
+        """Give back the window of body data nobody will read"""
+        while self.data:
+            self.connection.acknowledge(self.stream_id, self.data.popleft()[1])
+
+    def _wakeup(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class HTTP2Request(HTTPRequest):
+    """HTTPRequest of an HTTP/2 stream, its body arrives in DATA frames instead of on the connection"""
+
+    def __init__(self, stream: _Stream):
+        super().__init__()
+        self.h2_stream = stream  # Not 'stream', that is the body iterator
+        self.version = 'HTTP/2'
+
+    @classmethod
+    def from_headers(cls, stream: _Stream, headers: List[Tuple[bytes, bytes]]) -> 'HTTP2Request':
+        """Build the request from the decoded header block, pseudo-headers included"""
+        request = cls(stream)
+        pseudo: Dict[str, str] = {}
+        for name, value in headers:
+            name = name.decode('latin-1')
+            value = value.decode('latin-1')
+            if name.startswith(':'):
+                pseudo[name] = value
+                continue
+            if name in request.headers:
+                # Cookies may be split into one field per cookie (RFC 9113, section 8.2.3)
+                value = f"{request.headers[name]}{'; ' if name == 'cookie' else ', '}{value}"
+            request.headers[name] = value
+
+        request.method = pseudo.get(':method', '')
+        path = pseudo.get(':path', '')
+        if '?' in path:
+            path, query = path.split('?', 1)
+            request.query_params = parse_qs(query)
+        request.path = path
+        if ':authority' in pseudo and 'host' not in request.headers:
+            request.headers['host'] = pseudo[':authority']
+        return request
+
+    def body_length(self) -> Optional[int]:
+        # Without content-length the body's end is the end of the stream
+        if self.body_pending and self.get_header('content-length') is None:
+            return None
+        return super().body_length()
+
+    async def _read_body_stream(self) -> AsyncIterator[bytes]:
+        content_length = self.get_header('content-length')
+        if self.max_body_size and content_length is not None and int(content_length) > self.max_body_size:
+            raise HTTPError(413, "Content Too Large")
+        await self._send_continue()
+
+        total = 0
+        while True:
+            chunk = await self._read_body_data(self.h2_stream.read())
+            if not chunk:
+                break
+            total += len(chunk)
+            if self.max_body_size and total > self.max_body_size:
+                raise HTTPError(413, "Content Too Large")
+            yield chunk
+
+        self.body_pending = False
+
+    async def _send_continue(self) -> None:
+        if self.get_header('expect', '').lower() == '100-continue':
+            self.h2_stream.connection.send_continue(self.h2_stream.stream_id)
+
+
+class HTTP2Connection:
+    """
+    An HTTP/2 connection, multiplexing concurrent requests as streams.
+
+    The h2 state machine parses the frames and does the HPACK coding. Every
+    request stream runs in its own task through the server's handle_request(),
+    so handlers get the same HTTPRequest and return the same HTTPResponse as
+    on HTTP/1.1. Response bodies go out as fast as the client's flow control
+    windows allow, request body data is acknowledged as handlers read it.
+
+    Between streams the connection idles for the policy's idle_timeout, then
+    it ends with GOAWAY like it does after its last stream once the server
+    shuts down, so clients know no stream they opened meanwhile was processed.
+    """
+
+    def __init__(self, server: 'AsyncTCPServer', reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 client_addr: tuple, timeouts: ConnectionTimeouts):
+        self.server = server
+        self.policy: HTTP2Policy = server.http2
+        self.reader = reader
+        self.writer = writer
+        self.client_addr = client_addr
+        self.timeouts = timeouts
+        self.logger = server.logger
+        self.loop = asyncio.get_running_loop()
+
+        self.conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding=None))
+        self.conn.local_settings = h2.settings.Settings(client=False, initial_values=self.policy.local_settings())
+        self.streams: Dict[int, _Stream] = {}
+        self.closing = False  # GOAWAY was sent or received
+        self._drain_lock = asyncio.Lock()
+        self._flush_scheduled = False
+        timeouts.on_idle_close = self._go_away
+
+    async def run(self, preface: bytes = b'') -> None:
+        """
+        Serve the connection until the client closes it or it ends with GOAWAY
+
+        Args:
+            preface: Start of the client preface already read from the connection (h2c)
+        """
+        self.policy.connections += 1
+        self.conn.initiate_connection()
+        window = self.policy.connection_window() - self.conn.inbound_flow_control_window
+        if window > 0:
+            self.conn.increment_flow_control_window(window)
+
+        data = preface
+        try:
+            while True:
+                if data:
+                    try:
+                        events = self.conn.receive_data(data)
+                    except h2.exceptions.ProtocolError as e:
+                        self.policy.protocol_errors += 1
+                        self.logger.warning(f"HTTP/2 protocol error from client {self.client_addr}: {e}")
+                        self.closing = True
+                        self.conn.close_connection(getattr(e, 'error_code', h2.errors.ErrorCodes.PROTOCOL_ERROR))
+                        self._flush()
+                        break
+                    self._handle_events(events)
+                    if events and not self.streams and not self.closing:
+                        # Complete frames without a request (settings, pings) restart the idle timeout,
+                        # while a request's header block trickles in the header timeout runs
+                        self.timeouts.start('keep_alive', self.policy.idle_timeout)
+                self._flush()
+                await self._drain()
+                if self.closing:
+                    break
+                data = await self.reader.read(READ_SIZE)
+                if not data:
+                    break
+        except (ConnectionResetError, BrokenPipeError, ssl.SSLError):
+            # SSLError: data from the client crossing our close_notify after GOAWAY
+            self.logger.debug(f"Client {self.client_addr} closed the connection")
+        finally:
+            # Nobody is left to take the responses of unfinished streams
+            tasks = [stream.task for stream in self.streams.values() if stream.task is not None]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _handle_events(self, events: List[Any]) -> None:
+        for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+                self._start_stream(event)
+            elif isinstance(event, h2.events.DataReceived):
+                stream = self.streams.get(event.stream_id)
+                if stream is not None:
+                    stream.feed(event.data, event.flow_controlled_length)
+                else:
+                    self.acknowledge(event.stream_id, event.flow_controlled_length)
+            elif isinstance(event, h2.events.StreamEnded):
+                stream = self.streams.get(event.stream_id)
+                if stream is not None:
+                    stream.end()
+            elif isinstance(event, h2.events.StreamReset):
+                stream = self.streams.get(event.stream_id)
+                if stream is not None:
+                    self.policy.streams_reset += 1
+                    stream.cancel()
+            elif isinstance(event, h2.events.WindowUpdated):
+                if event.stream_id:
+                    stream = self.streams.get(event.stream_id)
+                    if stream is not None:
+                        stream.wake_writer()
+                else:
+                    self._wake_writers()
+            elif isinstance(event, h2.events.RemoteSettingsChanged):
+                if h2.settings.SettingCodes.INITIAL_WINDOW_SIZE in event.changed_settings:
+                    self._wake_writers()
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                # The client is going away, h2 sends nothing more on the connection after GOAWAY
+                self.closing = True
+                for stream in self.streams.values():
+                    stream.cancel()
+
+    def _start_stream(self, event: Any) -> None:
+        stream = _Stream(self, event.stream_id)
+        request = HTTP2Request.from_headers(stream, event.headers)
+        request.body_pending = event.stream_ended is None
+        stream.ended = not request.body_pending
+        self.streams[event.stream_id] = stream
+        self.policy.streams += 1
+        self.timeouts.cancel()
+        stream.task = self.loop.create_task(self._serve_stream(stream, request))
+
+    async def _serve_stream(self, stream: _Stream, request: HTTP2Request) -> None:
+        """Run a request stream through handle_request and send the response"""
+        server = self.server
+        server._apply_limits(request)
+        admitted = False
+        try:
+            if server.readiness_path is not None and request.path == server.readiness_path:
+                response = server._readiness_response(request)
+            elif server.admission.admit_request() is not None:
+                response = server._overloaded_response()
+            else:
+                admitted = True
+                response = await server.handle_request(request, self.client_addr)
+            if response is None:
+                # Taking over the connection (WebSocket upgrade) does not work on a stream
+                self._reset(stream, h2.errors.ErrorCodes.INTERNAL_ERROR)
+                return
+            try:
+                await self._send_response(stream, request, response)
+            finally:
+                await response.close()
+        except (ConnectionResetError, BrokenPipeError, h2.exceptions.StreamClosedError):
+            pass
+        except Exception as e:
+            self.logger.error(f"Error handling stream {stream.stream_id} of client {self.client_addr}: {e}")
+            self._reset(stream, h2.errors.ErrorCodes.INTERNAL_ERROR)
+        finally:
+            if admitted:
+                server.admission.request_finished()
+            await request.close()
+            self._finish_stream(stream)
+
+    async def _send_response(self, stream: _Stream, request: HTTPRequest, response: HTTPResponse) -> None:
+        stream_id = stream.stream_id
+        headers = [(':status', str(response.status_code))]
+        headers.extend((name, str(value)) for name, value in response.headers.items() if name not in CONNECTION_HEADERS)
+
+        if request.method == 'HEAD' or response.status_code in (204, 304) or \
+                (response.body_stream is None and not response.body):
+            self.conn.send_headers(stream_id, headers, end_stream=True)
+            await self._send()
+            return
+
+        # The headers go out together with the first piece of the body
+        self.conn.send_headers(stream_id, headers)
+        if response.body_stream is None:
+            await self._send_data(stream, response.body, end_stream=True)
+            return
+        async for chunk in response.body_stream:
+            if chunk:
+                await self._send_data(stream, chunk)
+        self.conn.end_stream(stream_id)
+        await self._send()
+
+    async def _send_data(self, stream: _Stream, data: bytes, end_stream: bool = False) -> None:
+        """Send body data in frames as the stream's and the connection's flow control windows allow"""
+        stream_id = stream.stream_id
+        view = memoryview(data)
+        while view:
+            size = min(self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size, len(view))
+            if size <= 0:
+                await self._send()
+                # A client that keeps the window closed is stalled, like one that stops reading
+                stream.window_waiter = self.loop.create_future()
+                try:
+                    await self.timeouts.wait_writable(stream.window_waiter)
+                finally:
+                    stream.window_waiter = None
+                if stream.reset:
+                    raise ConnectionResetError('Stream reset')
+                continue
+            self.conn.send_data(stream_id, view[:size], end_stream=end_stream and size == len(view))
+            view = view[size:]
+            # Write large bodies as they go so drain() sees them, small ones wait for the batch
+            await self._send(flush=bool(view))
+
+    def _finish_stream(self, stream: _Stream) -> None:
+        self.streams.pop(stream.stream_id, None)
+        if self.closing:
+            return
+        if not stream.ended and not stream.reset:
+            # The response is complete without the rest of the body, stop the client sending it
+            self._reset(stream, h2.errors.ErrorCodes.NO_ERROR)
+        stream.discard()
+
+        if self.streams:
+            return
+        if not self.server.running and not self.closing:
+            # Shutting down, tell the client to open new streams on another connection
+            self.closing = True
+            self.conn.close_connection()
+        if self.closing:
+            self._flush()
+            self.timeouts.close()
+        else:
+            self._write()
+            self.timeouts.start('keep_alive', self.policy.idle_timeout)
+
+    def _go_away(self) -> None:
+        """Close the idle connection with GOAWAY, naming the last stream that was processed"""
+        if not self.closing:
+            self.closing = True
+            self.conn.close_connection()
+            self._flush()
+        self.timeouts.close()
+
+    def _reset(self, stream: _Stream, error_code: int) -> None:
+        stream.reset = True
+        if self.closing:
+            return
+        try:
+            self.conn.reset_stream(stream.stream_id, error_code)
+        except h2.exceptions.StreamClosedError:
+            pass
+        self._write()
+
+    def _wake_writers(self) -> None:
+        for stream in self.streams.values():
+            stream.wake_writer()
+
+    def acknowledge(self, stream_id: int, flow_controlled_length: int) -> None:
+        """Give the window taken by body data back to the client"""
+        if flow_controlled_length and not self.closing:
+            self.conn.acknowledge_received_data(flow_controlled_length, stream_id)
+            self._write()
+
+    def send_continue(self, stream_id: int) -> None:
+        """Answer 'Expect: 100-continue' with an informational response"""
+        self.conn.send_headers(stream_id, [(':status', '100')])
+        self._write()
+
+    def _write(self) -> None:
+        """Write pending frames once the streams ready in this loop iteration have added theirs"""
+        # Many small responses then leave in one write (and TLS record) instead of one per frame
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.loop.call_soon(self._flush)
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+        data = self.conn.data_to_send()
+        if data and not self.writer.transport.is_closing():
+            self.writer.write(data)
+
+    async def _drain(self) -> None:
+        # Streams share the connection, only one of them may wait in drain() at a time
+        async with self._drain_lock:
+            await self.writer.drain()
+
+    async def _send(self, flush: bool = False) -> None:
+        """Write pending frames, now or with the batch, and wait while the client does not take them"""
+        if flush:
+            self._flush()
+        else:
+            self._write()
+        await self._drain()
@@ -0,0 +1,47 @@
+"""
+Event loop selection for PyServe
+"""
+import asyncio
+import sys
+from typing import Any, Callable, Coroutine, Optional
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None  # uvloop is optional, the asyncio loop is always available
+
+EVENT_LOOPS = ('auto', 'asyncio', 'uvloop')
+
+
+def uvloop_available() -> bool:
+    """Check if uvloop is installed and usable on this platform"""
+    return uvloop is not None and sys.platform != 'win32'
+
+
+def get_loop_factory(event_loop: str = 'auto') -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    """
+    Get the factory for the requested event loop
+
+    Args:
+        event_loop: 'auto' (uvloop if installed), 'asyncio' or 'uvloop'
+
+    Returns:
+        Optional[Callable]: uvloop.new_event_loop, or None for asyncio's default loop
+        (also when uvloop was requested but is missing)
+    """
+    if event_loop != 'asyncio' and uvloop_available():
+        return uvloop.new_event_loop
+    return None
+
+
+def get_loop_name(loop: asyncio.AbstractEventLoop) -> str:
+    """Name of the event loop implementation, for logging"""
+    if uvloop is not None and isinstance(loop, uvloop.Loop):
+        return f"uvloop {uvloop.__version__}"
+    return f"asyncio ({type(loop).__name__})"
+
+
+def run(main: Coroutine[Any, Any, Any], event_loop: str = 'auto') -> Any:
+    """Run a coroutine to completion in a new loop of the requested implementation"""
+    with asyncio.Runner(loop_factory=get_loop_factory(event_loop)) as runner:
+        return runner.run(main)
@@ -0,0 +1,334 @@
+"""
+asyncio.Protocol based connection handling for PyServe
+"""
+import asyncio
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from pyserve.core.exceptions import HTTPError
+from pyserve.core.server.http2 import H2C_PREFACE_HEAD
+from pyserve.core.server.sockets import UNIX_CLIENT_ADDRESS
+from pyserve.core.server.timeouts import ConnectionTimeouts
+from pyserve.http.request import HTTPRequest
+from pyserve.http.response import HTTPResponse
+
+if TYPE_CHECKING:
+    from pyserve.core.server.tcp import AsyncTCPServer
+
+READ_BUFFER_LIMIT = 262144  # Reading from the socket pauses while this much received data is unconsumed
+READ_LINE_LIMIT = 65536  # Longest line readuntil() accepts, the same default as asyncio.StreamReader
+
+
+class ProtocolReader:
+    """
+    StreamReader-compatible view of the data an HTTPProtocol received.
+
+    Request bodies (and connections taken over by a handler) are read
+    through it straight from the protocol's receive buffer.
+    """
+
+    def __init__(self, protocol: 'HTTPProtocol', limit: int = READ_LINE_LIMIT):
+        self._protocol = protocol
+        self._limit = limit
+        self._waiter: Optional[asyncio.Future] = None
+
+    def at_eof(self) -> bool:
+        return self._protocol.eof and not self._protocol.buffer
+
+    async def read(self, n: int = -1) -> bytes:
+        buffer = self._protocol.buffer
+        if n == 0:
+            return b''
+        if n < 0:
+            while not self._protocol.eof:
+                await self._wait()
+            return self._consume(len(buffer))
+        while not buffer and not self._protocol.eof:
+            await self._wait()
+        return self._consume(min(n, len(buffer)))
+
+    async def readexactly(self, n: int) -> bytes:
+        buffer = self._protocol.buffer
+        while len(buffer) < n:
+            if self._protocol.eof:
+                raise asyncio.IncompleteReadError(self._consume(len(buffer)), n)
+            await self._wait()
+        return self._consume(n)
+
+    async def readuntil(self, separator: bytes = b'\n') -> bytes:
+        buffer = self._protocol.buffer
+        offset = 0
+        while True:
+            index = buffer.find(separator, offset)
+            if index != -1:
+                end = index + len(separator)
+                if end > self._limit:
+                    raise asyncio.LimitOverrunError('Separator is found, but chunk is longer than limit', index)
+                return self._consume(end)
+            if len(buffer) > self._limit:
+                raise asyncio.LimitOverrunError('Separator is not found, and chunk exceed the limit', len(buffer))
+            if self._protocol.eof:
+                raise asyncio.IncompleteReadError(self._consume(len(buffer)), None)
+            offset = max(0, len(buffer) - len(separator) + 1)
+            await self._wait()
+
+    async def readline(self) -> bytes:
+        try:
+            return await self.readuntil(b'\n')
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+        except asyncio.LimitOverrunError as e:
+            raise ValueError(e.args[0])
+
+    def wakeup(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def _wait(self) -> None:
+        self._protocol.resume_reading()
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def _consume(self, size: int) -> bytes:
+        buffer = self._protocol.buffer
+        data = bytes(buffer[:size])
+        del buffer[:size]
+        if len(buffer) < READ_BUFFER_LIMIT:
+            self._protocol.resume_reading()
+        return data
+
+
+class ProtocolWriter:
+    """StreamWriter-compatible wrapper around the transport of an HTTPProtocol"""
+
+    def __init__(self, transport: asyncio.Transport, protocol: 'HTTPProtocol'):
+        self.transport = transport
+        self._protocol = protocol
+
+    def write(self, data: bytes) -> None:
+        self.transport.write(data)
+
+    def writelines(self, data: Iterable[bytes]) -> None:
+        self.transport.writelines(data)
+
+    def can_write_eof(self) -> bool:
+        return self.transport.can_write_eof()
+
+    def write_eof(self) -> None:
+        self.transport.write_eof()
+
+    def get_extra_info(self, name: str, default=None):
+        return self.transport.get_extra_info(name, default)
+
+    def is_closing(self) -> bool:
+        return self.transport.is_closing()
+
+    def close(self) -> None:
+        self.transport.close()
+
+    async def wait_closed(self) -> None:
+        await asyncio.shield(self._protocol.closed)
+
+    async def drain(self) -> None:
+        if self.transport.is_closing():
+            # Give connection_lost() a chance to run, like StreamWriter.drain()
+            await asyncio.sleep(0)
+        await self._protocol.drain()
+
+
+class HTTPProtocol(asyncio.Protocol):
+    """
+    HTTP/1.1 connection handled with protocol callbacks instead of streams.
+
+    Request heads are parsed straight from the receive buffer in
+    data_received(), without a coroutine per line. Each request then runs in
+    a task through the server's handle_request(), so handlers see the same
+    HTTPRequest (with a StreamReader/StreamWriter-compatible reader and
+    writer) as with the stream-based connection handling.
+    """
+
+    def __init__(self, server: 'AsyncTCPServer'):
+        self.server = server
+        self.loop = asyncio.get_running_loop()
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = bytearray()
+        self.eof = False
+        self.reader = ProtocolReader(self)
+        self.writer: Optional[ProtocolWriter] = None
+        self.client_addr: Optional[tuple] = None
+        self.closed = self.loop.create_future()
+        self.task: Optional[asyncio.Task] = None
+        self.requests_served = 0
+        self.hijacked = False  # The connection was taken over by a handler
+        self.http2 = False  # The connection speaks HTTP/2, which ends at the client's EOF
+        self.timeouts: Optional[ConnectionTimeouts] = None
+        self._reading_paused = False
+        self._writing_paused = False
+        self._drain_waiter: Optional[asyncio.Future] = None
+        self._lost = False
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self.writer = ProtocolWriter(transport, self)
+        self.client_addr = transport.get_extra_info('peername') or UNIX_CLIENT_ADDRESS
+        self.server.logger.info(f"Client connected from {self.client_addr[0]}:{self.client_addr[1]}")
+        self.timeouts = ConnectionTimeouts(self.server.timeouts, transport, self.client_addr)
+        self.timeouts.start('header')
+        self.server.connections.add(self.timeouts)
+        if self.server._negotiated_http2(transport):
+            self._start_http2()
+
+    def data_received(self, data: bytes) -> None:
+        self.buffer += data
+        if len(self.buffer) > READ_BUFFER_LIMIT and not self._reading_paused:
+            self._reading_paused = True
+            self.transport.pause_reading()
+        self.timeouts.data_received()
+        if self.task is None and not self.hijacked:
+            self._next_request()
+        else:
+            self.reader.wakeup()
+
+    def eof_received(self) -> bool:
+        self.eof = True
+        self.reader.wakeup()
+        # Keep the transport open while a response is still being written
+        return (self.task is not None or self.hijacked) and not self.http2
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.eof = True
+        self._lost = True
+        self.timeouts.cancel()
+        self.reader.wakeup()
+        if self._drain_waiter is not None and not self._drain_waiter.done():
+            self._drain_waiter.set_result(None)
+        if not self.closed.done():
+            self.closed.set_result(None)
+        self.server.connections.discard(self.timeouts)
+        self.server.admission.connection_closed()
+
+    def pause_writing(self) -> None:
+        self._writing_paused = True
+
+    def resume_writing(self) -> None:
+        self._writing_paused = False
+        if self._drain_waiter is not None and not self._drain_waiter.done():
+            self._drain_waiter.set_result(None)
+
+    def resume_reading(self) -> None:
+        if self._reading_paused and not self._lost:
+            self._reading_paused = False
+            self.transport.resume_reading()
+
+    async def drain(self) -> None:
+        """Wait until the transport's write buffer is below its high-water mark"""
+        if self._lost:
+            raise ConnectionResetError('Connection lost')
+        if not self._writing_paused:
+            return
+        self._drain_waiter = self.loop.create_future()
+        try:
+            await self.timeouts.wait_writable(self._drain_waiter)
+        finally:
+            self._drain_waiter = None
+        if self._lost:
+            raise ConnectionResetError('Connection lost')
+
+    def _next_request(self) -> None:
+        """Start handling the next request once its head is complete in the buffer"""
+        buffer = self.buffer
+        # Tolerate empty lines before the request line (RFC 9112, section 2.2)
+        start = 0
+        while start < len(buffer) and buffer[start] in b'\r\n':
+            start += 1
+        if start:
+            del buffer[:start]
+
+        end = buffer.find(b'\n\r\n')
+        separator = 3
+        bare_end = buffer.find(b'\n\n', 0, end if end != -1 else len(buffer))
+        if bare_end != -1:
+            end, separator = bare_end, 2
+
+        max_header_size = self.server.max_header_size
+        if end == -1:
+            if len(buffer) > max_header_size:
+                self._reject(HTTPError(431, "Request Header Fields Too Large"))
+            elif self.eof:
+                self.transport.close()
+            return
+        if end + separator > max_header_size:
+            self._reject(HTTPError(431, "Request Header Fields Too Large"))
+            return
+
+        head = bytes(buffer[:end])
+        del buffer[:end + separator]
+        try:
+            request = HTTPRequest.from_head(head)
+        except HTTPError as e:
+            self._reject(e)
+            return
+        if self.requests_served == 0 and self.server._is_h2c_preface(request, self.transport):
+            self._start_http2(H2C_PREFACE_HEAD)
+            return
+
+        self.timeouts.cancel()
+        request.reader = self.reader
+        request.writer = self.writer
+        self.requests_served += 1
+        self.task = self.loop.create_task(self._run(request))
+
+    async def _run(self, request: HTTPRequest) -> None:
+        try:
+            if not await self.server._serve_request(request, self.writer, self.client_addr, self.requests_served,
+                                                    self.timeouts):
+                # Connection was taken over by the handler (e.g. WebSocket upgrade)
+                self.hijacked = True
+                return
+        except (ConnectionResetError, BrokenPipeError):
+            self.server.logger.debug(f"Client {self.client_addr} closed the connection")
+            self.transport.close()
+            return
+        except Exception as e:
+            self.server.logger.error(f"Error handling client {self.client_addr}: {e}")
+            self.timeouts.close()
+            return
+        finally:
+            self.task = None
+
+        # An unread body would be taken for the next request
+        if not request.keep_alive or request.body_pending or self.transport.is_closing():
+            self.timeouts.close()
+            return
+
+        self.timeouts.start('keep_alive')
+        self.resume_reading()
+        if self.buffer:
+            # Pipelined request
+            self._next_request()
+        elif self.eof:
+            self.transport.close()
+
+    def _start_http2(self, preface: bytes = b'') -> None:
+        """Hand the connection over to HTTP/2, which reads the rest through the reader"""
+        self.hijacked = True
+        self.http2 = True
+        self.task = self.loop.create_task(self._run_http2(preface))
+
+    async def _run_http2(self, preface: bytes) -> None:
+        try:
+            await self.server._serve_http2(self.reader, self.writer, self.client_addr, self.timeouts, preface)
+        except Exception as e:
+            self.server.logger.error(f"Error handling client {self.client_addr}: {e}")
+        finally:
+            if not self.transport.is_closing():
+                self.timeouts.close()
+
+    def _reject(self, error: HTTPError) -> None:
+        """Answer a request that failed before reaching handle_request and close the connection"""
+        self.server.logger.warning(f"Rejected request from client {self.client_addr}: {error.status_code} {error.message}")
+        response = HTTPResponse(error.status_code, headers={'connection': 'close'}, body=error.message)
+        self.transport.write(response.to_bytes())
+        self.transport.close()
@@ -0,0 +1,253 @@
+"""
+Listening socket helpers for PyServe
+"""
+import errno
+import os
+import socket
+import ssl
+import stat
+from typing import Any, Dict, List, Optional, Tuple
+
+from pyserve.core.server.base import DEFAULT_BACKLOG
+
+# Options a listener may set on its listening socket, accepted connections inherit them on Linux
+SOCKET_OPTIONS = {
+    'rcvbuf': (socket.SOL_SOCKET, 'SO_RCVBUF'),
+    'sndbuf': (socket.SOL_SOCKET, 'SO_SNDBUF'),
+    'keepalive': (socket.SOL_SOCKET, 'SO_KEEPALIVE'),
+    'nodelay': (socket.IPPROTO_TCP, 'TCP_NODELAY'),
+    'defer_accept': (socket.IPPROTO_TCP, 'TCP_DEFER_ACCEPT'),  # Linux: wake accept only once data arrived
+    'fastopen': (socket.IPPROTO_TCP, 'TCP_FASTOPEN'),  # Queue length for TCP Fast Open requests
+}
+UNIX_CLIENT_ADDRESS = ('unix', 0)  # Client address of connections on Unix domain sockets, which have no peer name
+
+
+def create_listening_socket(host: str, port: int, backlog: int = DEFAULT_BACKLOG, reuse_port: bool = False) -> socket.socket:
+    """
+    Create a bound, listening TCP socket
+
+    Args:
+        host: Address to bind, IPv6 addresses are detected by the colon
+        port: Port to bind
+        backlog: Listen backlog
+        reuse_port: Set SO_REUSEPORT so other processes can bind the same port
+
+    Returns:
+        socket.socket: The listening socket
+    """
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    return socket.create_server((host, port), family=family, backlog=backlog, reuse_port=reuse_port)
+
+
+def create_unix_socket(path: str, backlog: int = DEFAULT_BACKLOG, mode: Optional[int] = None) -> socket.socket:
+    """
+    Create a bound, listening Unix domain socket, replacing a stale socket file left at path
+
+    Args:
+        path: Filesystem path to bind
+        backlog: Listen backlog
+        mode: Permissions for the socket file (e.g. 0o660 to let a proxy's group connect)
+
+    Returns:
+        socket.socket: The listening socket
+    """
+    _remove_stale_socket(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        if mode is not None:
+            os.chmod(path, mode)
+        sock.listen(backlog)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def _remove_stale_socket(path: str) -> None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise OSError(errno.EADDRINUSE, f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        # Nobody listens on it, left behind by a process that did not exit cleanly
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, f"{path} is in use by another process")
+
+
+def apply_socket_options(sock: socket.socket, options: Dict[str, int]) -> None:
+    """
+    Set SOCKET_OPTIONS on a socket
+
+    Raises:
+        ValueError: For unknown options and options the platform does not have
+    """
+    for name, value in options.items():
+        if name not in SOCKET_OPTIONS:
+            raise ValueError(f"Unknown socket option: {name}. Must be one of: {', '.join(SOCKET_OPTIONS)}")
+        level, constant = SOCKET_OPTIONS[name]
+        if not hasattr(socket, constant):
+            raise ValueError(f"Socket option {name} is not supported on this platform")
+        sock.setsockopt(level, getattr(socket, constant), int(value))
+
+
+class Listener:
+    """
+    An address the server accepts connections on: a TCP host/port or a Unix domain socket path.
+
+    A server can have several listeners, e.g. plain HTTP and HTTPS ports and
+    a Unix socket for a proxy in front of it. They all feed the same server,
+    so routing, caches and upstream connection pools are shared.
+    """
+
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: Optional[int] = None,
+                 path: Optional[str] = None,
+                 tls: Optional[bool] = None,
+                 backlog: int = DEFAULT_BACKLOG,
+                 reuse_port: bool = False,
+                 options: Optional[Dict[str, int]] = None,
+                 mode: Optional[int] = None,
+                 sock: Optional[socket.socket] = None):
+        """
+        Args:
+            host: Address to bind (TCP)
+            port: Port to bind (TCP)
+            path: Unix domain socket path, used instead of host and port
+            tls: Serve HTTPS with the server's certificate, None follows whether the server has one
+            backlog: Listen backlog
+            reuse_port: Bind one socket per pre-forked worker with SO_REUSEPORT (TCP, see bind_workers())
+            options: SOCKET_OPTIONS to set on the listening socket
+            mode: Permissions of the Unix socket file
+            sock: Already listening socket (e.g. handed over by an upgrade)
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+        self.tls = tls
+        self.backlog = backlog
+        self.reuse_port = reuse_port and path is None
+        self.options = options or {}
+        self.mode = mode
+        self.sock = sock
+        self.worker_socks: List[socket.socket] = []  # SO_REUSEPORT sockets by worker index, see bind_workers()
+        self.ssl_context: Optional[ssl.SSLContext] = None  # Set by the server for TLS listeners
+        self.handed_over = False  # The socket now belongs to a new generation, keep the socket file
+        self._owner_pid: Optional[int] = None  # Process that created the socket file
+
+    def bind(self) -> socket.socket:
+        """Create the listening socket unless it exists already"""
+        if self.sock is None:
+            if self.path is not None:
+                sock = create_unix_socket(self.path, self.backlog, self.mode)
+                self._owner_pid = os.getpid()
+            else:
+                sock = create_listening_socket(self.host, self.port, self.backlog, self.reuse_port)
+            self.sock = sock
+            try:
+                apply_socket_options(sock, self.options)
+            except BaseException:
+                self.close()
+                self.sock = None
+                raise
+        return self.sock
+
+    def bind_workers(self, workers: int) -> List[socket.socket]:
+        """
+        Create the SO_REUSEPORT sockets of the workers, keeping those handed over by the previous generation
+
+        Every worker accepts on its own socket and the kernel spreads connections
+        between them. The sockets outlive the workers, so a restarted worker or
+        the next generation takes over the connections queued in them. Handed
+        over sockets beyond the number of workers are closed: they stay open until
+        the previous generation exits, and connections queued in them after its
+        workers stopped accepting are reset.
+        """
+        for sock in self.worker_socks[workers:]:
+            sock.close()
+        del self.worker_socks[workers:]
+        while len(self.worker_socks) < workers:
+            sock = create_listening_socket(self.host, self.port, self.backlog, reuse_port=True)
+            try:
+                apply_socket_options(sock, self.options)
+            except BaseException:
+                sock.close()
+                raise
+            self.worker_socks.append(sock)
+        return self.worker_socks
+
+    def adopt(self, sock: socket.socket) -> None:
+        """Take over a listening socket handed over by the previous generation, with its socket file"""
+        if self.reuse_port:
+            self.worker_socks.append(sock)
+            return
+        self.sock = sock
+        if self.path is not None:
+            self._owner_pid = os.getpid()
+
+    def close(self) -> None:
+        """Close the socket, removing the Unix socket file in the process that created it"""
+        if self.sock is not None:
+            self.sock.close()
+        for sock in self.worker_socks:
+            sock.close()
+        if self.path is not None and self._owner_pid == os.getpid() and not self.handed_over:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self._owner_pid = None
+
+    def address_key(self) -> Tuple[int, Any]:
+        """(family, address) as getsockname() reports it once bound, to match handed over sockets"""
+        if self.path is not None:
+            return socket.AF_UNIX, self.path
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        info = socket.getaddrinfo(self.host or None, self.port, family, socket.SOCK_STREAM, 0, socket.AI_PASSIVE)
+        return family, info[0][4][:2]
+
+    def url(self) -> str:
+        if self.path is not None:
+            return f"unix:{self.path}" + (" (https)" if self.ssl_context else "")
+        scheme = "https" if self.ssl_context else "http"
+        host = f"[{self.host}]" if ':' in self.host else self.host
+        return f"{scheme}://{host}:{self.port}/"
+
+    def __repr__(self) -> str:
+        return f"Listener({self.path or f'{self.host}:{self.port}'})"
+
+
+def adopt_sockets(listeners: List[Listener], socks: List[socket.socket]) -> None:
+    """
+    Hand listening sockets of a previous generation to the listeners bound to the same address
+
+    Listeners with reuse_port take all sockets of their address (one per worker
+    of the previous generation), the others one. Sockets no listener is
+    configured for any more are closed.
+    """
+    by_address: Dict[Tuple[int, Any], List[socket.socket]] = {}
+    for sock in socks:
+        address = sock.getsockname()
+        by_address.setdefault((sock.family, address if sock.family == socket.AF_UNIX else address[:2]), []).append(sock)
+    for listener in listeners:
+        if listener.sock is None:
+            found = by_address.pop(listener.address_key(), [])
+            if found and not listener.reuse_port:
+                # The others were the previous generation's per-worker SO_REUSEPORT sockets
+                listener.adopt(found.pop(0))
+                by_address[listener.address_key()] = found
+                continue
+            for sock in found:
+                listener.adopt(sock)
+    for found in by_address.values():
+        for sock in found:
+            sock.close()
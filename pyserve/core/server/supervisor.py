@@ -0,0 +1,254 @@
+"""
+Pre-fork worker supervisor for PyServe
+"""
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pyserve.core.logging import get_logger
+from pyserve.core.server.sockets import Listener
+from pyserve.core.server.upgrade import Upgrade, READY_FD_ENV, notify_ready
+
+FORWARDED_SIGNALS = ('SIGHUP', 'SIGUSR1')
+STOP_TIMEOUT = 30.0  # Seconds workers get to exit after SIGTERM before they are killed
+STOP_TIMEOUT_MARGIN = 5.0  # Seconds on top of the workers' drain time before they are killed
+MIN_WORKER_LIFETIME = 1.0  # Workers dying sooner are restarted with a delay to avoid a fork loop
+RESTART_DELAY = 1.0
+POLL_INTERVAL = 0.2
+
+
+def reuse_port_supported() -> bool:
+    """Check if the kernel balances connections between sockets bound with SO_REUSEPORT"""
+    # BSD and macOS accept SO_REUSEPORT but hand every connection to the last socket bound
+    return hasattr(socket, 'SO_REUSEPORT') and sys.platform.startswith('linux')
+
+
+class WorkerSupervisor:
+    """
+    Runs a server in several forked worker processes.
+
+    The supervisor binds all listening sockets before forking. Listeners with
+    reuse_port get one SO_REUSEPORT socket per worker and the kernel spreads
+    connections between them; all workers accept on the other listeners (and
+    Unix sockets). The sockets stay open in the supervisor, so connections
+    queued for a worker wait for its replacement instead of being reset.
+    Workers that exit unexpectedly are restarted; SIGTERM and SIGINT stop
+    all workers, SIGHUP and SIGUSR1 are forwarded to them. SIGUSR2 starts a
+    new generation (see Upgrade) with all sockets and stops the workers once
+    it serves.
+    """
+
+    def __init__(self,
+                 workers: int,
+                 target: Callable[[], Optional[int]],
+                 listeners: List[Listener],
+                 stop_timeout: float = STOP_TIMEOUT,
+                 ready_fd: Optional[int] = None):
+        """
+        Args:
+            workers: Number of worker processes
+            target: Runs the server on the listeners in a worker and returns the exit code
+            listeners: Listeners of the server, bound here
+            stop_timeout: Seconds to wait for workers to exit before killing them
+            ready_fd: Pipe of the previous generation to notify once all workers serve
+        """
+        self.workers = workers
+        self.target = target
+        self.listeners = listeners
+        self.stop_timeout = stop_timeout
+        self.logger = get_logger()
+        self.ready_fd = ready_fd
+        self._workers_ready: Optional[Tuple[int, int]] = None  # Pipe the workers report on once they serve
+        self._serving = 0
+        self.upgrade: Optional[Upgrade] = None
+        self._upgrade_requested = False
+        self.children: Dict[int, int] = {}  # pid -> worker index
+        self.started_at: Dict[int, float] = {}  # worker index -> start time
+        self.stopping = False
+        self.kill_deadline = 0.0
+
+    def run(self) -> int:
+        """
+        Fork the workers and supervise them until a stop signal arrives
+
+        Returns:
+            int: Exit code for the supervisor process
+        """
+        if not hasattr(os, 'fork'):
+            self.logger.critical("Running several workers requires os.fork(), which is not available on this platform")
+            return 1
+
+        try:
+            for listener in self.listeners:
+                if listener.reuse_port:
+                    socks = listener.bind_workers(self.workers)
+                else:
+                    socks = [listener.bind()]
+                for sock in socks:
+                    sock.set_inheritable(True)
+        except BaseException:
+            self._close_listeners()
+            raise
+        if self.ready_fd is not None:
+            self._workers_ready = os.pipe()
+
+        mode = "SO_REUSEPORT" if any(listener.reuse_port for listener in self.listeners) else "shared sockets"
+        self.logger.info(f"Supervisor {os.getpid()} starting {self.workers} workers ({mode})")
+        self._install_signal_handlers()
+        for index in range(self.workers):
+            self._spawn(index)
+
+        try:
+            self._supervise()
+        finally:
+            self._close_listeners()
+        self.logger.info("All workers stopped")
+        return 0
+
+    def stop(self, sig: int = signal.SIGTERM) -> None:
+        """Ask all workers to exit, they are killed after stop_timeout"""
+        if not self.stopping:
+            self.logger.info(f"Stopping {len(self.children)} workers...")
+            self.stopping = True
+            self.kill_deadline = time.monotonic() + self.stop_timeout
+        self._signal_children(sig)
+
+    def _install_signal_handlers(self) -> None:
+        signal.signal(signal.SIGTERM, lambda sig, frame: self.stop(signal.SIGTERM))
+        signal.signal(signal.SIGINT, lambda sig, frame: self.stop(signal.SIGTERM))
+        for name in FORWARDED_SIGNALS:
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), lambda sig, frame: self._signal_children(sig))
+        signal.signal(signal.SIGUSR2, lambda sig, frame: self._request_upgrade())
+
+    def _request_upgrade(self) -> None:
+        # Started from the supervise loop rather than inside the signal handler
+        self._upgrade_requested = True
+
+    def _spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(index)
+        self.children[pid] = index
+        self.started_at[index] = time.monotonic()
+        self.logger.info(f"Worker {index} started (pid {pid})")
+
+    def _run_worker(self, index: int) -> None:
+        """Body of a forked worker, never returns"""
+        code = 1
+        try:
+            for listener in self.listeners:
+                if listener.reuse_port:
+                    # Accept on this worker's socket only, the others belong to the other workers
+                    for i, sock in enumerate(listener.worker_socks):
+                        if i != index:
+                            sock.close()
+                    listener.sock = listener.worker_socks[index]
+                    listener.worker_socks = []
+            # The worker's event loop installs its own handlers
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR2):
+                signal.signal(sig, signal.SIG_DFL)
+            for name in FORWARDED_SIGNALS:
+                if hasattr(signal, name):
+                    signal.signal(getattr(signal, name), signal.SIG_DFL)
+            if self._workers_ready is not None:
+                os.close(self._workers_ready[0])
+                os.environ[READY_FD_ENV] = str(self._workers_ready[1])
+            code = self.target() or 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 0
+        except KeyboardInterrupt:
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _supervise(self) -> None:
+        while self.children:
+            pid, status = self._wait_worker()
+            if pid == 0:
+                self._check_upgrade()
+                if self.stopping and time.monotonic() >= self.kill_deadline:
+                    self.logger.warning(f"Killing {len(self.children)} workers that did not exit in time")
+                    self._signal_children(signal.SIGKILL)
+                    self.kill_deadline = float('inf')
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            index = self.children.pop(pid, None)
+            if index is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                self.logger.debug(f"Worker {index} (pid {pid}) exited with code {code}")
+                continue
+
+            self.logger.warning(f"Worker {index} (pid {pid}) exited with code {code}, restarting")
+            if time.monotonic() - self.started_at.get(index, 0.0) < MIN_WORKER_LIFETIME:
+                time.sleep(RESTART_DELAY)
+                if self.stopping:
+                    continue
+            self._spawn(index)
+
+    def _wait_worker(self) -> Tuple[int, int]:
+        """Like waitpid(-1, WNOHANG) for the workers only, a new generation is a child of the supervisor too"""
+        for pid in list(self.children):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                return pid, 0
+            if done:
+                return done, status
+        return 0, 0
+
+    def _check_upgrade(self) -> None:
+        """Report to the previous generation once all workers serve, and drive an upgrade to the next one"""
+        if self._workers_ready is not None:
+            ready_read = self._workers_ready[0]
+            while self._serving < self.workers and select.select([ready_read], [], [], 0)[0]:
+                self._serving += len(os.read(ready_read, self.workers))
+            if self._serving >= self.workers:
+                for fd in self._workers_ready:
+                    os.close(fd)
+                self._workers_ready = None
+                notify_ready(self.ready_fd)
+                self.ready_fd = None
+
+        if self._upgrade_requested:
+            self._upgrade_requested = False
+            if self.upgrade is not None or self.stopping:
+                self.logger.warning("Ignoring SIGUSR2, an upgrade or shutdown is already in progress")
+            else:
+                socks = [listener.sock for listener in self.listeners if listener.sock is not None]
+                socks += [sock for listener in self.listeners for sock in listener.worker_socks]
+                self.upgrade = Upgrade(socks)
+                if not self.upgrade.start():
+                    self.upgrade = None
+
+        if self.upgrade is not None:
+            ready = self.upgrade.poll()
+            if ready is not None:
+                self.upgrade = None
+            if ready:
+                for listener in self.listeners:
+                    listener.handed_over = True
+                self.stop(signal.SIGTERM)
+
+    def _close_listeners(self) -> None:
+        for listener in self.listeners:
+            listener.close()
+
+    def _signal_children(self, sig: int) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
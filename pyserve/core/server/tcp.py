@@ -1,66 +1,530 @@
 import asyncio
+import socket
 import ssl
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
 from pyserve.core.logging import get_logger
-from pyserve.core.server.base import BaseServer
+from pyserve.core.server.base import BaseServer, DEFAULT_BACKLOG
+from pyserve.core.server.admission import AdmissionController, DEFAULT_RETRY_AFTER
+from pyserve.core.server.sockets import Listener, UNIX_CLIENT_ADDRESS
+from pyserve.core.server.timeouts import (
+    TimeoutPolicy, ConnectionTimeouts, DEFAULT_HEADER_TIMEOUT, DEFAULT_BODY_TIMEOUT, DEFAULT_WRITE_TIMEOUT,
+    DEFAULT_MIN_RATE, DEFAULT_MIN_RATE_GRACE
+)
+from pyserve.core.exceptions import HTTPError
+from pyserve.http.request import HTTPRequest, DEFAULT_MAX_HEADER_SIZE, DEFAULT_MAX_BODY_SIZE, DEFAULT_BODY_BUFFER_SIZE
+from pyserve.http.response import HTTPResponse
+from pyserve.core.server.protocol import HTTPProtocol
+from pyserve.core.server.http2 import (
+    HTTP2Connection, HTTP2Policy, H2C_PREFACE_HEAD, DEFAULT_MAX_CONCURRENT_STREAMS, DEFAULT_INITIAL_WINDOW_SIZE,
+    DEFAULT_HEADER_TABLE_SIZE, DEFAULT_IDLE_TIMEOUT, http2_available, is_h2c_preface
+)
+
+IO_MODES = ('streams', 'protocol')
+ACCEPT_RETRY_DELAY = 1.0  # Seconds to stop accepting after an error like EMFILE (too many open files)
+DEFAULT_SHUTDOWN_TIMEOUT = 30.0  # Seconds in-flight requests get to finish on shutdown
+DRAIN_POLL_INTERVAL = 0.1
+DRAIN_NEW_CONNECTION_GRACE = 1.0  # Seconds a connection accepted before the drain gets to send its first request
+
+
+def get_client_address(transport: asyncio.BaseTransport) -> tuple:
+    """Peer address of a connection, UNIX_CLIENT_ADDRESS on Unix domain sockets"""
+    return transport.get_extra_info('peername') or UNIX_CLIENT_ADDRESS
+
+
+class _StreamProtocol(asyncio.StreamReaderProtocol):
+    """StreamReaderProtocol that runs the connection's timeouts and tells the server when it is gone"""
+
+    def __init__(self, server: 'AsyncTCPServer'):
+        super().__init__(asyncio.StreamReader(), self._client_connected)
+        self._server = server
+        self.timeouts: Optional[ConnectionTimeouts] = None
+        self.writing_paused = False
+
+    def _client_connected(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Awaitable[None]:
+        return self._server.handle_connection(reader, _TimedStreamWriter(writer, self))
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.timeouts = ConnectionTimeouts(self._server.timeouts, transport, get_client_address(transport))
+        self.timeouts.start('header')
+        self._server.connections.add(self.timeouts)
+        super().connection_made(transport)
+
+    def data_received(self, data: bytes) -> None:
+        super().data_received(data)
+        self.timeouts.data_received()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.timeouts.cancel()
+        super().connection_lost(exc)
+        self._server.connections.discard(self.timeouts)
+        self._server.admission.connection_closed()
+
+    def pause_writing(self) -> None:
+        super().pause_writing()
+        self.writing_paused = True
+
+    def resume_writing(self) -> None:
+        super().resume_writing()
+        self.writing_paused = False
+
+
+class _TimedStreamWriter:
+    """StreamWriter wrapper whose drain() gives up on a client that stops reading (write timeout and min_rate)"""
+
+    def __init__(self, writer: asyncio.StreamWriter, protocol: _StreamProtocol):
+        self._writer = writer
+        self._protocol = protocol
+        self.transport = writer.transport
+
+    def write(self, data: bytes) -> None:
+        self._writer.write(data)
+
+    def writelines(self, data: Iterable[bytes]) -> None:
+        self._writer.writelines(data)
+
+    def can_write_eof(self) -> bool:
+        return self._writer.can_write_eof()
+
+    def write_eof(self) -> None:
+        self._writer.write_eof()
+
+    def get_extra_info(self, name: str, default=None):
+        return self._writer.get_extra_info(name, default)
+
+    def is_closing(self) -> bool:
+        return self._writer.is_closing()
+
+    def close(self) -> None:
+        self._writer.close()
+
+    async def wait_closed(self) -> None:
+        await self._writer.wait_closed()
+
+    async def drain(self) -> None:
+        # StreamWriter.drain() only waits while the transport's write buffer is full
+        if self._protocol.writing_paused:
+            await self._protocol.timeouts.wait_writable(self._writer.drain())
+        else:
+            await self._writer.drain()
 
 
 class AsyncTCPServer(BaseServer):
-    def __init__(self, host: str, port: int, backlog: int = 5, ssl_context: Optional[ssl.SSLContext] = None):
+    def __init__(self,
+                 host: str,
+                 port: int,
+                 backlog: int = DEFAULT_BACKLOG,
+                 ssl_context: Optional[ssl.SSLContext] = None,
+                 keep_alive: bool = True,
+                 keep_alive_timeout: float = 5.0,
+                 keep_alive_max_requests: int = 100,
+                 max_header_size: int = DEFAULT_MAX_HEADER_SIZE,
+                 max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+                 body_buffer_size: int = DEFAULT_BODY_BUFFER_SIZE,
+                 sock: Optional[socket.socket] = None,
+                 reuse_port: bool = False,
+                 io_mode: str = 'streams',
+                 max_connections: int = 0,
+                 max_requests: int = 0,
+                 max_loop_lag: float = 0.0,
+                 retry_after: int = DEFAULT_RETRY_AFTER,
+                 header_timeout: float = DEFAULT_HEADER_TIMEOUT,
+                 body_timeout: float = DEFAULT_BODY_TIMEOUT,
+                 write_timeout: float = DEFAULT_WRITE_TIMEOUT,
+                 min_rate: int = DEFAULT_MIN_RATE,
+                 min_rate_grace: float = DEFAULT_MIN_RATE_GRACE,
+                 readiness_path: Optional[str] = None,
+                 listeners: Optional[List[Listener]] = None,
+                 http2: bool = True,
+                 h2c: bool = False,
+                 http2_max_concurrent_streams: int = DEFAULT_MAX_CONCURRENT_STREAMS,
+                 http2_initial_window_size: int = DEFAULT_INITIAL_WINDOW_SIZE,
+                 http2_header_table_size: int = DEFAULT_HEADER_TABLE_SIZE,
+                 http2_idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
         super().__init__(host, port, backlog)
         self.ssl_context = ssl_context
+        # Without listeners the server listens on host and port (or on sock, an already
+        # listening socket, e.g. inherited from a pre-fork supervisor)
+        if not listeners:
+            listeners = [Listener(host, port, backlog=backlog, reuse_port=reuse_port, sock=sock)]
+        for listener in listeners:
+            if listener.tls and ssl_context is None:
+                raise ValueError(f"TLS listener {listener.url()} requires an SSL certificate")
+            listener.ssl_context = ssl_context if listener.tls is not False else None
+        self.listeners = listeners
+        self.keep_alive = keep_alive
+        self.keep_alive_timeout = keep_alive_timeout
+        self.keep_alive_max_requests = keep_alive_max_requests  # 0 means unlimited
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size  # 0 means unlimited
+        self.body_buffer_size = body_buffer_size
+        if io_mode not in IO_MODES:
+            raise ValueError(f"Invalid io_mode: {io_mode}. Must be one of: {', '.join(IO_MODES)}")
+        # streams: StreamReader/StreamWriter per connection, protocol: HTTPProtocol parsing from data_received
+        self.io_mode = io_mode
+        self.admission = AdmissionController(max_connections, max_requests, max_loop_lag, retry_after)
+        self.timeouts = TimeoutPolicy(header_timeout, body_timeout, keep_alive_timeout, write_timeout,
+                                      min_rate, min_rate_grace)
+        # Answers 200 while the server takes traffic and 503 once it is shutting down
+        self.readiness_path = readiness_path
+        # HTTP/2 is served on TLS connections that negotiate h2 with ALPN and, with h2c, on cleartext
+        # connections starting with the HTTP/2 preface; it needs the h2 package
+        self.http2: Optional[HTTP2Policy] = None
+        if http2 and http2_available():
+            self.http2 = HTTP2Policy(http2_max_concurrent_streams, http2_initial_window_size,
+                                     http2_header_table_size, max_header_size, h2c, http2_idle_timeout)
+        self.connections: Set[ConnectionTimeouts] = set()  # Open client connections
+        self._connecting: Set[asyncio.Task] = set()  # Accepted connections not attached to a protocol yet
+        self.draining = False
+        self._drain_cut = asyncio.Event()  # Set by a second shutdown() to skip the rest of the drain
+        self._started = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._accept_tasks: List[asyncio.Task] = []
         self.logger = get_logger()
-        
+
     async def start(self) -> None:
-        self.server = await asyncio.start_server(
-            self.handle_connection,
-            self.host,
-            self.port,
-            backlog=self.backlog,
-            ssl=self.ssl_context
-        )
+        for listener in self.listeners:
+            listener.bind().setblocking(False)
+
+        if self.io_mode == 'protocol':
+            protocol_factory = lambda: HTTPProtocol(self)
+        else:
+            protocol_factory = lambda: _StreamProtocol(self)
+
         self.running = True
-        
-        protocol = "https" if self.ssl_context else "http"
-        self.logger.info(f"TCP Server started on {protocol}://{self.host}:{self.port}")
-        
-        async with self.server:
-            await self.server.serve_forever()
-            
+        self.admission.start()
+
+        for listener in self.listeners:
+            self.logger.info(f"TCP Server started on {listener.url()} ({self.io_mode})")
+
+        # Returns once stop() or shutdown() is done, cancelling start() itself raises CancelledError
+        self._accept_tasks = [asyncio.ensure_future(self._accept_loop(listener, protocol_factory))
+                              for listener in self.listeners]
+        self._started.set()
+        try:
+            await asyncio.gather(*self._accept_tasks)
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+        await self._stopped.wait()
+
+    async def wait_started(self) -> None:
+        """Wait until the server accepts connections"""
+        await self._started.wait()
+
     async def stop(self) -> None:
+        """Stop right away, open connections are left to whoever cancels the remaining tasks"""
         self.logger.info("Shutting down TCP server...")
+        self._stop_accepting()
+        self.admission.close()
+        self.logger.debug(f"Admission: {self.admission.stats()}")
+        self.logger.debug(f"Timeouts: {self.timeouts.stats()}")
+        self._stopped.set()
+
+    async def shutdown(self, timeout: float = DEFAULT_SHUTDOWN_TIMEOUT, readiness_delay: float = 0.0) -> None:
+        """
+        Stop gracefully (SIGTERM), letting in-flight requests finish
+
+        The server reports not ready first and keeps serving for readiness_delay
+        seconds, so load balancers polling readiness_path stop sending traffic.
+        Then it stops accepting, closes idle keep-alive connections and waits up
+        to timeout seconds for the others to finish their current request. What
+        is still open after that is aborted before stop() is called. Calling
+        shutdown() again while draining skips the rest of the wait.
+
+        Args:
+            timeout: Seconds in-flight requests get to finish
+            readiness_delay: Seconds to keep accepting after reporting not ready
+        """
+        if self.draining:
+            self.logger.warning("Shutdown requested again, closing remaining connections")
+            self._drain_cut.set()
+            return
+        self.draining = True
+
+        if readiness_delay:
+            self.logger.info(f"Reporting not ready, accepting connections for another {readiness_delay:g}s")
+            await self._wait_drain_cut(readiness_delay)
+
+        self._stop_accepting()
+        idle = self._close_idle()
+        self.logger.info(f"Draining {len(self.connections) - idle} connections "
+                         f"({self.admission.requests} requests in flight, {idle} idle closed), "
+                         f"waiting up to {timeout:g}s")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Connections accepted just before are still being set up, they get to finish their request as well
+        while (self.connections or self._connecting) and loop.time() < deadline and not self._drain_cut.is_set():
+            await self._wait_drain_cut(DRAIN_POLL_INTERVAL)
+            self._close_idle()
+
+        if self.connections:
+            self.logger.warning(f"Closing {len(self.connections)} connections that did not finish in time")
+            for conn in list(self.connections):
+                conn.transport.abort()
+        else:
+            self.logger.info("All connections finished")
+        await self.stop()
+
+    def _close_idle(self) -> int:
+        """Close the connections without a request, new ones once they stayed silent for the grace period"""
+        idle = [conn for conn in self.connections if conn.is_idle(DRAIN_NEW_CONNECTION_GRACE)]
+        for conn in idle:
+            conn.close_idle()
+        return len(idle)
+
+    def is_ready(self) -> bool:
+        """Check if the server takes new traffic, False from the start of shutdown()"""
+        return self.running and not self.draining
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring, logged on SIGUSR1"""
+        stats = {'admission': self.admission.stats(), 'timeouts': self.timeouts.stats()}
+        if self.http2:
+            stats['http2'] = self.http2.stats()
+        return stats
+
+    def _stop_accepting(self) -> None:
         self.running = False
-        if self.server:
-            self.server.close()
-            await self.server.wait_closed()
-            
+        for task in self._accept_tasks:
+            task.cancel()
+        for listener in self.listeners:
+            listener.close()
+
+    async def _wait_drain_cut(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._drain_cut.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _accept_loop(self, listener: Listener, protocol_factory: Callable[[], asyncio.Protocol]) -> None:
+        """Accept connections on a listener, pausing while max_connections are open"""
+        loop = asyncio.get_running_loop()
+        while self.running:
+            # At the limit new connections wait in the kernel's listen backlog
+            await self.admission.wait_for_connection_slot()
+            try:
+                conn = await self._accept(listener.sock)
+            except (BlockingIOError, InterruptedError, ConnectionAbortedError):
+                continue
+            except OSError as e:
+                if not self.running:
+                    break
+                self.logger.error(f"Error accepting connection: {e}")
+                await asyncio.sleep(ACCEPT_RETRY_DELAY)
+                continue
+            if listener.path is None and listener.options.get('nodelay', True):
+                # asyncio only disables Nagle for sockets with proto IPPROTO_TCP, accepted ones have 0;
+                # with it on, small writes such as TLS records after the handshake wait for delayed ACKs
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.admission.connection_opened()
+            task = loop.create_task(self._connect(conn, protocol_factory, listener.ssl_context))
+            self._connecting.add(task)
+            task.add_done_callback(self._connecting.discard)
+
+    @staticmethod
+    async def _accept(sock: socket.socket) -> socket.socket:
+        """
+        Accept the next connection on a listening socket.
+
+        loop.sock_accept() can complete the accept() and then be cancelled
+        before returning, which drops the connection when accepting stops.
+        Here only the wait for readability is cancellable, accept() itself
+        runs without an await between it and the caller.
+        """
+        loop = asyncio.get_running_loop()
+        fileno = sock.fileno()
+        while True:
+            try:
+                return sock.accept()[0]
+            except (BlockingIOError, InterruptedError):
+                pass
+            readable = loop.create_future()
+            try:
+                loop.add_reader(fileno, lambda: readable.done() or readable.set_result(None))
+            except NotImplementedError:
+                # Proactor event loops (Windows) have no readiness callbacks
+                return (await loop.sock_accept(sock))[0]
+            try:
+                await readable
+            finally:
+                loop.remove_reader(fileno)
+
+    async def _connect(self, conn: socket.socket, protocol_factory: Callable[[], asyncio.Protocol],
+                       ssl_context: Optional[ssl.SSLContext]) -> None:
+        """Attach an accepted socket to a transport (doing the TLS handshake) and a protocol"""
+        try:
+            await asyncio.get_running_loop().connect_accepted_socket(protocol_factory, conn, ssl=ssl_context)
+        except (OSError, ssl.SSLError, asyncio.TimeoutError) as e:
+            self.logger.debug(f"Failed to set up connection: {e}")
+            conn.close()
+            self.admission.connection_closed()
+
     async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
-        client_addr = writer.get_extra_info('peername')
+        client_addr = get_client_address(writer.transport)
         self.logger.info(f"Client connected from {client_addr[0]}:{client_addr[1]}")
-        
+        # The header and keep-alive timeouts run on the protocol and close the
+        # transport when they expire, parse_head() then sees the end of the stream
+        timeouts = writer.transport.get_protocol().timeouts
+
+        requests_served = 0
         try:
-            request_data = await asyncio.wait_for(reader.read(4096), timeout=30)
-            
-            if not request_data:
+            if self._negotiated_http2(writer):
+                await self._serve_http2(reader, writer, client_addr, timeouts)
                 return
-                
-            response = await self.handle_request(request_data, client_addr)
-            writer.write(response)
-            await writer.drain()
-        except asyncio.TimeoutError:
-            self.logger.warning(f"Timeout reading from client {client_addr}")
+            while True:
+                try:
+                    request = await HTTPRequest.parse_head(reader, writer, self.max_header_size)
+                    if request is None:
+                        break
+                except HTTPError as e:
+                    self.logger.warning(f"Rejected request from client {client_addr}: {e.status_code} {e.message}")
+                    await self._send_error(writer, e)
+                    break
+                if requests_served == 0 and self._is_h2c_preface(request, writer):
+                    await self._serve_http2(reader, writer, client_addr, timeouts, H2C_PREFACE_HEAD)
+                    return
+                timeouts.cancel()
+
+                requests_served += 1
+                if not await self._serve_request(request, writer, client_addr, requests_served, timeouts):
+                    # Connection was taken over by the handler (e.g. WebSocket upgrade)
+                    return
+
+                # An unread body would be taken for the next request
+                if not request.keep_alive or request.body_pending:
+                    break
+                timeouts.start('keep_alive')
+        except (ConnectionResetError, BrokenPipeError):
+            self.logger.debug(f"Client {client_addr} closed the connection")
         except Exception as e:
             self.logger.error(f"Error handling client {client_addr}: {e}")
         finally:
-            writer.close()
+            if not writer.transport.is_closing():
+                timeouts.close()
             try:
                 await writer.wait_closed()
-            except (ConnectionResetError, TimeoutError, ssl.SSLError):
+            except (ConnectionResetError, BrokenPipeError, TimeoutError, ssl.SSLError):
                 pass
-                
-    async def handle_request(self, request_data: bytes, client_address: tuple) -> bytes:
+
+    async def _serve_request(self, request: HTTPRequest, writer: asyncio.StreamWriter,
+                             client_addr: tuple, requests_served: int,
+                             timeouts: Optional[ConnectionTimeouts] = None) -> bool:
+        """
+        Run a parsed request through handle_request and write the response
+
+        Returns:
+            bool: False if the handler took over the connection
+        """
+        # The body is left on the connection, handlers read it with
+        # request.read_body() or forward it with request.stream()
+        self._apply_limits(request)
+        request.keep_alive = self._should_keep_alive(request, requests_served)
+
+        if self.readiness_path is not None and request.path == self.readiness_path:
+            await self._send_readiness(request, writer, timeouts)
+            return True
+
+        if self.admission.admit_request() is not None:
+            await self._send_overloaded(request, writer)
+            return True
+
+        try:
+            response = await self.handle_request(request, client_addr)
+            if request.body_timed_out:
+                self.timeouts.reap(request.body_timed_out, client_addr)
+            if response is None:
+                return False
+            if request.keep_alive and not self.running:
+                # Shutdown started while the request was handled
+                request.keep_alive = False
+                response.remove_header('keep-alive')
+                response.set_header('connection', 'close')
+            try:
+                await response.write_to(writer, send_body=request.method != 'HEAD', timeouts=timeouts)
+            finally:
+                await response.close()
+        finally:
+            self.admission.request_finished()
+            await request.close()
+        return True
+
+    def _apply_limits(self, request: HTTPRequest) -> None:
+        """Set the body size limits and body timeouts on a request"""
+        request.max_body_size = self.max_body_size
+        request.body_buffer_size = self.body_buffer_size
+        request.body_read_timeout = self.timeouts.body_timeout or None
+        request.min_body_rate = self.timeouts.min_rate
+        request.min_body_rate_grace = self.timeouts.min_rate_grace
+
+    async def _send_overloaded(self, request: HTTPRequest, writer: asyncio.StreamWriter) -> None:
+        """Shed a request with 503, closing the connection frees its slot as well"""
+        request.keep_alive = False
+        response = self._overloaded_response()
+        try:
+            await response.write_to(writer, send_body=request.method != 'HEAD')
+        finally:
+            await request.close()
+
+    async def _send_readiness(self, request: HTTPRequest, writer: asyncio.StreamWriter,
+                              timeouts: Optional[ConnectionTimeouts] = None) -> None:
+        """Answer a readiness probe, before admission control so probes are not shed"""
+        if request.body_pending:
+            request.keep_alive = False
+        response = self._readiness_response(request)
+        try:
+            await response.write_to(writer, send_body=request.method != 'HEAD', timeouts=timeouts)
+        finally:
+            await request.close()
+
+    def _overloaded_response(self) -> HTTPResponse:
+        return HTTPResponse(503, headers={'connection': 'close', 'retry-after': str(self.admission.retry_after),
+                                          'content-type': 'text/plain'},
+                            body="Service Unavailable")
+
+    def _readiness_response(self, request: HTTPRequest) -> HTTPResponse:
+        headers = {'connection': 'keep-alive' if request.keep_alive else 'close',
+                   'content-type': 'text/plain', 'cache-control': 'no-store'}
+        if self.is_ready():
+            return HTTPResponse(200, headers=headers, body="ready")
+        return HTTPResponse(503, headers=headers, body="shutting down")
+
+    def _negotiated_http2(self, transport: Any) -> bool:
+        """Check if the client chose h2 with ALPN in the TLS handshake (transport or writer)"""
+        ssl_object = transport.get_extra_info('ssl_object')
+        return self.http2 is not None and ssl_object is not None and ssl_object.selected_alpn_protocol() == 'h2'
+
+    def _is_h2c_preface(self, request: HTTPRequest, transport: Any) -> bool:
+        """Check if the first request on a cleartext connection starts HTTP/2 with prior knowledge"""
+        return (self.http2 is not None and self.http2.h2c and transport.get_extra_info('sslcontext') is None
+                and is_h2c_preface(request))
+
+    async def _serve_http2(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                           client_addr: tuple, timeouts: ConnectionTimeouts, preface: bytes = b'') -> None:
+        """Serve the connection with HTTP/2, preface is the part of the client preface read already"""
+        await HTTP2Connection(self, reader, writer, client_addr, timeouts).run(preface)
+
+    async def _send_error(self, writer: asyncio.StreamWriter, error: HTTPError) -> None:
+        """Answer a request that failed before reaching handle_request and close the connection"""
+        response = HTTPResponse(error.status_code, headers={'connection': 'close'}, body=error.message)
+        writer.write(response.to_bytes())
+        await writer.drain()
+
+    def _should_keep_alive(self, request: HTTPRequest, requests_served: int) -> bool:
+        """Decide whether the connection stays open after the current request"""
+        if not self.keep_alive or not self.running:
+            return False
+        if self.keep_alive_max_requests and requests_served >= self.keep_alive_max_requests:
+            return False
+        return request.wants_keep_alive()
+
+    async def handle_request(self, request: HTTPRequest, client_address: tuple) -> Optional[HTTPResponse]:
         """
         Handle request and return response
         This is meant to be overridden by subclasses
         """
-        return b"HTTP/1.1 200 OK\r\n\r\nAsyncTCPServer is running"
\ No newline at end of file
+        if request.body_pending:
+            request.keep_alive = False
+        connection = "keep-alive" if request.keep_alive else "close"
+        return HTTPResponse(200, headers={'connection': connection, 'content-type': 'text/plain'},
+                            body="AsyncTCPServer is running")
@@ -0,0 +1,206 @@
+"""
+Per-phase connection timeouts and slow client defense for PyServe
+"""
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional
+
+from pyserve.core.logging import get_logger
+
+if TYPE_CHECKING:
+    from pyserve.http.response import HTTPResponse
+
+DEFAULT_HEADER_TIMEOUT = 30.0  # Seconds to receive the request line and headers
+DEFAULT_BODY_TIMEOUT = 30.0  # Seconds a request body read may wait for data
+DEFAULT_WRITE_TIMEOUT = 30.0  # Seconds a write may wait for the client to take data
+DEFAULT_MIN_RATE = 240  # Bytes per second a client has to keep up while the server waits on it
+DEFAULT_MIN_RATE_GRACE = 5.0  # Seconds of waiting before min_rate is enforced
+
+REAP_REASONS = ('header', 'body', 'write', 'min_rate')
+
+
+class TimeoutPolicy:
+    """
+    Timeouts for the phases of a client connection.
+
+    header_timeout runs from the connection (or the first byte of a following
+    keep-alive request) until the request head is complete, keep_alive_timeout
+    while the connection idles between requests. body_timeout and write_timeout
+    limit every single wait for request body data and for the client to take
+    response data. Clients that transfer less than min_rate bytes per second
+    of the time the server spent waiting on them are disconnected once that
+    time exceeds min_rate_grace. Timeouts and rates of 0 are disabled.
+    """
+
+    def __init__(self,
+                 header_timeout: float = DEFAULT_HEADER_TIMEOUT,
+                 body_timeout: float = DEFAULT_BODY_TIMEOUT,
+                 keep_alive_timeout: float = 5.0,
+                 write_timeout: float = DEFAULT_WRITE_TIMEOUT,
+                 min_rate: int = DEFAULT_MIN_RATE,
+                 min_rate_grace: float = DEFAULT_MIN_RATE_GRACE):
+        self.header_timeout = header_timeout
+        self.body_timeout = body_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.write_timeout = write_timeout
+        self.min_rate = min_rate
+        self.min_rate_grace = min_rate_grace
+        self.logger = get_logger()
+
+        self.reaped: Dict[str, int] = dict.fromkeys(REAP_REASONS, 0)
+        self.keep_alive_closed = 0
+
+    def get_timeout(self, phase: str) -> float:
+        if phase == 'header':
+            return self.header_timeout
+        if phase == 'keep_alive':
+            return self.keep_alive_timeout
+        return self.write_timeout
+
+    def too_slow(self, size: int, waited: float) -> bool:
+        """Check if a client that took size bytes while the server waited on it for waited seconds breaks min_rate"""
+        return bool(self.min_rate) and waited > self.min_rate_grace and size < self.min_rate * waited
+
+    def reap(self, reason: str, client_addr: Optional[tuple]) -> None:
+        """Count a connection closed because of a slow or stalled client"""
+        self.reaped[reason] += 1
+        if reason == 'min_rate':
+            self.logger.warning(f"Closing connection from client {client_addr}: slower than {self.min_rate} bytes/s")
+        else:
+            self.logger.warning(f"Closing connection from client {client_addr}: {reason} timeout")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'header_timeouts': self.reaped['header'],
+            'body_timeouts': self.reaped['body'],
+            'write_timeouts': self.reaped['write'],
+            'min_rate_disconnects': self.reaped['min_rate'],
+            'keep_alive_closed': self.keep_alive_closed,
+        }
+
+
+class ConnectionTimeouts:
+    """
+    Deadline of the phase a connection is in, and the guard for writes to it.
+
+    The header, keep-alive and linger (closing with unsent data) phases run on
+    a timer that closes the transport when it fires, so waiting for a request
+    costs no task or wait_for(). Writes that have to wait for the client go
+    through wait_writable().
+    """
+
+    def __init__(self, policy: TimeoutPolicy, transport: asyncio.BaseTransport, client_addr: Optional[tuple]):
+        self.policy = policy
+        self.transport = transport
+        self.client_addr = client_addr
+        self.loop = asyncio.get_running_loop()
+        self.phase: Optional[str] = None
+        self.phase_started = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self.response: Optional['HTTPResponse'] = None  # Response being written, checked against min_rate
+        self.write_waited = 0.0  # Seconds spent waiting on the client while writing it
+        self.receiving = False  # Data arrived since the current phase started
+        # Ends an idle connection instead of closing the transport (HTTP/2 says GOAWAY first)
+        self.on_idle_close: Optional[Callable[[], None]] = None
+
+    def start(self, phase: str, timeout: Optional[float] = None) -> None:
+        """Enter the 'header', 'keep_alive' or 'linger' phase and arm its timeout (the policy's unless given)"""
+        self.cancel()
+        self.phase = phase
+        self.phase_started = self.loop.time()
+        self.receiving = False
+        if timeout is None:
+            timeout = self.policy.get_timeout(phase)
+        if timeout:
+            self._handle = self.loop.call_later(timeout, self._expired)
+
+    def cancel(self) -> None:
+        """Leave the current phase, e.g. once the request head is complete"""
+        self.phase = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def data_received(self) -> None:
+        """The first byte of the next request ends the keep-alive idle phase"""
+        if self.phase == 'keep_alive':
+            self.start('header')
+        self.receiving = True
+
+    def is_idle(self, grace: float = 0.0) -> bool:
+        """
+        Check if the connection waits for a request of which nothing arrived yet
+
+        Args:
+            grace: Seconds a new connection may stay silent before it counts as idle,
+                its first request is usually on the way already
+        """
+        if self.phase == 'keep_alive':
+            return True
+        return (self.phase == 'header' and not self.receiving
+                and self.loop.time() - self.phase_started >= grace)
+
+    def start_response(self, response: 'HTTPResponse') -> None:
+        self.response = response
+        self.write_waited = 0.0
+
+    def end_response(self) -> None:
+        self.response = None
+
+    def close(self) -> None:
+        """Close the transport, aborting it if the client does not take the unsent rest within write_timeout"""
+        self.transport.close()
+        if self.transport.get_write_buffer_size():
+            self.start('linger')
+
+    def close_idle(self) -> None:
+        """Close a connection that waits for a request, through on_idle_close if set"""
+        if self.on_idle_close is not None:
+            self.on_idle_close()
+        else:
+            self.close()
+
+    async def wait_writable(self, write: Awaitable[Any]) -> None:
+        """
+        Wait for the client to take data written to the connection
+
+        Args:
+            write: Completes once the client took the data (a drain waiter or loop.sendfile())
+
+        Raises:
+            ConnectionResetError: If the client stalled for write_timeout or is slower than
+                min_rate, the connection is aborted
+        """
+        policy = self.policy
+        started = self.loop.time()
+        try:
+            await asyncio.wait_for(write, policy.write_timeout or None)
+        except asyncio.TimeoutError:
+            self._reap('write')
+            raise ConnectionResetError('Write timeout')
+
+        # What the response handed to the transport and is no longer buffered made it to the
+        # kernel; its socket buffers are not visible, so this favours the client a bit
+        self.write_waited += self.loop.time() - started
+        response = self.response
+        if response is not None and policy.too_slow(response.bytes_sent - self.transport.get_write_buffer_size(),
+                                                     self.write_waited):
+            self._reap('min_rate')
+            raise ConnectionResetError('Client too slow')
+
+    def _expired(self) -> None:
+        phase = self.phase
+        self._handle = None
+        self.phase = None
+        if phase == 'keep_alive':
+            self.policy.keep_alive_closed += 1
+            self.close_idle()
+        elif phase == 'header':
+            self.policy.reap('header', self.client_addr)
+            self.transport.close()
+        else:
+            self._reap('write')
+
+    def _reap(self, reason: str) -> None:
+        self.cancel()
+        self.policy.reap(reason, self.client_addr)
+        self.transport.abort()
@@ -0,0 +1,216 @@
+"""
+TLS context management for PyServe: handshake tuning, SNI and certificate reloading
+"""
+import asyncio
+import os
+import ssl
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pyserve.core.logging import get_logger
+from pyserve.core.server.http2 import http2_available
+from pyserve.core.server.vhost import match_host, normalize_host
+
+ALPN_PROTOCOLS = ('h2', 'http/1.1')  # Application protocols the server speaks, h2 needs the h2 package
+DEFAULT_NUM_TICKETS = 2  # TLS 1.3 session tickets sent after a full handshake (OpenSSL's default)
+DEFAULT_CERT_RELOAD_INTERVAL = 30.0  # Seconds between checks of the certificate files for changes
+
+
+def default_alpn(http2: bool = True) -> List[str]:
+    """ALPN protocols to advertise: h2 first if HTTP/2 is enabled and available, then http/1.1"""
+    return [protocol for protocol in ALPN_PROTOCOLS if protocol != 'h2' or (http2 and http2_available())]
+
+
+class TLSContext:
+    """
+    The server's SSLContexts, built from certificates and keys with the handshake settings.
+
+    Full handshakes cost the server an asymmetric key operation each, resumed
+    ones (a session ticket or a session cached by ID) do not. Tickets are
+    encrypted with keys the context creates, so all processes forked from one
+    context resume each other's sessions. Contexts created after fork do not;
+    this is why the pre-fork supervisor builds it before starting workers.
+
+    Listeners use the default context. With hosts, its SNI callback switches
+    handshakes for those server names to a context with their certificate;
+    these contexts are built up front, one per certificate, so the callback
+    only does a dict lookup. Clients without SNI or with unknown names get
+    the default certificate.
+
+    With reload_interval set the certificate files are checked in the
+    background, and a changed certificate is loaded into its live context:
+    new handshakes use it while established connections keep theirs, and
+    ticket keys and cached sessions survive the renewal. A pair that does not
+    load is logged and the old certificate stays in use.
+    """
+
+    def __init__(self,
+                 cert_file: str,
+                 key_file: str,
+                 ciphers: Optional[str] = None,
+                 ecdh_curve: Optional[str] = None,
+                 alpn: Optional[List[str]] = None,
+                 session_tickets: bool = True,
+                 num_tickets: int = DEFAULT_NUM_TICKETS,
+                 reload_interval: float = DEFAULT_CERT_RELOAD_INTERVAL,
+                 hosts: Optional[Dict[str, Tuple[str, str]]] = None):
+        """
+        Args:
+            cert_file: Default certificate chain (PEM)
+            key_file: Private key of cert_file (PEM)
+            ciphers: OpenSSL cipher list for TLS 1.2 and older, None keeps Python's defaults
+            ecdh_curve: Curve for ECDHE key exchange (e.g. prime256v1), None lets OpenSSL negotiate
+            alpn: Protocols to advertise via ALPN, in order of preference, None for default_alpn()
+            session_tickets: Resume with stateless tickets; when off, sessions are resumed
+                from the server's session cache
+            num_tickets: TLS 1.3 tickets to send per full handshake, 0 disables TLS 1.3 resumption
+            reload_interval: Seconds between checks of the files for changes, 0 disables reloading
+            hosts: Certificate and key file per server name, '*.domain' matches subdomains
+
+        Raises:
+            ValueError: If a certificate or the settings cannot be loaded
+        """
+        self.cert_file = cert_file
+        self.key_file = key_file
+        self.ciphers = ciphers
+        self.ecdh_curve = ecdh_curve
+        self.alpn = default_alpn() if alpn is None else alpn
+        self.session_tickets = session_tickets
+        self.num_tickets = num_tickets
+        self.reload_interval = reload_interval
+        self.hosts = {normalize_host(name): pair for name, pair in (hosts or {}).items()}
+        self.logger = get_logger()
+
+        # One context per certificate, shared by all names using it
+        self._default = (cert_file, key_file)
+        self._contexts: Dict[Tuple[str, str], ssl.SSLContext] = {}
+        self._signatures: Dict[Tuple[str, str], Optional[Tuple[Tuple[int, int, int], ...]]] = {}
+        for pair in [self._default, *self.hosts.values()]:
+            if pair not in self._contexts:
+                self._signatures[pair] = self._file_signature(pair)
+                self._contexts[pair] = self._create_context(pair)
+        self.context = self._contexts[self._default]
+        self.host_contexts = {name: self._contexts[pair] for name, pair in self.hosts.items()}
+
+        # Called with a replacement default context when the live one could not take the new certificate
+        self.on_swap: Optional[Callable[[ssl.SSLContext], None]] = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self.sni_switches = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _create_context(self, pair: Tuple[str, str]) -> ssl.SSLContext:
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        try:
+            if self.ciphers:
+                context.set_ciphers(self.ciphers)
+            if self.ecdh_curve:
+                context.set_ecdh_curve(self.ecdh_curve)
+            if self.alpn:
+                context.set_alpn_protocols(self.alpn)
+        except (ssl.SSLError, ValueError) as e:
+            raise ValueError(f"Invalid TLS settings: {e}")
+        if not self.session_tickets:
+            context.options |= ssl.OP_NO_TICKET
+        context.num_tickets = self.num_tickets
+        if self.hosts:
+            # Only called on the context a handshake started with, i.e. the default one
+            context.sni_callback = self._select_certificate
+
+        try:
+            context.load_cert_chain(*pair)
+        except (OSError, ssl.SSLError) as e:
+            raise ValueError(f"Error loading SSL certificates {pair[0]}: {e}")
+        return context
+
+    def _select_certificate(self, ssl_object: ssl.SSLObject, server_name: Optional[str],
+                            context: ssl.SSLContext) -> None:
+        if server_name is None:
+            return
+        host_context = match_host(self.host_contexts, normalize_host(server_name))
+        if host_context is not None and host_context is not context:
+            ssl_object.context = host_context
+            self.sni_switches += 1
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start checking the certificate files if reloading is enabled"""
+        if self.reload_interval and self._task is None:
+            self._task = loop.create_task(self._watch())
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reload(self) -> bool:
+        """
+        Load all certificate files again (also on SIGHUP)
+
+        Returns:
+            bool: False if one did not load, its current certificate stays in use then
+        """
+        results = [self._reload(pair) for pair in list(self._contexts)]
+        return all(results)
+
+    def _reload(self, pair: Tuple[str, str]) -> bool:
+        self._signatures[pair] = self._file_signature(pair)
+        # Building a complete context first checks that cert and key load and match,
+        # so a failure cannot leave the live context half updated
+        try:
+            checked = self._create_context(pair)
+        except ValueError as e:
+            self.reload_errors += 1
+            self.logger.error(f"Keeping the current certificate: {e}")
+            return False
+
+        try:
+            self._contexts[pair].load_cert_chain(*pair)
+        except (OSError, ssl.SSLError):
+            # The files changed again in between, serve the pair that was checked
+            self._replace_context(pair, checked)
+        self.reloads += 1
+        self.logger.info(f"Reloaded certificate {pair[0]}")
+        return True
+
+    def _replace_context(self, pair: Tuple[str, str], context: ssl.SSLContext) -> None:
+        self._contexts[pair] = context
+        for name, host_pair in self.hosts.items():
+            if host_pair == pair:
+                self.host_contexts[name] = context
+        if pair == self._default:
+            self.context = context
+            if self.on_swap is not None:
+                self.on_swap(context)
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            for pair in list(self._contexts):
+                signature = self._file_signature(pair)
+                # Missing files are usually being replaced, check again next time
+                if signature is not None and signature != self._signatures[pair]:
+                    self._reload(pair)
+
+    @staticmethod
+    def _file_signature(pair: Tuple[str, str]) -> Optional[Tuple[Tuple[int, int, int], ...]]:
+        # stat() follows symlinks, so renewals that repoint a link (certbot) are seen too
+        try:
+            return tuple((st.st_ino, st.st_size, st.st_mtime_ns) for st in map(os.stat, pair))
+        except OSError:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        sessions: Dict[str, int] = {}
+        for context in self._contexts.values():
+            for name, value in context.session_stats().items():
+                sessions[name] = sessions.get(name, 0) + value
+        return {
+            'handshakes': sessions['accept_good'],
+            'resumed': sessions['hits'],
+            'session_misses': sessions['misses'],
+            'session_timeouts': sessions['timeouts'],
+            'session_cache_full': sessions['cache_full'],
+            'sni_switches': self.sni_switches,
+            'certificates': len(self._contexts),
+            'cert_reloads': self.reloads,
+            'cert_reload_errors': self.reload_errors,
+        }
@@ -0,0 +1,151 @@
+"""
+Zero-downtime upgrades (SIGUSR2) for PyServe
+"""
+import asyncio
+import os
+import select
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+from pyserve.core.logging import get_logger
+
+LISTEN_FDS_ENV = 'PYSERVE_LISTEN_FDS'  # Listening sockets handed over by the previous generation, comma separated
+READY_FD_ENV = 'PYSERVE_READY_FD'  # Pipe to report back on once the new generation serves
+UPGRADE_TIMEOUT = 60.0  # Seconds a new generation gets to start serving before it is given up
+POLL_INTERVAL = 0.2
+
+
+def inherited_sockets() -> List[socket.socket]:
+    """
+    Take over the listening sockets of the previous generation
+
+    Returns:
+        List[socket.socket]: The sockets, empty when not started by an upgrade
+    """
+    fds = os.environ.pop(LISTEN_FDS_ENV, None)
+    socks = []
+    for fd in fds.split(',') if fds else ():
+        sock = socket.socket(fileno=int(fd))
+        sock.set_inheritable(False)
+        socks.append(sock)
+    return socks
+
+
+def take_ready_fd() -> Optional[int]:
+    """Take the pipe the previous generation waits on, None when not started by an upgrade"""
+    fd = os.environ.pop(READY_FD_ENV, None)
+    return int(fd) if fd else None
+
+
+def notify_ready(fd: Optional[int] = None) -> None:
+    """
+    Tell the previous generation that this one serves, so it drains and exits
+
+    Args:
+        fd: Pipe from take_ready_fd(), taken from the environment if not given
+    """
+    if fd is None:
+        fd = take_ready_fd()
+        if fd is None:
+            return
+    try:
+        os.write(fd, b'1')
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Upgrade:
+    """
+    A new generation of the server, started from the same command line.
+
+    The listening sockets are passed on by file descriptor, so the ports stay
+    open and connections queue in their backlog until the new generation
+    accepts (see adopt_sockets()). This includes the workers' SO_REUSEPORT
+    sockets, so the group the kernel spreads connections over stays the same.
+    The old generation keeps serving until the new one reports that it serves
+    and drains only then. If the new generation exits or does not get ready
+    within the timeout, it is stopped and the old one carries on.
+    """
+
+    def __init__(self, socks: List[socket.socket], timeout: float = UPGRADE_TIMEOUT):
+        """
+        Args:
+            socks: Listening sockets to hand over
+            timeout: Seconds the new generation gets to start serving
+        """
+        self.socks = socks
+        self.timeout = timeout
+        self.logger = get_logger()
+        self.process: Optional[subprocess.Popen] = None
+        self.deadline = 0.0
+        self._ready_fd: Optional[int] = None
+
+    def start(self) -> bool:
+        """
+        Start the new generation
+
+        Returns:
+            bool: False if it could not be started
+        """
+        ready_read, ready_write = os.pipe()
+        env = dict(os.environ)
+        env[READY_FD_ENV] = str(ready_write)
+        env[LISTEN_FDS_ENV] = ','.join(str(sock.fileno()) for sock in self.socks)
+        pass_fds = [ready_write] + [sock.fileno() for sock in self.socks]
+
+        try:
+            # orig_argv keeps interpreter options and -m, unlike sys.argv
+            self.process = subprocess.Popen(sys.orig_argv, env=env, pass_fds=pass_fds)
+        except OSError as e:
+            self.logger.error(f"Failed to start the new generation: {e}")
+            os.close(ready_read)
+            return False
+        finally:
+            os.close(ready_write)
+
+        self._ready_fd = ready_read
+        self.deadline = time.monotonic() + self.timeout
+        self.logger.info(f"Upgrade: started new generation (pid {self.process.pid}), waiting for it to serve")
+        return True
+
+    def poll(self) -> Optional[bool]:
+        """
+        Check on the new generation
+
+        Returns:
+            Optional[bool]: True once it serves, False if it failed (it is stopped then), None while starting
+        """
+        if select.select([self._ready_fd], [], [], 0)[0] and os.read(self._ready_fd, 1):
+            self._close()
+            self.logger.info(f"Upgrade: new generation (pid {self.process.pid}) serves, draining this one")
+            return True
+
+        code = self.process.poll()
+        if code is not None:
+            self.logger.error(f"Upgrade failed: new generation exited with code {code}")
+        elif time.monotonic() >= self.deadline:
+            self.logger.error(f"Upgrade failed: new generation did not serve within {self.timeout:g}s, stopping it")
+            # SIGTERM, so a supervisor takes its workers down as well
+            self.process.terminate()
+        else:
+            return None
+        self._close()
+        return False
+
+    async def wait(self) -> bool:
+        """Wait for poll() to decide without blocking the event loop"""
+        while True:
+            ready = self.poll()
+            if ready is not None:
+                return ready
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _close(self) -> None:
+        if self._ready_fd is not None:
+            os.close(self._ready_fd)
+            self._ready_fd = None
@@ -0,0 +1,104 @@
+"""
+Name-based virtual hosts for PyServe
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple, TypeVar
+
+from pyserve.core.cache import StaticManifest
+from pyserve.http.handlers.proxy import ProxyHandler
+from pyserve.http.handlers.redirect import RedirectHandler
+from pyserve.http.handlers.static import StaticFileHandler
+from pyserve.utils.helpers import get_redirections
+
+T = TypeVar('T')
+
+
+def normalize_host(host: str) -> str:
+    """Lower case host name without port and trailing dot, from a Host header or SNI"""
+    host = host.strip().lower()
+    if host.startswith('['):
+        host = host[:host.find(']') + 1]
+    elif host.count(':') == 1:
+        host = host.split(':', 1)[0]
+    return host.rstrip('.')
+
+
+def match_host(hosts: Dict[str, T], name: str) -> Optional[T]:
+    """
+    Look up a normalized host name in a map of exact names and '*.domain' wildcards
+
+    Wildcards match one label, like in certificates: *.example.com matches
+    www.example.com but neither example.com nor a.b.example.com.
+    """
+    found = hosts.get(name)
+    if found is None and '.' in name:
+        found = hosts.get('*.' + name.split('.', 1)[1])
+    return found
+
+
+class VirtualHost:
+    """
+    A site served under its own host names, with its own routing table
+    (redirect_instructions, locations), static root and reverse proxies.
+
+    Hosts are built once at startup; the server picks one per request by the
+    Host header and requests for unknown names go to the default host, which
+    is configured by the top level server and http sections. Static file and
+    stat caches and the upstream connection pool are shared by all hosts.
+    """
+
+    def __init__(self,
+                 names: List[str],
+                 static_dir: str,
+                 redirections: Optional[Dict[str, str]] = None,
+                 locations: Optional[Dict[str, Any]] = None,
+                 reverse_proxy: Optional[List[Dict[str, Any]]] = None,
+                 cert_file: Optional[str] = None,
+                 key_file: Optional[str] = None):
+        """
+        Args:
+            names: Host names, '*.domain' matches every subdomain
+            static_dir: Root of the host's static files
+            redirections: Path to URL redirects
+            locations: Per path settings (basic auth)
+            reverse_proxy: Proxied path prefixes
+            cert_file: Certificate chosen by SNI for the names on TLS listeners
+            key_file: Private key of cert_file
+        """
+        self.names = [normalize_host(name) for name in names]
+        self.static_dir = os.path.abspath(static_dir)
+        self.redirections = redirections or {}
+        self.locations = locations or {}
+        self.reverse_proxy = reverse_proxy or []
+        self.cert_file = cert_file
+        self.key_file = key_file
+
+        self.redirect_handler = RedirectHandler(self.redirections)
+        self.proxy_handler = ProxyHandler(self.reverse_proxy)
+        # Set up by the server with its shared caches
+        self.static_handler: Optional[StaticFileHandler] = None
+        self.static_manifest: Optional[StaticManifest] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'VirtualHost':
+        """Build a host from an entry of server.virtual_hosts"""
+        names = config['names']
+        return cls(
+            names=[names] if isinstance(names, str) else names,
+            static_dir=config['static_dir'],
+            redirections=get_redirections(config.get('redirect_instructions', [])),
+            locations=config.get('locations'),
+            reverse_proxy=config.get('reverse_proxy'),
+            cert_file=config.get('cert_file'),
+            key_file=config.get('key_file')
+        )
+
+    def __repr__(self) -> str:
+        return f"VirtualHost({', '.join(self.names) or 'default'})"
+
+
+def host_certificates(hosts: List[VirtualHost]) -> Dict[str, Tuple[str, str]]:
+    """Certificate and key per host name, for TLSContext's SNI selection"""
+    return {name: (host.cert_file, host.key_file)
+            for host in hosts if host.cert_file and host.key_file
+            for name in host.names}
@@ -0,0 +1,182 @@
+"""
+On-the-fly response compression for PyServe
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Hashable, List, Optional
+
+from pyserve.core.cache import CompressedCache
+from pyserve.core.cache.compressed import DEFAULT_COMPRESSED_CACHE_SIZE
+from pyserve.core.logging import get_logger
+from pyserve.http.request import HTTPRequest
+from pyserve.http.response import HTTPResponse
+from pyserve.utils.compression import Encoder, choose_encoding, compress_bytes, encoder_available
+
+DEFAULT_COMPRESSION_ENCODINGS = ['br', 'zstd', 'gzip']
+DEFAULT_COMPRESSION_MIN_SIZE = 1024
+DEFAULT_COMPRESSION_TYPES = [
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/xml',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'application/manifest+json',
+    'image/svg+xml',
+]
+OFFLOAD_THRESHOLD = 16384  # Smaller bodies are compressed on the event loop, a thread hop costs more
+
+
+class CompressedStream:
+    """Streaming body that compresses another response's body chunk by chunk"""
+
+    def __init__(self, response: HTTPResponse, encoder: Encoder, compressor: 'ResponseCompressor'):
+        self.response = response
+        self.encoder = encoder
+        self.compressor = compressor
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[bytes]:
+        async for chunk in self.response.body_stream:
+            if not chunk:
+                continue
+            # Flushing every chunk keeps streamed responses (e.g. server-sent events) incremental
+            data = await self.compressor.run(self._compress_chunk, chunk)
+            if data:
+                yield data
+        yield self.encoder.finish()
+
+    def _compress_chunk(self, chunk: bytes) -> bytes:
+        return self.encoder.compress(chunk) + self.encoder.flush()
+
+    async def aclose(self) -> None:
+        await self.response.close()
+
+
+class ResponseCompressor:
+    """
+    Compresses responses for clients that accept it.
+
+    Only responses with a content type from the allowlist and at least
+    min_size bytes are compressed. Large bodies are compressed in a thread
+    pool, and compressed bodies of responses with an ETag are cached.
+    """
+
+    def __init__(self,
+                 encodings: Optional[List[str]] = None,
+                 min_size: int = DEFAULT_COMPRESSION_MIN_SIZE,
+                 types: Optional[List[str]] = None,
+                 cache_size: int = DEFAULT_COMPRESSED_CACHE_SIZE,
+                 workers: Optional[int] = None):
+        self.logger = get_logger()
+        requested = encodings or DEFAULT_COMPRESSION_ENCODINGS
+        self.encodings = [encoding for encoding in requested if encoder_available(encoding)]
+        unavailable = [encoding for encoding in requested if encoding not in self.encodings]
+        if unavailable:
+            self.logger.info(f"Compression: {', '.join(unavailable)} not available (missing package), "
+                             f"using {', '.join(self.encodings) or 'nothing'}")
+        self.min_size = min_size
+        self.types = frozenset(types or DEFAULT_COMPRESSION_TYPES)
+        self.cache = CompressedCache(cache_size) if cache_size else None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pyserve-compress')
+
+    async def compress(self, request: HTTPRequest, response: HTTPResponse, scope: Hashable = None) -> HTTPResponse:
+        """
+        Compress the response if the client accepts one of the configured encodings
+
+        Args:
+            request: The request being answered
+            response: Response produced by the handlers
+            scope: Site the response belongs to (the virtual host), cached bodies are only
+                reused within it as paths and ETags repeat across sites
+
+        Returns:
+            HTTPResponse: The compressed response, or the original one
+        """
+        if response.status_code == 304:
+            # Revalidations answer for whichever encoding the client has cached
+            self._add_vary(response)
+            return response
+        if not self._is_compressible(response):
+            return response
+
+        # The response depends on Accept-Encoding even when it is sent uncompressed
+        self._add_vary(response)
+        encoding = choose_encoding(request.get_header('accept-encoding'), self.encodings)
+        if encoding is None:
+            return response
+
+        if response.body_stream is None:
+            body = await self._compress_body(request, response, encoding, scope)
+            if body is None:
+                return response
+        else:
+            if request.method == 'HEAD':
+                # The body is never produced, the length of the compressed one is unknown
+                return response
+            body = CompressedStream(response, Encoder(encoding), self)
+
+        headers = {name: value for name, value in response.headers.items()
+                   if name not in ('content-length', 'transfer-encoding', 'accept-ranges')}
+        headers['content-encoding'] = encoding
+        etag = headers.get('etag')
+        if etag and not etag.startswith('W/'):
+            # Compressed bytes are not byte-identical to the original representation
+            headers['etag'] = f"W/{etag}"
+        return HTTPResponse(response.status_code, headers=headers, body=body)
+
+    async def run(self, function, data: bytes) -> bytes:
+        """Run a compression function, in the thread pool for large inputs"""
+        if len(data) < OFFLOAD_THRESHOLD:
+            return function(data)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, data)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        if self.cache is not None:
+            self.cache.clear()
+
+    def _is_compressible(self, response: HTTPResponse) -> bool:
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if 'content-encoding' in response.headers:
+            return False
+        content_type = response.headers.get('content-type', '').split(';', 1)[0].strip().lower()
+        if content_type not in self.types:
+            return False
+        if 'no-transform' in response.headers.get('cache-control', '').lower():
+            return False
+        if response.body_stream is None:
+            return len(response.body) >= self.min_size
+        content_length = response.headers.get('content-length')
+        return content_length is None or int(content_length) >= self.min_size
+
+    async def _compress_body(self, request: HTTPRequest, response: HTTPResponse, encoding: str,
+                             scope: Hashable) -> Optional[bytes]:
+        """Compress a buffered body, None if compressing doesn't make it smaller"""
+        key = None
+        etag = response.headers.get('etag')
+        if self.cache is not None and etag and 'no-store' not in response.headers.get('cache-control', ''):
+            key = (scope, request.path, etag, encoding)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        body = await self.run(lambda data: compress_bytes(encoding, data), response.body)
+        if len(body) >= len(response.body):
+            return None
+        if key is not None:
+            self.cache.put(key, body)
+        return body
+
+    @staticmethod
+    def _add_vary(response: HTTPResponse) -> None:
+        vary = response.headers.get('vary')
+        if not vary:
+            response.set_header('vary', 'accept-encoding')
+        elif 'accept-encoding' not in vary.lower() and vary.strip() != '*':
+            response.set_header('vary', f"{vary}, accept-encoding")
@@ -1,7 +1,9 @@
 """
 HTTP and WebSocket proxy handler implementation
 """
-from typing import Dict, Any, Optional
+from http import HTTPStatus
+from typing import Dict, Any, Optional, AsyncIterator
+from pyserve.core.exceptions import HTTPError
 from pyserve.http.request import HTTPRequest
 from pyserve.http.response import HTTPResponse
 from pyserve.http.websocket.base import WebSocket
@@ -85,7 +87,7 @@ class ProxyHandler:
                 target_url += "?" + "&".join(query_parts)
         
         backend_headers = {}
-        skip_headers = {'host', 'connection', 'upgrade', 'transfer-encoding', 'content-length'}
+        skip_headers = {'host', 'connection', 'upgrade', 'transfer-encoding', 'content-length', 'expect'}
         
         for name, value in request.headers.items():
             if name.lower() not in skip_headers:
@@ -97,30 +99,51 @@ class ProxyHandler:
         backend_headers['X-Forwarded-Proto'] = 'https' if use_ssl else 'http'
         backend_headers['X-Real-IP'] = client_ip
         
-        if request.body and len(request.body) > 0:
-            backend_headers['Content-Length'] = str(len(request.body))
+        # By default compressed upstream bodies are relayed untouched, so the upstream may only
+        # use encodings the client accepts. decompress: on lets aiohttp negotiate and decode the
+        # body instead, for stages that need to look at it.
+        decompress = proxy_config.get('decompress', False) in (True, 'on')
+        backend_headers.pop('accept-encoding', None)
+        if not decompress:
+            backend_headers['Accept-Encoding'] = request.get_header('accept-encoding') or 'identity'
         
         try:
+            # With request buffering (the default) the whole body is read before
+            # contacting the upstream, large uploads are spilled to a temporary file.
+            # Without it the body is forwarded to the upstream as it arrives.
+            if proxy_config.get('request_buffering', True) not in (False, 'off'):
+                await request.read_body()
+                
+            body_length = request.body_length()
+            if body_length:
+                backend_headers['Content-Length'] = str(body_length)
+            
             logger.info(f"Proxying {request.method} request to {target_url}")
             
-            timeout = aiohttp.ClientTimeout(total=30, connect=10)
+            # proxy_buffering: off forwards the upstream body to the client as it arrives
+            # (large downloads, server-sent events, long polling). The whole exchange may
+            # then last long, so only the gap between two reads is limited.
+            buffering = proxy_config.get('proxy_buffering', True) not in (False, 'off')
+            if buffering:
+                timeout = aiohttp.ClientTimeout(total=30, connect=10)
+            else:
+                timeout = aiohttp.ClientTimeout(total=None, connect=10, sock_read=proxy_config.get('read_timeout', 60))
             
-            async with self.client_session.request(
+            response = await self.client_session.request(
                 method=request.method,
                 url=target_url,
                 headers=backend_headers,
-                data=request.body if request.body else None,
+                data=request.stream() if body_length != 0 else None,
                 allow_redirects=False,
                 timeout=timeout,
-                auto_decompress=True
-            ) as response:
-                body = await response.read()
-                
+                auto_decompress=decompress
+            )
+            try:
                 response_headers = {}
                 skip_response_headers = {
                     'connection', 
                     'transfer-encoding', 
-                    'content-encoding',
+                    'content-length',
                     'keep-alive',
                     'upgrade',
                     'proxy-connection',
@@ -137,13 +160,35 @@ class ProxyHandler:
                                 logger.debug(f"Rewrote {name} header: '{original_value}' -> '{value}'")
                         response_headers[name] = value
                 
-                response_headers['content-length'] = str(len(body))
+                if decompress:
+                    response_headers = {name: value for name, value in response_headers.items()
+                                        if name.lower() != 'content-encoding'}
                 
                 response_headers['Via'] = 'pyserve-proxy'
                 
                 from pyserve import __version__
                 response_headers['server'] = f'PyServe/{__version__}'
                 
+                if not buffering:
+                    # The upstream length is only valid if aiohttp does not decompress the body,
+                    # otherwise HTTPResponse falls back to chunked encoding
+                    if 'Content-Length' in response.headers and not (decompress and 'Content-Encoding' in response.headers):
+                        response_headers['content-length'] = response.headers['Content-Length']
+                        
+                    logger.info(f"Proxy response: {response.status} (streaming)")
+                    logger.debug(f"Response headers: {response_headers}")
+                    
+                    streaming_response = HTTPResponse(
+                        status_code=response.status,
+                        headers=response_headers,
+                        body=self._stream_upstream(response)
+                    )
+                    response = None  # released by the stream once the client got the body
+                    return streaming_response
+                
+                body = await response.read()
+                response_headers['content-length'] = str(len(body))
+                
                 logger.info(f"Proxy response: {response.status} (size: {len(body)} bytes)")
                 logger.debug(f"Response headers: {response_headers}")
                 
@@ -152,7 +197,13 @@ class ProxyHandler:
                     headers=response_headers,
                     body=body
                 )
+            finally:
+                if response is not None:
+                    response.release()
                 
+        except HTTPError as e:
+            logger.warning(f"Rejected proxied request body: {e.status_code} {e.message}")
+            return await self._handle_error(e.status_code, HTTPStatus(e.status_code).phrase, e.message)
         except aiohttp.ClientError as e:
             logger.error(f"Proxy client error: {e}")
             return await self._handle_error(502, "Bad Gateway", f"Could not connect to upstream server: {str(e)}")
@@ -165,6 +216,14 @@ class ProxyHandler:
             traceback.print_exc()
             return await self._handle_error(502, "Bad Gateway", "An unexpected error occurred while processing the request")
     
+    async def _stream_upstream(self, response: aiohttp.ClientResponse) -> AsyncIterator[bytes]:
+        """Forward the upstream body chunk by chunk as it arrives"""
+        try:
+            async for chunk in response.content.iter_any():
+                yield chunk
+        finally:
+            response.release()
+    
     def _rewrite_location_header(self, location: str, target_host: str, target_port: int, 
                                 target_path: str, scheme: str, request: HTTPRequest) -> str:
         """
@@ -1,21 +1,86 @@
 """
 Static file handler for PyServe
 """
+import asyncio
 import os
+import secrets
+import stat
 import aiofiles
-from typing import Dict, Optional
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+from pyserve.core.cache import StatCache, StaticFileCache, StaticManifest
+from pyserve.core.cache.manifest import make_etag
 from pyserve.http.request import HTTPRequest
-from pyserve.http.response import HTTPResponse
+from pyserve.http.response import HTTPResponse, serialize_headers
 from pyserve.core.logging import get_logger
+from pyserve.utils.compression import SIDECAR_SUFFIXES, choose_encoding
 from pyserve.utils.helpers import get_content_type
 
+STREAM_THRESHOLD = 262144  # Files above 256 KB are streamed instead of read into memory
+DEFAULT_CACHE_CONTROL = 'public, max-age=300'  # Cache for 5 minutes
+MAX_RANGES = 16  # Requests asking for more ranges get the whole file
+
+
+def parse_range(range_header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a Range header against a file size
+    
+    Args:
+        range_header: Header value, e.g. "bytes=0-499,-500"
+        size: File size in bytes
+        
+    Returns:
+        Optional[List[Tuple[int, int]]]: Sorted, merged inclusive (first, last) byte positions,
+        an empty list if none is satisfiable, or None if the header is invalid and must be ignored
+    """
+    unit, _, specs = range_header.partition('=')
+    # isdigit() below would accept non-ASCII digits such as '²', which int() rejects
+    if unit.strip().lower() != 'bytes' or not specs or not specs.isascii():
+        return None
+        
+    ranges = []
+    for spec in specs.split(','):
+        first, dash, last = spec.strip().partition('-')
+        if not dash or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length > 0:
+                ranges.append((max(size - length, 0), size - 1))
+            continue
+        first_pos = int(first)
+        if last and int(last) < first_pos:
+            return None
+        if first_pos < size:
+            ranges.append((first_pos, min(int(last), size - 1) if last else size - 1))
+            
+    if len(ranges) > MAX_RANGES:
+        return None
+        
+    # Overlapping and adjacent ranges are sent once
+    merged: List[Tuple[int, int]] = []
+    for first_pos, last_pos in sorted(ranges):
+        if merged and first_pos <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last_pos))
+        else:
+            merged.append((first_pos, last_pos))
+    return merged
+
 
 class StaticFileHandler:
     """Handles serving static files"""
     
-    def __init__(self, static_dir: str, debug: bool = False):
+    def __init__(self, static_dir: str, debug: bool = False, sendfile: bool = True,
+                 cache: Optional[StaticFileCache] = None, stat_cache: Optional[StatCache] = None,
+                 manifest: Optional[StaticManifest] = None, precompressed: bool = False):
         self.static_dir = os.path.abspath(static_dir)
         self.debug = debug
+        self.sendfile = sendfile
+        self.cache = cache
+        self.stat_cache = stat_cache or StatCache(ttl=0)
+        self.manifest = manifest
+        self.precompressed = precompressed  # Serve .br/.gz sidecar files to clients accepting them
         self.logger = get_logger()
         
         self.content_types = {
@@ -47,39 +112,321 @@ class StaticFileHandler:
             self.logger.warning(f"Attempted directory traversal: {request.path}")
             return HTTPResponse(403, body="Forbidden: You don't have permission to access this resource.")
             
-        return await self.serve_file(file_path)
+        if self.manifest is not None:
+            entry = self.manifest.lookup_path(file_path)
+            if entry is None:
+                return HTTPResponse(404, body=f"Not Found: The requested file {os.path.basename(file_path)} was not found.")
+            
+        return await self.serve_file(file_path, request)
+        
+    async def serve_file(self, file_path: str, request: Optional[HTTPRequest] = None,
+                         cache_control: Optional[str] = None) -> HTTPResponse:
+        """
+        Serve a file from the filesystem
+        
+        Args:
+            file_path: Path of the file to serve
+            request: Request to evaluate If-None-Match / If-Modified-Since against
+            cache_control: Cache-Control header value, defaults to DEFAULT_CACHE_CONTROL
+            
+        Returns:
+            HTTPResponse: 200 with the file, 206 for Range requests, or 304 if the client's copy is still valid
+        """
+        cache_control = cache_control or DEFAULT_CACHE_CONTROL
         
-    async def serve_file(self, file_path: str) -> HTTPResponse:
-        """Serve a file from the filesystem"""
-        if not os.path.exists(file_path):
+        if self.precompressed and request is not None:
+            encoding = self._negotiate_sidecar(file_path, request)
+            if encoding is not None:
+                response = await self._serve_file(file_path + SIDECAR_SUFFIXES[encoding], request, cache_control,
+                                                  self.get_content_type(file_path), encoding)
+                # The sidecar may be gone since it was found, the original is still there
+                if response.status_code != 404:
+                    return response
+                    
+        return await self._serve_file(file_path, request, cache_control)
+        
+    def _negotiate_sidecar(self, file_path: str, request: HTTPRequest) -> Optional[str]:
+        """Pick the precompressed sidecar (.br/.gz) of file_path to serve for the request's Accept-Encoding"""
+        accept_encoding = request.get_header('accept-encoding')
+        if not accept_encoding or choose_encoding(accept_encoding, SIDECAR_SUFFIXES) is None:
+            return None
+            
+        # pyserve precompress gives sidecars the original's mtime, others are left over from an older version
+        available = []
+        if self.manifest is not None:
+            entry = self.manifest.lookup_path(file_path)
+            if entry is not None:
+                for encoding, path in entry.variants.items():
+                    sidecar = self.manifest.lookup_path(path)
+                    if sidecar is not None and sidecar.mtime_ns == entry.mtime_ns:
+                        available.append(encoding)
+        else:
+            try:
+                original = self.stat_cache.stat(file_path)
+            except OSError:
+                original = None
+            if original is not None:
+                for encoding, suffix in SIDECAR_SUFFIXES.items():
+                    try:
+                        sidecar = self.stat_cache.stat(file_path + suffix)
+                    except OSError:
+                        continue
+                    if sidecar is not None and stat.S_ISREG(sidecar.st_mode) and \
+                            sidecar.st_mtime_ns == original.st_mtime_ns:
+                        available.append(encoding)
+        return choose_encoding(accept_encoding, available)
+        
+    async def _serve_file(self, file_path: str, request: Optional[HTTPRequest], cache_control: str,
+                          content_type: Optional[str] = None, content_encoding: Optional[str] = None) -> HTTPResponse:
+        """Serve file_path, a precompressed sidecar is sent with the original's content type and its content_encoding"""
+        if self.cache is not None:
+            entry = self.cache.get(file_path)
+            if entry is not None:
+                if request is not None and self._not_modified(request, entry.headers['etag'], entry.mtime_ns):
+                    return self._not_modified_response(entry.headers, cache_control)
+                ranges = self._requested_ranges(request, entry.size, entry.headers)
+                if ranges is not None:
+                    return self._partial_response(ranges, entry.size, entry.headers['content-type'],
+                                                  entry.headers, cache_control, entry.body)
+                if self.debug:
+                    self.logger.debug(f"Serving static file from cache: {file_path}")
+                response = HTTPResponse(200, headers=entry.headers, body=entry.body, header_block=entry.header_block)
+                if response.headers['cache-control'] != cache_control:
+                    response.set_header('cache-control', cache_control)
+                return response
+                
+        try:
+            stat_result = self.stat_cache.stat(file_path)
+        except OSError:
+            return HTTPResponse(403, body="Forbidden: You don't have permission to access this resource.")
+            
+        if stat_result is None:
             self.logger.warning(f"File not found: {file_path}")
             return HTTPResponse(404, body=f"Not Found: The requested file {os.path.basename(file_path)} was not found.")
             
-        if not os.path.isfile(file_path):
+        if not stat.S_ISREG(stat_result.st_mode):
             return HTTPResponse(403, body="Forbidden: You don't have permission to access this resource.")
         
+        validators = self._validators(stat_result, content_encoding)
+        if request is not None and self._not_modified(request, validators['etag'], stat_result.st_mtime_ns):
+            return self._not_modified_response(validators, cache_control)
+        
         try:
-            _, file_extension = os.path.splitext(file_path)
-            content_type = self.content_types.get(file_extension.lower(), 'application/octet-stream')
+            content_type = content_type or self.get_content_type(file_path)
             
-            async with aiofiles.open(file_path, 'rb') as file:
-                content = await file.read()
+            file_size = stat_result.st_size
+            ranges = self._requested_ranges(request, file_size, validators)
+            if ranges:
+                # Only the requested windows are read, from a file HTTPResponse can sendfile from
+                content, opened = await self._open(file_path, stat_result)
+                if opened is not stat_result:
+                    stat_result, file_size = opened, opened.st_size
+                    validators = self._validators(opened, content_encoding)
+                    ranges = self._requested_ranges(request, file_size, validators)
+                    if not ranges:
+                        # Unsatisfiable now, or If-Range no longer matches and the whole file is sent
+                        await self._close(content)
+                if ranges:
+                    return self._partial_response(ranges, file_size, content_type, validators, cache_control,
+                                                  content)
+            if ranges is not None:
+                return self._partial_response(ranges, file_size, content_type, validators, cache_control, None)
+                
+            cacheable = self.cache is not None and self.cache.accepts(file_size)
+            if file_size > STREAM_THRESHOLD and not cacheable:
+                # Large files are streamed, HTTPResponse closes the file once it is sent.
+                # A plain file object lets HTTPResponse use sendfile on non-TLS connections.
+                # The stat result may be up to a TTL old, content-length has to match the file that is sent
+                content, opened = await self._open(file_path, stat_result)
+                file_size = opened.st_size
+            else:
+                async with aiofiles.open(file_path, 'rb') as file:
+                    # Validators and the cache entry describe the content read, not a stat result up to a TTL old
+                    opened = self._recheck(file_path, stat_result, os.fstat(file.fileno()))
+                    content = await file.read()
+                file_size = len(content)
+            if opened is not stat_result:
+                validators = self._validators(opened, content_encoding)
             
             headers = {
                 'content-type': content_type,
-                'content-length': str(len(content)),
-                'cache-control': 'public, max-age=300'  # Cache for 5 minutes
+                'content-length': str(file_size),
+                'cache-control': cache_control,
+                'accept-ranges': 'bytes',
+                **validators
             }
             
             if self.debug:
                 self.logger.debug(f"Serving static file: {file_path} ({content_type})")
                 
-            return HTTPResponse(200, headers=headers, body=content)
+            response = HTTPResponse(200, headers=headers, body=content)
+            if cacheable and isinstance(content, bytes):
+                self.cache.put(file_path, content, dict(response.headers),
+                               serialize_headers(response.headers), opened.st_mtime_ns)
+            return response
             
+        except FileNotFoundError:
+            # Removed after its stat result was cached
+            self.stat_cache.invalidate(file_path)
+            return HTTPResponse(404, body=f"Not Found: The requested file {os.path.basename(file_path)} was not found.")
         except Exception as e:
             self.logger.error(f"Error serving {file_path}: {e}")
             return HTTPResponse(500, body="Internal Server Error: An unexpected error occurred while processing your request.")
             
+    async def _open(self, file_path: str, stat_result: os.stat_result) -> Tuple[Any, os.stat_result]:
+        """
+        Open a file to stream off the event loop, a plain file object with sendfile
+        
+        Returns:
+            Tuple[Any, os.stat_result]: The file and stat_result, or the opened file's own stat result
+            if the cached one (up to a TTL old) no longer matches it
+        """
+        if self.sendfile:
+            content = await asyncio.to_thread(open, file_path, 'rb')
+        else:
+            content = await aiofiles.open(file_path, 'rb')
+        try:
+            return content, self._recheck(file_path, stat_result, os.fstat(content.fileno()))
+        except BaseException:
+            await self._close(content)
+            raise
+            
+    def _recheck(self, file_path: str, stat_result: os.stat_result, opened: os.stat_result) -> os.stat_result:
+        """Compare the cached stat result with the opened file's, dropping it from the stat cache if it changed"""
+        if (opened.st_size, opened.st_mtime_ns) == (stat_result.st_size, stat_result.st_mtime_ns):
+            return stat_result
+        self.stat_cache.invalidate(file_path)
+        return opened
+        
+    async def _close(self, content: Any) -> None:
+        if self.sendfile:
+            content.close()
+        else:
+            await content.close()
+            
+    def _validators(self, stat_result: os.stat_result, content_encoding: Optional[str]) -> Dict[str, str]:
+        """ETag, Last-Modified and the encoding headers describing a file"""
+        etag = make_etag(stat_result.st_size, stat_result.st_mtime_ns)
+        if content_encoding is not None:
+            # Each encoding of a file is a different representation and needs its own ETag
+            etag = f'{etag[:-1]}-{content_encoding}"'
+        validators = {
+            'etag': etag,
+            'last-modified': formatdate(stat_result.st_mtime, usegmt=True)
+        }
+        if content_encoding is not None:
+            validators['content-encoding'] = content_encoding
+        if self.precompressed:
+            validators['vary'] = 'accept-encoding'
+        return validators
+        
+    @staticmethod
+    def _not_modified(request: HTTPRequest, etag: str, mtime_ns: int) -> bool:
+        """Check the request's conditional headers against the file's validators"""
+        if request.method not in ('GET', 'HEAD'):
+            return False
+            
+        if_none_match = request.get_header('if-none-match')
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since and uses weak comparison
+            if if_none_match.strip() == '*':
+                return True
+            for candidate in if_none_match.split(','):
+                candidate = candidate.strip()
+                if candidate.startswith('W/'):
+                    candidate = candidate[2:]
+                if candidate == etag:
+                    return True
+            return False
+            
+        if_modified_since = request.get_header('if-modified-since')
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                return False
+            # HTTP dates have a one second resolution
+            return mtime_ns // 1000000000 <= int(since.timestamp())
+            
+        return False
+        
+    @staticmethod
+    def _requested_ranges(request: Optional[HTTPRequest], size: int,
+                          validators: Dict[str, str]) -> Optional[List[Tuple[int, int]]]:
+        """
+        Get the byte ranges to serve for the request's Range header
+        
+        Returns:
+            Optional[List[Tuple[int, int]]]: Inclusive (first, last) byte positions, an empty list
+            if no range can be satisfied (416), or None to serve the whole file
+        """
+        if request is None or request.method != 'GET' or size == 0:
+            return None
+        range_header = request.get_header('range')
+        if range_header is None:
+            return None
+            
+        # If-Range: the ranges only apply to the representation the client already has part of
+        if_range = request.get_header('if-range')
+        if if_range is not None and if_range.strip() not in (validators['etag'], validators['last-modified']):
+            return None
+            
+        return parse_range(range_header, size)
+        
+    @staticmethod
+    def _partial_response(ranges: List[Tuple[int, int]], size: int, content_type: str,
+                          validators: Dict[str, str], cache_control: str,
+                          content: Union[bytes, BinaryIO, None]) -> HTTPResponse:
+        """Build a 206 response for the ranges, or 416 if there are none"""
+        if not ranges:
+            return HTTPResponse(416, headers={'content-range': f"bytes */{size}"},
+                                body="Range Not Satisfiable: The requested range is outside the file.")
+            
+        headers = {
+            'cache-control': cache_control,
+            'accept-ranges': 'bytes',
+            'etag': validators['etag'],
+            'last-modified': validators['last-modified']
+        }
+        for name in ('content-encoding', 'vary'):
+            if name in validators:
+                headers[name] = validators[name]
+        
+        if len(ranges) == 1:
+            parts: List[Union[bytes, Tuple[int, int]]] = [(ranges[0][0], ranges[0][1] - ranges[0][0] + 1)]
+            headers['content-type'] = content_type
+            headers['content-range'] = f"bytes {ranges[0][0]}-{ranges[0][1]}/{size}"
+        else:
+            boundary = secrets.token_hex(16)
+            parts = []
+            for first, last in ranges:
+                parts.append(f"\r\n--{boundary}\r\ncontent-type: {content_type}\r\n"
+                             f"content-range: bytes {first}-{last}/{size}\r\n\r\n".encode())
+                parts.append((first, last - first + 1))
+            parts.append(f"\r\n--{boundary}--\r\n".encode())
+            headers['content-type'] = f"multipart/byteranges; boundary={boundary}"
+            
+        headers['content-length'] = str(sum(len(part) if isinstance(part, bytes) else part[1] for part in parts))
+        
+        if isinstance(content, bytes):
+            body = b''.join(part if isinstance(part, bytes) else content[part[0]:part[0] + part[1]]
+                            for part in parts)
+            return HTTPResponse(206, headers=headers, body=body)
+        return HTTPResponse(206, headers=headers, body=content, file_parts=parts)
+        
+    @staticmethod
+    def _not_modified_response(headers: Dict[str, str], cache_control: str) -> HTTPResponse:
+        not_modified_headers = {
+            'etag': headers['etag'],
+            'last-modified': headers['last-modified'],
+            'cache-control': cache_control
+        }
+        if 'vary' in headers:
+            not_modified_headers['vary'] = headers['vary']
+        return HTTPResponse(304, headers=not_modified_headers)
+        
     def get_content_type(self, file_path: str) -> str:
         _, file_extension = os.path.splitext(file_path)
         return self.content_types.get(file_extension.lower(), 'application/octet-stream')
\ No newline at end of file
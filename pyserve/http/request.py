@@ -2,12 +2,19 @@
 HTTP Request parsing and representation
 """
 from urllib.parse import parse_qs, urlparse
-from typing import Dict, Union, List, Optional, Any
+from typing import Dict, Union, List, Optional, Any, AsyncIterator, Awaitable
 import asyncio
+import aiofiles.tempfile
 from pyserve.core.logging import get_logger
+from pyserve.core.exceptions import HTTPError
 
 logger = get_logger()
 
+DEFAULT_MAX_HEADER_SIZE = 16384  # 16 KB
+DEFAULT_MAX_BODY_SIZE = 104857600  # 100 MB, 0 means unlimited
+DEFAULT_BODY_BUFFER_SIZE = 1048576  # 1 MB, larger buffered bodies are spilled to a temporary file
+BODY_READ_SIZE = 65536
+
 class HTTPRequest:
     def __init__(self, raw_request: Optional[bytes] = None):
         self.method: str = ""
@@ -18,6 +25,20 @@ class HTTPRequest:
         self.query_params: Dict[str, list] = {}
         self.reader: Optional[asyncio.StreamReader] = None
         self.writer: Optional[asyncio.StreamWriter] = None
+        self.keep_alive: bool = False
+        
+        # Body state for requests read from a stream
+        self.body_pending: bool = False  # announced body not read from the connection yet
+        self.body_file = None  # temporary file holding a body larger than body_buffer_size
+        self.body_size: int = 0
+        self.max_body_size: int = DEFAULT_MAX_BODY_SIZE
+        self.body_buffer_size: int = DEFAULT_BODY_BUFFER_SIZE
+        self.body_read_timeout: Optional[float] = None
+        self.min_body_rate: int = 0  # bytes/s the client has to send while a body read waits (0 = off)
+        self.min_body_rate_grace: float = 0.0
+        self.body_timed_out: Optional[str] = None  # 'body' or 'min_rate' once a body read gave up on the client
+        self._body_wait = 0.0
+        self._body_received = 0
         
         if raw_request:
             self._parse_raw_request(raw_request)
@@ -60,57 +81,320 @@ class HTTPRequest:
             logger.error(f"Error parsing raw request: {e}")
         
     @classmethod
-    async def parse(cls, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> 'HTTPRequest':
-        """Parse HTTP request from stream"""
+    async def parse(cls,
+                    reader: asyncio.StreamReader,
+                    writer: asyncio.StreamWriter,
+                    max_header_size: int = DEFAULT_MAX_HEADER_SIZE,
+                    max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+                    read_timeout: Optional[float] = None) -> Optional['HTTPRequest']:
+        """
+        Parse HTTP request from stream
+        
+        Reads the request line and headers, then buffers exactly the announced
+        body (Content-Length or chunked transfer encoding).
+        
+        Returns:
+            HTTPRequest or None if the client closed the connection before sending a request
+            
+        Raises:
+            HTTPError: If the request is malformed or exceeds the configured limits
+        """
+        request = await cls.parse_head(reader, writer, max_header_size)
+        if request is not None:
+            await request.read_body(max_body_size, read_timeout)
+        return request
+        
+    @classmethod
+    async def parse_head(cls,
+                         reader: asyncio.StreamReader,
+                         writer: asyncio.StreamWriter,
+                         max_header_size: int = DEFAULT_MAX_HEADER_SIZE) -> Optional['HTTPRequest']:
+        """
+        Parse request line and headers from stream, leaving the body unread
+        
+        The body can then be buffered with read_body() or consumed as it
+        arrives with stream().
+        
+        Returns:
+            HTTPRequest or None if the client closed the connection before sending a request
+            
+        Raises:
+            HTTPError: If the request head is malformed or larger than max_header_size
+        """
         request = cls()
         request.reader = reader
         request.writer = writer
+        head_size = 0
         
-        try:
-            request_line = await reader.readline()
+        # Tolerate empty lines before the request line (RFC 9112, section 2.2)
+        request_line = b'\r\n'
+        while request_line in (b'\r\n', b'\n'):
+            request_line = await cls._read_head_line(reader)
             if not request_line:
                 return None
+            head_size += len(request_line)
+            if head_size > max_header_size:
+                raise HTTPError(431, "Request Header Fields Too Large")
                 
-            try:
-                method, path, version = request_line.decode().strip().split(" ")
-            except ValueError:
-                logger.error(f"Invalid request line: {request_line}")
+        request._parse_request_line(request_line)
+        
+        while True:
+            line = await cls._read_head_line(reader)
+            if not line:
                 return None
-                
-            request.method = method
-            request.version = version
+            head_size += len(line)
+            if head_size > max_header_size:
+                raise HTTPError(431, "Request Header Fields Too Large")
+            if line in (b'\r\n', b'\n'):
+                break
+            request._parse_header_line(line)
+            
+        request._finish_head()
+        return request
+        
+    @classmethod
+    def from_head(cls, head: bytes) -> 'HTTPRequest':
+        """
+        Parse a complete request head that is already in memory
+        
+        Args:
+            head: Request line and header lines, without the empty line ending the head
+            
+        Raises:
+            HTTPError: If the request head is malformed
+        """
+        request = cls()
+        lines = head.split(b'\n')
+        request._parse_request_line(lines[0])
+        for line in lines[1:]:
+            request._parse_header_line(line)
+        request._finish_head()
+        return request
+        
+    def _parse_request_line(self, request_line: bytes) -> None:
+        try:
+            method, path, version = request_line.decode('latin-1').strip().split(" ")
+        except ValueError:
+            logger.error(f"Invalid request line: {request_line}")
+            raise HTTPError(400, "Bad Request")
+            
+        if not version.startswith('HTTP/'):
+            logger.error(f"Invalid request line: {request_line}")
+            raise HTTPError(400, "Bad Request")
+            
+        self.method = method
+        self.version = version
+        
+        if "?" in path:
+            path, query = path.split("?", 1)
+            self.query_params = parse_qs(query)
+        self.path = path
+        
+    def _parse_header_line(self, line: bytes) -> None:
+        try:
+            name, value = line.decode('latin-1').split(":", 1)
+        except ValueError:
+            logger.error(f"Invalid header line: {line}")
+            return
+            
+        name = name.strip().lower()
+        value = value.strip()
+        if name in self.headers:
+            if name == 'content-length' and self.headers[name] != value:
+                raise HTTPError(400, "Bad Request")
+            if name != 'content-length':
+                value = f"{self.headers[name]}, {value}"
+        self.headers[name] = value
+        
+    def _finish_head(self) -> None:
+        content_length = self.get_header('content-length')
+        # isdigit() alone accepts non-ASCII digits such as '²', which int() rejects
+        if content_length is not None and not (content_length.isascii() and content_length.strip().isdigit()):
+            logger.error(f"Invalid content length: {content_length}")
+            raise HTTPError(400, "Bad Request")
+            
+        self.body_pending = self._has_body()
+        
+    @staticmethod
+    async def _read_head_line(reader: asyncio.StreamReader) -> bytes:
+        """Read one line of the request head"""
+        try:
+            return await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError:
+            return b''
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request Header Fields Too Large")
             
-            if "?" in path:
-                path, query = path.split("?", 1)
-                request.query_params = parse_qs(query)
-            request.path = path
+    async def read_body(self,
+                        max_body_size: Optional[int] = None,
+                        read_timeout: Optional[float] = None) -> bytes:
+        """
+        Read and buffer the whole request body
+        
+        Bodies up to body_buffer_size are kept in memory as ``body``. Larger ones
+        are spilled to a temporary file (``body_file``) and ``body`` stays empty,
+        use stream() to consume them.
+        
+        Args:
+            max_body_size: Maximum accepted body size in bytes (0 = unlimited)
+            read_timeout: Maximum time to wait for each piece of the body
+            
+        Raises:
+            HTTPError: If the framing headers are invalid, the body is too large or
+                the client is too slow sending it (408)
+        """
+        if max_body_size is not None:
+            self.max_body_size = max_body_size
+        if read_timeout is not None:
+            self.body_read_timeout = read_timeout
+        if not self.body_pending:
+            return self.body
             
+        chunks = []
+        size = 0
+        async for chunk in self._read_body_stream():
+            size += len(chunk)
+            if self.body_file is None and size > self.body_buffer_size:
+                self.body_file = await aiofiles.tempfile.TemporaryFile('w+b')
+                await self.body_file.write(b''.join(chunks))
+                chunks = []
+            if self.body_file is not None:
+                await self.body_file.write(chunk)
+            else:
+                chunks.append(chunk)
+                
+        self.body = b''.join(chunks)
+        self.body_size = size
+        # The body is decoded now, describe it the way it is stored
+        self.headers.pop('transfer-encoding', None)
+        self.headers['content-length'] = str(size)
+        return self.body
+        
+    async def stream(self) -> AsyncIterator[bytes]:
+        """
+        Iterate over the request body
+        
+        Reads the body from the connection as it arrives if it was not buffered
+        by read_body(), otherwise replays the buffered body.
+        """
+        if self.body_pending:
+            async for chunk in self._read_body_stream():
+                yield chunk
+        elif self.body_file is not None:
+            await self.body_file.seek(0)
             while True:
-                line = await reader.readline()
-                if line == b'\r\n' or not line:
+                chunk = await self.body_file.read(BODY_READ_SIZE)
+                if not chunk:
                     break
-                    
-                try:
-                    name, value = line.decode().strip().split(": ", 1)
-                    request.headers[name.lower()] = value
-                except ValueError:
-                    logger.error(f"Invalid header line: {line}")
-                    continue
-                    
-            content_length = request.headers.get('content-length')
-            if content_length:
-                try:
-                    length = int(content_length)
-                    request.body = await reader.read(length)
-                except ValueError:
-                    logger.error(f"Invalid content length: {content_length}")
-                    
-            return request
+                yield chunk
+        elif self.body:
+            yield self.body
             
-        except Exception as e:
-            logger.error(f"Error parsing request: {e}")
+    def body_length(self) -> Optional[int]:
+        """Get body length in bytes, None if it is only known after reading a chunked body"""
+        if not self.body_pending:
+            return self.body_size if self.body_file is not None else len(self.body)
+        if self.get_header('transfer-encoding'):
             return None
+        return int(self.get_header('content-length', 0))
+        
+    async def close(self) -> None:
+        """Release the temporary file holding a spilled body"""
+        if self.body_file is not None:
+            await self.body_file.close()
+            self.body_file = None
             
+    def _has_body(self) -> bool:
+        """Check if the request head announces a body"""
+        if self.get_header('transfer-encoding'):
+            return True
+        return self.get_header('content-length', '0').strip() not in ('', '0')
+        
+    async def _read_body_stream(self) -> AsyncIterator[bytes]:
+        """Read the announced body from the connection (Content-Length or chunked)"""
+        transfer_encoding = self.get_header('transfer-encoding', '').lower()
+        content_length = self.get_header('content-length')
+        
+        if transfer_encoding:
+            if transfer_encoding.split(',')[-1].strip() != 'chunked':
+                raise HTTPError(501, "Not Implemented")
+            await self._send_continue()
+            async for chunk in self._read_chunked_body():
+                yield chunk
+        else:
+            length = int(content_length)
+            if self.max_body_size and length > self.max_body_size:
+                raise HTTPError(413, "Content Too Large")
+            await self._send_continue()
+            async for chunk in self._read_exactly(length):
+                yield chunk
+                
+        self.body_pending = False
+        
+    async def _send_continue(self) -> None:
+        """Answer 'Expect: 100-continue' before reading the body"""
+        if self.writer and self.get_header('expect', '').lower() == '100-continue':
+            self.writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await self.writer.drain()
+            
+    async def _read_body_data(self, read: Awaitable[bytes]) -> bytes:
+        """Wait for a read of the body, enforcing body_read_timeout and min_body_rate"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            data = await asyncio.wait_for(read, timeout=self.body_read_timeout)
+        except asyncio.TimeoutError:
+            self.body_timed_out = 'body'
+            raise HTTPError(408, "Request Timeout")
+            
+        # Only the time spent waiting on the client counts, not the handler's own work
+        self._body_wait += loop.time() - started
+        self._body_received += len(data)
+        if (self.min_body_rate and self._body_wait > self.min_body_rate_grace
+                and self._body_received < self.min_body_rate * self._body_wait):
+            self.body_timed_out = 'min_rate'
+            raise HTTPError(408, "Request Timeout")
+        return data
+        
+    async def _read_exactly(self, length: int) -> AsyncIterator[bytes]:
+        """Read exactly length bytes, applying body_read_timeout to every read"""
+        remaining = length
+        while remaining > 0:
+            chunk = await self._read_body_data(self.reader.read(min(remaining, BODY_READ_SIZE)))
+            if not chunk:
+                raise HTTPError(400, "Bad Request")
+            remaining -= len(chunk)
+            yield chunk
+            
+    async def _read_chunked_body(self) -> AsyncIterator[bytes]:
+        """Decode a body sent with chunked transfer encoding"""
+        total = 0
+        while True:
+            size_line = await self._read_body_data(self._read_head_line(self.reader))
+            if not size_line:
+                raise HTTPError(400, "Bad Request")
+            try:
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise HTTPError(400, "Bad Request")
+                
+            if size == 0:
+                # Skip trailer fields up to the final empty line
+                while True:
+                    line = await self._read_body_data(self._read_head_line(self.reader))
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                return
+                
+            total += size
+            if self.max_body_size and total > self.max_body_size:
+                raise HTTPError(413, "Content Too Large")
+                
+            async for chunk in self._read_exactly(size):
+                yield chunk
+            if await self._read_body_data(self._read_head_line(self.reader)) not in (b'\r\n', b'\n'):
+                raise HTTPError(400, "Bad Request")
+                
     def get_header(self, name: str, default: Any = None) -> str:
         """Get header value case-insensitively"""
         return self.headers.get(name.lower(), default)
@@ -125,6 +409,13 @@ class HTTPRequest:
     def is_valid(self) -> bool:
         return bool(self.method and self.path)
         
+    def wants_keep_alive(self) -> bool:
+        """Check if the client wants to reuse the connection after this request"""
+        tokens = [token.strip() for token in self.get_header('connection', '').lower().split(',')]
+        if self.version == 'HTTP/1.0':
+            return 'keep-alive' in tokens
+        return 'close' not in tokens
+        
     def is_websocket(self) -> bool:
         """Check if request is a WebSocket upgrade request"""
         return (
@@ -1,26 +1,67 @@
 """
 HTTP Response creation and serialization
 """
+import asyncio
+import inspect
+import os
 from http import HTTPStatus
-from typing import Dict, Union, Optional
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union, Optional, AsyncIterable, AsyncIterator, Any, BinaryIO
 import pyserve
 
+if TYPE_CHECKING:
+    from pyserve.core.server.timeouts import ConnectionTimeouts
+
+FILE_CHUNK_SIZE = 65536
+SENDFILE_WINDOW = 262144  # With a write timeout sendfile goes out in pieces of this size, each one has to be taken in time
+
+
+def serialize_headers(headers: Dict[str, str]) -> bytes:
+    """Serialize headers to 'name: value' lines as sent on the wire"""
+    return ''.join(f"{k}: {v}\r\n" for k, v in headers.items()).encode()
+
 
 class HTTPResponse:    
     def __init__(self, 
                  status_code: int = 200, 
                  headers: Optional[Dict[str, str]] = None, 
-                 body: Union[bytes, str] = b""):
+                 body: Union[bytes, str, AsyncIterable[bytes], BinaryIO] = b"",
+                 header_block: Optional[bytes] = None,
+                 file_parts: Optional[List[Union[bytes, Tuple[int, int]]]] = None):
         self.status_code = status_code
-        self.headers = headers or {}
-        self.body = body if isinstance(body, bytes) else body.encode('utf-8')
+        self.headers = {name.lower(): value for name, value in (headers or {}).items()}
+        
+        # Pre-serialized form of the headers passed in (see serialize_headers), reused
+        # by head_bytes() as long as none of those headers is changed with set_header()
+        self._header_block = header_block
+        self._block_headers = frozenset(self.headers) if header_block is not None else frozenset()
+        
+        # Async iterables and file-like bodies are written chunk by chunk instead of being held in memory
+        self.body_stream: Optional[AsyncIterable[bytes]] = None
+        self.body_file: Any = None
+        # Only send these (offset, length) windows of body_file, with the bytes in between written
+        # as-is (multipart/byteranges). None sends the file from its current position to the end.
+        self.file_parts = file_parts
+        self.bytes_sent = 0  # Head and body bytes handed to the transport by write_to()
+        if isinstance(body, (bytes, str)):
+            self.body = body if isinstance(body, bytes) else body.encode('utf-8')
+        elif hasattr(body, 'read'):
+            self.body = b""
+            self.body_file = body
+            self.body_stream = self._iter_file(body, file_parts, self._declared_length())
+        else:
+            self.body = b""
+            self.body_stream = body
         
         self._set_default_headers()
         
     def _set_default_headers(self) -> None:
         """Set default headers if not already set"""
-        if self.body and 'content-length' not in self.headers:
-            self.headers['content-length'] = str(len(self.body))
+        # Keep-alive clients rely on content-length (or chunked framing) to find the end of the response
+        if 'content-length' not in self.headers and self.status_code not in (204, 304) and self.status_code >= 200:
+            if self.body_stream is None:
+                self.headers['content-length'] = str(len(self.body))
+            else:
+                self.headers['transfer-encoding'] = 'chunked'
         
         if 'content-type' not in self.headers:
             self.headers['content-type'] = 'text/html; charset=utf-8'
@@ -29,7 +70,18 @@ class HTTPResponse:
             self.headers['server'] = f'PyServe/{pyserve.__version__} (Async)'
             
     def set_header(self, name: str, value: str) -> None:
-        self.headers[name.lower()] = value
+        name = name.lower()
+        if name in self._block_headers:
+            self._header_block = None
+            self._block_headers = frozenset()
+        self.headers[name] = value
+        
+    def remove_header(self, name: str) -> None:
+        name = name.lower()
+        if name in self._block_headers:
+            self._header_block = None
+            self._block_headers = frozenset()
+        self.headers.pop(name, None)
         
     def set_cookie(self, name: str, value: str, **kwargs) -> None:
         cookie = f"{name}={value}"
@@ -47,18 +99,255 @@ class HTTPResponse:
             
         self.headers['set-cookie'] = cookie
         
-    def to_bytes(self) -> bytes:
+    def _declared_length(self) -> Optional[int]:
+        """The content-length header as a number, file bodies are never sent past it"""
+        try:
+            return int(self.headers['content-length'])
+        except (KeyError, ValueError):
+            return None
+            
+    def is_streaming(self) -> bool:
+        return self.body_stream is not None
+        
+    def head_bytes(self) -> bytes:
+        """Serialize status line and headers"""
         status_phrase = HTTPStatus(self.status_code).phrase
         status_line = f"HTTP/1.1 {self.status_code} {status_phrase}\r\n"
         
-        header_lines = ''.join(f"{k}: {v}\r\n" for k, v in self.headers.items())
+        if self._header_block is not None:
+            extra_headers = {k: v for k, v in self.headers.items() if k not in self._block_headers}
+            return status_line.encode() + self._header_block + serialize_headers(extra_headers) + b"\r\n"
+        
+        return status_line.encode() + serialize_headers(self.headers) + b"\r\n"
         
-        response = status_line.encode() + header_lines.encode() + b"\r\n"
+    def to_bytes(self) -> bytes:
+        response = self.head_bytes()
         if self.body:
             response += self.body
             
         return response
         
+    async def write_to(self, writer: asyncio.StreamWriter, send_body: bool = True,
+                       timeouts: Optional['ConnectionTimeouts'] = None) -> None:
+        """
+        Write the response to the client
+        
+        Streaming bodies are written chunk by chunk, waiting for the transport
+        to drain between chunks so a slow client applies backpressure.
+        
+        Args:
+            writer: Client stream writer
+            send_body: False for responses that must not carry a body (HEAD requests)
+            timeouts: Timeouts of the client connection, applied to sendfile (drain() applies them itself)
+        """
+        if timeouts is None:
+            await self._write_to(writer, send_body, None)
+            return
+        timeouts.start_response(self)
+        try:
+            await self._write_to(writer, send_body, timeouts)
+        finally:
+            timeouts.end_response()
+            
+    async def _write_to(self, writer: asyncio.StreamWriter, send_body: bool,
+                        timeouts: Optional['ConnectionTimeouts']) -> None:
+        if not send_body:
+            self._write(writer, self.head_bytes())
+            await writer.drain()
+            return
+            
+        if self.body_stream is None:
+            head = self.head_bytes()
+            if self.body:
+                writer.writelines((head, self.body))
+            else:
+                writer.write(head)
+            self.bytes_sent += len(head) + len(self.body)
+            await writer.drain()
+            return
+            
+        head_sent = False
+        if self._can_sendfile(writer):
+            self._write(writer, self.head_bytes())
+            body_start = self.bytes_sent
+            await writer.drain()
+            if await self._sendfile(writer, timeouts):
+                self._check_complete(self.bytes_sent - body_start)
+                return
+            head_sent = True
+            
+        chunked = self.headers.get('transfer-encoding', '').lower() == 'chunked'
+        if not head_sent:
+            self._write(writer, self.head_bytes())
+            body_start = self.bytes_sent
+        async for chunk in self.body_stream:
+            if not chunk:
+                continue
+            if chunked:
+                self._write(writer, b"%x\r\n" % len(chunk) + chunk + b"\r\n")
+            else:
+                self._write(writer, chunk)
+            await writer.drain()
+        if chunked:
+            self._write(writer, b"0\r\n\r\n")
+        else:
+            self._check_complete(self.bytes_sent - body_start)
+        await writer.drain()
+        
+    def _check_complete(self, body_sent: int) -> None:
+        """
+        Make sure a streamed body was as long as its content-length
+        
+        A shorter one (e.g. a file that shrank) leaves the client waiting for
+        the rest, which it would then take from the next response.
+        
+        Raises:
+            ConnectionAbortedError: The connection has to be closed
+        """
+        length = self._declared_length()
+        if length is not None and body_sent < length:
+            raise ConnectionAbortedError(f"Response body ended after {body_sent} of {length} bytes")
+            
+    def _write(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(data)
+        self.bytes_sent += len(data)
+        
+    def _can_sendfile(self, writer: asyncio.StreamWriter) -> bool:
+        """Check if the body can go from the file descriptor straight to the socket"""
+        if self.body_file is None or inspect.iscoroutinefunction(self.body_file.read):
+            return False
+        if 'content-length' not in self.headers or not hasattr(self.body_file, 'fileno'):
+            return False
+        # TLS has to encrypt in userspace, those connections use the chunked read path
+        return writer.get_extra_info('sslcontext') is None
+        
+    async def _sendfile(self, writer: asyncio.StreamWriter, timeouts: Optional['ConnectionTimeouts'] = None) -> bool:
+        """
+        Send the file body with loop.sendfile (os.sendfile, no copies through Python)
+        
+        Returns:
+            bool: False if the loop or transport does not support sendfile and nothing was sent
+        """
+        if self.file_parts is None:
+            offset = self.body_file.tell()
+            try:
+                await self._sendfile_window(writer, offset, self._declared_length(), timeouts)
+                return True
+            except (NotImplementedError, RuntimeError, asyncio.SendfileNotAvailableError):
+                self.body_file.seek(offset)
+                return False
+        
+        use_sendfile = True
+        for part in self.file_parts:
+            if isinstance(part, bytes):
+                self._write(writer, part)
+                await writer.drain()
+                continue
+            offset, length = part
+            if use_sendfile:
+                try:
+                    await self._sendfile_window(writer, offset, length, timeouts)
+                    continue
+                except (NotImplementedError, RuntimeError, asyncio.SendfileNotAvailableError):
+                    # Part of the body may be sent already, copy the remaining windows instead
+                    use_sendfile = False
+            async for chunk in self._iter_window(self.body_file, offset, length):
+                self._write(writer, chunk)
+                await writer.drain()
+        return True
+        
+    async def _sendfile_window(self, writer: asyncio.StreamWriter, offset: int, length: Optional[int],
+                               timeouts: Optional['ConnectionTimeouts']) -> None:
+        """
+        Send length bytes of the file from offset (None: up to the end) with loop.sendfile
+        
+        A file that shrank since length was taken cuts the body short (see _check_complete()),
+        one that grew does not lengthen it.
+        """
+        loop = asyncio.get_running_loop()
+        if timeouts is None:
+            self.bytes_sent += await loop.sendfile(writer.transport, self.body_file, offset, length, fallback=False)
+            return
+            
+        # In windows, so a client that stops reading is noticed within the write timeout
+        end = os.fstat(self.body_file.fileno()).st_size
+        if length is not None:
+            end = min(end, offset + length)
+        while offset < end:
+            size = min(SENDFILE_WINDOW, end - offset)
+            await timeouts.wait_writable(self._sendfile_counted(writer, offset, size))
+            offset += size
+            
+    async def _sendfile_counted(self, writer: asyncio.StreamWriter, offset: int, size: int) -> None:
+        # Counted as soon as it is sent, wait_writable() checks min_rate against bytes_sent
+        loop = asyncio.get_running_loop()
+        self.bytes_sent += await loop.sendfile(writer.transport, self.body_file, offset, size, fallback=False)
+            
+    async def close(self) -> None:
+        """Release the streaming body (e.g. an upstream connection or a file) if it was not fully consumed"""
+        aclose = getattr(self.body_stream, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+        if self.body_file is not None:
+            await self._close_file(self.body_file)
+            self.body_file = None
+            
+    @staticmethod
+    async def _iter_file(file: Any, parts: Optional[List[Union[bytes, Tuple[int, int]]]] = None,
+                         length: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Read a file-like body chunk by chunk (at most length bytes), blocking files are read in a worker thread"""
+        is_async = inspect.iscoroutinefunction(file.read)
+        try:
+            if parts is not None:
+                for part in parts:
+                    if isinstance(part, bytes):
+                        yield part
+                    else:
+                        async for chunk in HTTPResponse._iter_window(file, *part):
+                            yield chunk
+                return
+                
+            while length is None or length > 0:
+                size = FILE_CHUNK_SIZE if length is None else min(length, FILE_CHUNK_SIZE)
+                if is_async:
+                    chunk = await file.read(size)
+                else:
+                    chunk = await asyncio.to_thread(file.read, size)
+                if not chunk:
+                    break
+                if length is not None:
+                    length -= len(chunk)
+                yield chunk
+        finally:
+            await HTTPResponse._close_file(file)
+            
+    @staticmethod
+    async def _iter_window(file: Any, offset: int, length: int) -> AsyncIterator[bytes]:
+        """Read length bytes of a file starting at offset"""
+        is_async = inspect.iscoroutinefunction(file.read)
+        if is_async:
+            await file.seek(offset)
+        else:
+            await asyncio.to_thread(file.seek, offset)
+        while length > 0:
+            size = min(length, FILE_CHUNK_SIZE)
+            if is_async:
+                chunk = await file.read(size)
+            else:
+                chunk = await asyncio.to_thread(file.read, size)
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+            
+    @staticmethod
+    async def _close_file(file: Any) -> None:
+        if getattr(file, 'closed', False):
+            return
+        result = file.close()
+        if inspect.isawaitable(result):
+            await result
+        
     @classmethod
     def ok(cls, body: Union[bytes, str] = b"", content_type: str = "text/html") -> 'HTTPResponse':
         return cls(200, {'content-type': content_type}, body)
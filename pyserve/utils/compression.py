@@ -0,0 +1,246 @@
+"""
+Content-coding helpers for PyServe: Accept-Encoding negotiation, encoders and precompressed sidecar files
+"""
+import gzip
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # brotli is optional, gzip is always available
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # zstandard is optional as well
+
+# Content codings in order of preference, with the suffix of their sidecar file
+SIDECAR_SUFFIXES = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+# Files worth compressing, binary formats like images and woff2 are already compressed
+COMPRESSIBLE_EXTENSIONS = {
+    '.html', '.htm', '.css', '.js', '.mjs', '.json', '.map', '.xml', '.svg',
+    '.txt', '.csv', '.md', '.ico', '.ttf', '.otf', '.wasm',
+}
+
+DEFAULT_PRECOMPRESS_MIN_SIZE = 256
+
+# Levels for compressing responses on the fly, favouring speed over ratio
+DEFAULT_LEVELS = {
+    'br': 4,
+    'zstd': 3,
+    'gzip': 6,
+}
+
+
+class Encoder:
+    """
+    Incremental compressor for one response body.
+
+    compress() buffers inside the compressor, flush() forces out everything
+    compressed so far (for streamed responses like server-sent events) and
+    finish() ends the stream.
+    """
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        level = DEFAULT_LEVELS[encoding] if level is None else level
+        if encoding == 'gzip':
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == 'gzip':
+            return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == 'br':
+            return self._compressor.flush()
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def encoder_available(encoding: str) -> bool:
+    """Check if responses can be compressed with the content coding"""
+    if encoding == 'gzip':
+        return True
+    if encoding == 'br':
+        return brotli is not None
+    if encoding == 'zstd':
+        return zstandard is not None
+    return False
+
+
+def compress_bytes(encoding: str, data: bytes, level: Optional[int] = None) -> bytes:
+    """Compress a complete body"""
+    encoder = Encoder(encoding, level)
+    return encoder.compress(data) + encoder.finish()
+
+
+def available_encodings() -> List[str]:
+    """Get the content codings sidecar files can be created for"""
+    return [coding for coding in SIDECAR_SUFFIXES if coding != 'br' or brotli is not None]
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Parse an Accept-Encoding header
+
+    Args:
+        header: Header value, e.g. "gzip, br;q=0.9, *;q=0"
+
+    Returns:
+        Dict[str, float]: Lowercased coding -> quality value
+    """
+    codings = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """
+    Pick the content coding to send
+
+    Args:
+        accept_encoding: The request's Accept-Encoding header
+        available: Codings the representation is available in
+
+    Returns:
+        Optional[str]: The acceptable coding with the highest quality (ties go to the
+        server's preference order), or None to send the identity representation
+    """
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress_file(path: str, encodings: List[str], level: int = 9, force: bool = False) -> List[str]:
+    """
+    Write compressed sidecar files next to a file
+
+    Sidecars that are not smaller than the original are not kept, sidecars
+    newer than the original are left alone unless force is set.
+
+    Returns:
+        List[str]: Paths of the sidecars written
+    """
+    stat_result = os.stat(path)
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    written = []
+    for coding in encodings:
+        sidecar = path + SIDECAR_SUFFIXES[coding]
+        if not force and os.path.exists(sidecar) and os.stat(sidecar).st_mtime_ns >= stat_result.st_mtime_ns:
+            continue
+
+        if coding == 'br':
+            compressed = brotli.compress(data, quality=min(level, 11))
+        else:
+            compressed = gzip.compress(data, compresslevel=min(level, 9), mtime=0)
+
+        if len(compressed) >= len(data):
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+            continue
+
+        # Write to a temporary name first so the server never sees a partial sidecar
+        tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(compressed)
+        os.utime(tmp_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+        os.replace(tmp_path, sidecar)
+        written.append(sidecar)
+    return written
+
+
+def find_compressible_files(directory: str, min_size: int = DEFAULT_PRECOMPRESS_MIN_SIZE) -> List[str]:
+    """Find the files below directory that sidecars should be created for"""
+    sidecar_suffixes = tuple(SIDECAR_SUFFIXES.values())
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith(sidecar_suffixes):
+                continue
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            try:
+                if os.path.getsize(path) < min_size:
+                    continue
+            except OSError:
+                continue
+            files.append(path)
+    return files
+
+
+def precompress_directory(directory: str,
+                          encodings: Optional[List[str]] = None,
+                          min_size: int = DEFAULT_PRECOMPRESS_MIN_SIZE,
+                          level: int = 9,
+                          workers: Optional[int] = None,
+                          force: bool = False) -> Tuple[int, int]:
+    """
+    Create .br/.gz sidecars for every compressible file below directory, in parallel
+
+    Args:
+        directory: Directory to walk (usually static_dir)
+        encodings: Codings to create, defaults to all available ones
+        min_size: Smaller files are skipped
+        level: Compression level (capped at 9 for gzip and 11 for brotli)
+        workers: Number of worker processes, defaults to the CPU count
+        force: Recreate sidecars even if they are up to date
+
+    Returns:
+        Tuple[int, int]: (files processed, sidecars written)
+    """
+    encodings = encodings or available_encodings()
+    files = find_compressible_files(directory, min_size)
+    if not files:
+        return 0, 0
+
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(compress_file, path, encodings, level, force) for path in files]
+        for future in futures:
+            written += len(future.result())
+    return len(files), written